@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+
+class CalendarTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate a calendar feed by the calendar_token of its business
+    or professional, sent as ?token= in the URL, since calendar apps
+    subscribe to a plain URL and cannot send an Authorization header.
+    A token only opens the feed of its own business or professional,
+    which is kept as request.auth so the view does not load it again.
+    """
+
+    def authenticate(self, request: Request) -> tuple[AnonymousUser, models.Model] | None:
+        token = request.query_params.get('token')
+        if token is None:
+            return None
+
+        view: APIView = request.parser_context['view']
+        model = view.get_queryset().model
+        try:
+            owner = model.objects.filter(pk=view.kwargs.get('pk')).first()
+        except (TypeError, ValueError, ValidationError):
+            owner = None
+        if owner is None or not constant_time_compare(owner.calendar_token, token):
+            raise AuthenticationFailed('Invalid calendar token.')
+        return AnonymousUser(), owner
+
+
+class IsAuthenticatedOrCalendarToken(BasePermission):
+    """
+    Allow the authenticated users and the calendar feed tokens
+    """
+
+    def has_permission(self, request: Request, view: APIView) -> bool:
+        return (
+            bool(request.user and request.user.is_authenticated)
+            or isinstance(request.successful_authenticator, CalendarTokenAuthentication)
+        )
@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+from .holidays import get_holiday_calendar, is_closed_on_holiday
+from .models import Appointment, AvailableDay, Business, Professional, Service
+from .schedules import (
+    Interval,
+    MINUTES_PER_DAY,
+    time_to_minutes,
+    subtract_intervals
+)
+from .validators import SP_TZ
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from itertools import islice
+from typing import Iterable, Iterator
+import heapq
+import math
+import threading
+
+
+DEFAULT_SLOT_STEP = timedelta(minutes=15)
+MAX_RANGE_DAYS = 62
+# Horizon of the "next available slot" search and the largest
+# number of dates computed at once for each professional
+MAX_SEARCH_DAYS = 90
+MAX_SEARCH_CHUNK_DAYS = 16
+AVAILABILITY_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def local_midnight(day: date) -> datetime:
+    """
+    Return the midnight of a date in the Sao Paulo timezone
+    """
+    return datetime.combine(day, time(0), tzinfo=SP_TZ)
+
+
+def _daterange(start_date: date, end_date: date):
+    for offset in range((end_date - start_date).days + 1):
+        yield start_date + timedelta(days=offset)
+
+
+def local_dates(start: datetime, end: datetime) -> list[date]:
+    """
+    Return the local dates touched by the period between start and end
+    """
+    first = start.astimezone(SP_TZ).date()
+    last = (end - timedelta(microseconds=1)).astimezone(SP_TZ).date()
+    return list(_daterange(first, max(first, last)))
+
+
+def _load_blocks(
+    professional: Professional,
+    start_date: date,
+    end_date: date
+) -> dict[date, list[Interval]]:
+    """
+    Load the AvailableDay blocks that apply to the professional,
+    including the ones set for the whole business, in one query
+    """
+    blocks: dict[date, list[Interval]] = defaultdict(list)
+    rows = (
+        AvailableDay.objects
+        .filter(
+            Q(professional=professional) | Q(professional__isnull=True),
+            business_id=professional.business_id,
+            date__range=(start_date, end_date),
+            blocked_start_time__isnull=False,
+            blocked_end_time__isnull=False
+        )
+        .values_list('date', 'blocked_start_time', 'blocked_end_time')
+    )
+    for day, blocked_start, blocked_end in rows:
+        blocks[day].append((
+            time_to_minutes(blocked_start),
+            time_to_minutes(blocked_end, round_up=True)
+        ))
+    return blocks
+
+
+def _load_appointments(
+    professional: Professional,
+    start_date: date,
+    end_date: date
+) -> dict[date, list[Interval]]:
+    """
+    Load the active appointments of the professional
+    in one query and split them by local date
+    """
+    busy: dict[date, list[Interval]] = defaultdict(list)
+    rows = (
+        Appointment.objects
+        .overlapping(
+            professional,
+            local_midnight(start_date),
+            local_midnight(end_date + timedelta(days=1))
+        )
+        .values_list('datetime', 'end_datetime')
+    )
+    for start, end in rows:
+        start = start.astimezone(SP_TZ)
+        end = end.astimezone(SP_TZ)
+        day = start.date()
+        # Distribute the appointment over every local date it touches
+        while local_midnight(day) < end:
+            midnight = local_midnight(day)
+            busy[day].append((
+                max(0, math.floor((start - midnight).total_seconds() / 60)),
+                min(MINUTES_PER_DAY, math.ceil((end - midnight).total_seconds() / 60))
+            ))
+            day += timedelta(days=1)
+    return busy
+
+
+def free_intervals(
+    professional: Professional,
+    start_date: date,
+    end_date: date
+) -> dict[date, list[Interval]]:
+    """
+    Compute the free intervals of a professional for each date of the range.
+    The working hours are the intersection of the business and professional
+    schedules, minus their breaks, the AvailableDay blocks and the
+    active appointments. Holidays have no free intervals when the
+    business is closed on holidays. The number of queries does not depend on the range.
+    """
+    business = professional.business
+    schedule = business.compiled_schedule & professional.compiled_schedule
+    blocks = _load_blocks(professional, start_date, end_date)
+    appointments = _load_appointments(professional, start_date, end_date)
+
+    result: dict[date, list[Interval]] = {}
+    for day in _daterange(start_date, end_date):
+        if is_closed_on_holiday(business, day):
+            result[day] = []
+            continue
+        intervals = schedule.intervals(day)
+        busy = blocks.get(day, []) + appointments.get(day, [])
+        result[day] = subtract_intervals(intervals, busy) if busy else intervals
+    return result
+
+
+def _cache_key(professional: Professional, day: date) -> str:
+    """
+    Key of the free intervals of a professional on a date. A holiday added by
+    another process only reaches it after up to HOLIDAY_CALENDAR_TTL (1 hour).
+    """
+    holidays = 0
+    if professional.business.closed_on_holidays:
+        holidays = get_holiday_calendar().version
+    return 'availability:{}:{}:{}:{}:{}:{}'.format(
+        professional.id,
+        professional.availability_version,
+        professional.updated_at.timestamp(),
+        professional.business.updated_at.timestamp(),
+        holidays,
+        day.isoformat()
+    )
+
+
+_pending_refresh = threading.local()
+
+
+def _pending_items() -> list[tuple[int | None, int | None, date]]:
+    if not hasattr(_pending_refresh, 'items'):
+        _pending_refresh.items = []
+    return _pending_refresh.items
+
+
+def _has_pending_refresh(professional: Professional) -> bool:
+    return any(
+        professional_id == professional.id or business_id == professional.business_id
+        for professional_id, business_id, _ in _pending_items()
+    )
+
+
+def cached_free_intervals(
+    professional: Professional,
+    start_date: date,
+    end_date: date
+) -> dict[date, list[Interval]]:
+    """
+    Return the free intervals of a professional from the cache, with one
+    lookup for the whole range. The missing dates are computed together
+    and stored, unless the current transaction has not committed yet.
+    """
+    # Uncommitted writes of this transaction are not in the cache yet
+    in_transaction = connection.in_atomic_block
+    if in_transaction and _has_pending_refresh(professional):
+        return free_intervals(professional, start_date, end_date)
+
+    keys = {day: _cache_key(professional, day) for day in _daterange(start_date, end_date)}
+    cached = cache.get_many(keys.values())
+    missing = [day for day, key in keys.items() if key not in cached]
+    if not missing:
+        return {day: cached[key] for day, key in keys.items()}
+
+    computed = free_intervals(professional, missing[0], missing[-1])
+    if not in_transaction:
+        cache.set_many(
+            {keys[day]: computed[day] for day in missing},
+            AVAILABILITY_CACHE_TIMEOUT
+        )
+    return {
+        day: computed[day] if day in computed else cached[key]
+        for day, key in keys.items()
+    }
+
+
+def refresh_availability_on_commit(
+    dates: Iterable[date],
+    professional_id: int | None = None,
+    business_id: int | None = None
+) -> None:
+    """
+    Mark the dates of a professional, or of every professional of a
+    business, to be recomputed when the current transaction commits.
+    The marks of a transaction are coalesced and rebuilt in bulk, with
+    one range computation per professional.
+    """
+    _pending_items().extend(
+        (professional_id, business_id, day) for day in dates
+    )
+    # Extra callbacks of the same transaction find nothing left to do
+    transaction.on_commit(refresh_pending_availability, robust=True)
+
+
+def refresh_pending_availability() -> None:
+    """
+    Bump the availability_version of the marked professionals, with one
+    UPDATE, then recompute and store the free intervals of their dates
+    """
+    items = _pending_items()
+    if not items:
+        return
+    _pending_refresh.items = []
+
+    today = datetime.now(tz=SP_TZ).date()
+    professional_dates: dict[int, set[date]] = defaultdict(set)
+    business_dates: dict[int, set[date]] = defaultdict(set)
+    for professional_id, business_id, day in items:
+        if day < today:
+            continue
+        if professional_id is not None:
+            professional_dates[professional_id].add(day)
+        else:
+            business_dates[business_id].add(day)
+
+    if not professional_dates and not business_dates:
+        return
+
+    professionals = Professional.objects.filter(
+        Q(id__in=professional_dates) | Q(business_id__in=business_dates)
+    )
+    # Other processes read the new version and stop using their entries
+    professionals.update(availability_version=F('availability_version') + 1)
+    professionals = professionals.select_related('business')
+    for professional in professionals:
+        dates = (
+            professional_dates.get(professional.id, set())
+            | business_dates.get(professional.business_id, set())
+        )
+        computed = free_intervals(professional, min(dates), max(dates))
+        cache.set_many(
+            {_cache_key(professional, day): computed[day] for day in dates},
+            AVAILABILITY_CACHE_TIMEOUT
+        )
+
+
+def slots_from_intervals(
+    day: date,
+    intervals: list[Interval],
+    duration: timedelta,
+    step: timedelta = DEFAULT_SLOT_STEP,
+    not_before: datetime | None = None
+) -> list[datetime]:
+    """
+    Return the start times, aligned to the step, where a service
+    of the given duration fits entirely inside one of the intervals
+    """
+    needed = math.ceil(duration.total_seconds() / 60)
+    step_minutes = max(1, math.ceil(step.total_seconds() / 60))
+    midnight = local_midnight(day)
+
+    # Ignore the start times before the given datetime
+    first_minute = 0
+    if not_before is not None:
+        first_minute = math.ceil((not_before - midnight).total_seconds() / 60)
+
+    slots: list[datetime] = []
+    for start, end in intervals:
+        start = max(start, first_minute)
+        minute = -(-start // step_minutes) * step_minutes
+        while minute + needed <= end:
+            slots.append(midnight + timedelta(minutes=minute))
+            minute += step_minutes
+    return slots
+
+
+def free_slots(
+    professional: Professional,
+    service: Service,
+    start_date: date,
+    end_date: date,
+    step: timedelta = DEFAULT_SLOT_STEP,
+    now: datetime | None = None
+) -> dict[date, list[datetime]]:
+    """
+    Return the free start times of a service with a professional
+    for each date of the range. Start times in the past are skipped.
+    """
+    now = now or datetime.now(tz=SP_TZ)
+    return {
+        day: slots_from_intervals(day, intervals, service.duration, step, now)
+        for day, intervals in cached_free_intervals(professional, start_date, end_date).items()
+    }
+
+
+def iter_free_slots(
+    professional: Professional,
+    service: Service,
+    start_date: date,
+    step: timedelta = DEFAULT_SLOT_STEP,
+    now: datetime | None = None,
+    horizon_days: int = MAX_SEARCH_DAYS
+) -> Iterator[datetime]:
+    """
+    Lazily yield the free start times of a service with a professional,
+    in chronological order. The dates are computed in chunks that start
+    with one day and double up to MAX_SEARCH_CHUNK_DAYS, so a search that
+    is satisfied early only queries the first dates.
+    """
+    now = now or datetime.now(tz=SP_TZ)
+    last_date = start_date + timedelta(days=horizon_days - 1)
+    chunk_start = start_date
+    chunk_days = 1
+    while chunk_start <= last_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_date)
+        for slots in free_slots(professional, service, chunk_start, chunk_end, step, now).values():
+            yield from slots
+
+        chunk_start = chunk_end + timedelta(days=1)
+        chunk_days = min(chunk_days * 2, MAX_SEARCH_CHUNK_DAYS)
+
+
+def next_free_slots(
+    professionals: Iterable[Professional],
+    service: Service,
+    start_date: date,
+    limit: int,
+    step: timedelta = DEFAULT_SLOT_STEP,
+    now: datetime | None = None
+) -> list[tuple[datetime, Professional]]:
+    """
+    Return the first free start times of a service across the professionals.
+    The streams of each professional are merged lazily and the search stops
+    as soon as the limit is reached.
+    """
+    now = now or datetime.now(tz=SP_TZ)
+
+    def stream(professional: Professional) -> Iterator[tuple[datetime, int, Professional]]:
+        for slot in iter_free_slots(professional, service, start_date, step, now):
+            yield slot, professional.id, professional
+
+    merged = heapq.merge(
+        *(stream(professional) for professional in professionals),
+        key=lambda item: item[:2]
+    )
+    return [(slot, professional) for slot, _, professional in islice(merged, limit)]
+
+
+def month_occupancy(business: Business, year: int, month: int) -> dict[date, dict[int, dict[str, int]]]:
+    """
+    Return the booked and free minutes of each active professional
+    of the business for every date of the month. The booked minutes
+    come from one GROUP BY query over the active appointments, and the
+    working minutes from the compiled schedules.
+    """
+    first_day = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+
+    booked: dict[tuple[date, int], int] = {
+        (row['day'], row['professional_id']): math.ceil(row['booked'].total_seconds() / 60)
+        for row in (
+            Appointment.objects
+            .active()
+            .filter(
+                business=business,
+                datetime__gte=local_midnight(first_day),
+                datetime__lt=local_midnight(next_month)
+            )
+            .annotate(day=TruncDate('datetime', tzinfo=SP_TZ))
+            .values('day', 'professional_id')
+            .annotate(booked=Sum('service__duration'))
+            .order_by()
+        )
+    }
+
+    professionals = Professional.objects.active().filter(business=business).order_by('id')
+    schedules = {
+        professional.id: business.compiled_schedule & professional.compiled_schedule
+        for professional in professionals
+    }
+
+    occupancy: dict[date, dict[int, dict[str, int]]] = {}
+    for day in _daterange(first_day, next_month - timedelta(days=1)):
+        occupancy[day] = {}
+        closed = is_closed_on_holiday(business, day)
+        for professional_id, schedule in schedules.items():
+            working = 0 if closed else sum(end - start for start, end in schedule.intervals(day))
+            booked_minutes = booked.get((day, professional_id), 0)
+            occupancy[day][professional_id] = {
+                'booked_minutes': booked_minutes,
+                'free_minutes': max(working - booked_minutes, 0)
+            }
+    return occupancy
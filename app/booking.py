@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from .models import Appointment, Professional
+from contextlib import contextmanager
+from django.db import connection, transaction
+from typing import Iterator
+import zlib
+
+
+# First key of the PostgreSQL advisory locks of the bookings, so they
+# do not collide with advisory locks taken by other features
+BOOKING_LOCK_NAMESPACE = zlib.crc32(b'app.booking') & 0x7FFFFFFF
+
+
+@contextmanager
+def professional_lock(professional_id: int) -> Iterator[None]:
+    """
+    Open a transaction holding a lock on the professional until it ends,
+    so the conflict check and the write of concurrent bookings of the
+    same professional run one at a time. Other professionals are not
+    blocked. PostgreSQL takes a transaction-level advisory lock, the
+    other databases lock the professional row with SELECT ... FOR UPDATE.
+    SQLite ignores it and its deferred BEGIN lets both connections read
+    before either writes, so the bookings are not serialized there: the
+    losing side fails with a database locked error instead.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s, %s)',
+                    [BOOKING_LOCK_NAMESPACE, professional_id]
+                )
+        else:
+            list(Professional.objects.select_for_update().filter(pk=professional_id).values_list('pk'))
+        yield
+
+
+def book_appointment(appointment: Appointment, fast: bool = False) -> Appointment:
+    """
+    Check and save the appointment under the lock of its professional.
+    A conflict raises the ValidationError of Appointment.clean(), or of
+    the exclusion constraint in the fast mode on PostgreSQL.
+    """
+    with professional_lock(appointment.professional_id):
+        appointment.save(fast=fast)
+    return appointment
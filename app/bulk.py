@@ -0,0 +1,127 @@
+from .models import Business
+from dataclasses import dataclass, field
+from django.db import models, transaction
+from itertools import islice
+from rest_framework import serializers
+from typing import Any, Iterable
+
+
+# Rows validated and written per round trip to the database
+BULK_BATCH_SIZE = 1000
+# Customers and professionals are unique by business and CPF
+# (unique_customer_business and unique_business_professional)
+BULK_UNIQUE_FIELDS = ('business', 'cpf')
+
+
+@dataclass
+class BulkResult:
+    created: int = 0
+    updated: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+
+def _validate_batch(
+    serializer: serializers.Serializer,
+    batch: list[tuple[int, Any]],
+    result: BulkResult
+) -> list[dict[str, Any]]:
+    """
+    Validate the fields of each row with the serializer, then check the
+    businesses and the duplicated keys of the whole batch with one query.
+    Return the validated rows and record the errors of the others.
+    """
+    valid: list[tuple[int, dict[str, Any]]] = []
+    for row, data in batch:
+        if isinstance(data, Exception):
+            result.errors.append({'row': row, 'errors': {'non_field_errors': [str(data)]}})
+            continue
+        if not isinstance(data, dict):
+            result.errors.append({'row': row, 'errors': {'non_field_errors': ['Expected an object.']}})
+            continue
+        try:
+            valid.append((row, serializer.run_validation(data)))
+        except serializers.ValidationError as exc:
+            result.errors.append({'row': row, 'errors': exc.detail})
+
+    businesses = set(
+        Business.objects
+        .filter(id__in={data['business_id'] for _, data in valid})
+        .values_list('id', flat=True)
+    )
+
+    rows: list[dict[str, Any]] = []
+    seen: set[tuple[int, str]] = set()
+    for row, data in valid:
+        key = (data['business_id'], data['cpf'])
+        if data['business_id'] not in businesses:
+            result.errors.append({
+                'row': row,
+                'errors': {'business': [f'Invalid pk "{data["business_id"]}" - object does not exist.']}
+            })
+        elif key in seen:
+            result.errors.append({
+                'row': row,
+                'errors': {'non_field_errors': ['Duplicated business and cpf in the request.']}
+            })
+        else:
+            seen.add(key)
+            rows.append(data)
+    return rows
+
+
+def bulk_upsert(
+    serializer_class: type[serializers.Serializer],
+    rows: Iterable[Any],
+    batch_size: int = BULK_BATCH_SIZE
+) -> BulkResult:
+    """
+    Create the valid rows, or update the existing ones with the same
+    business and CPF, with one INSERT ... ON CONFLICT DO UPDATE per batch.
+    The rows replace every writable field, like a PUT. Rows that are
+    not valid are reported by their position and the others are saved.
+    """
+    model: type[models.Model] = serializer_class.Meta.model
+    # One serializer for every row, so its fields are built once
+    serializer = serializer_class()
+    update_fields = [
+        model._meta.get_field(field.source).name
+        for field in serializer.fields.values()
+        if not field.read_only and field.source not in ('business_id', 'cpf')
+    ] + getattr(model, 'search_fields', []) + ['updated_at']
+
+    result = BulkResult()
+    numbered = enumerate(rows)
+    with transaction.atomic():
+        while batch := list(islice(numbered, batch_size)):
+            valid = _validate_batch(serializer, batch, result)
+            if not valid:
+                continue
+
+            # One set lookup for the keys that already exist
+            existing = set(
+                model.objects
+                .filter(
+                    business_id__in={data['business_id'] for data in valid},
+                    cpf__in={data['cpf'] for data in valid}
+                )
+                .values_list('business_id', 'cpf')
+            )
+            updated = sum((data['business_id'], data['cpf']) in existing for data in valid)
+
+            instances = [model(**data) for data in valid]
+            # bulk_create does not call save, which fills them
+            if hasattr(model, 'set_search_fields'):
+                for instance in instances:
+                    instance.set_search_fields()
+
+            model.objects.bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=BULK_UNIQUE_FIELDS,
+                update_fields=update_fields
+            )
+            result.created += len(valid) - updated
+            result.updated += updated
+
+    result.errors.sort(key=lambda error: error['row'])
+    return result
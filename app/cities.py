@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+from .utils import fold
+from bisect import bisect_left
+from dataclasses import dataclass
+from django.db import DatabaseError, transaction
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable
+import csv
+import gzip
+import hashlib
+import io
+import json
+import time
+
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+# Seconds the clients may reuse a city response before revalidating
+# it with the ETag. Cities only change with the IBGE sync.
+CITY_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Seconds after which a process reads the City table again, so a sync
+# made by another process reaches its index and responses
+CITY_INDEX_TTL = 10 * 60
+
+# Gzipped CSV (name,state) of the municipalities, loaded by the 0002
+# migration so a new database needs no network
+CITY_SNAPSHOT_PATH = Path(__file__).resolve().parent / 'data' / 'cities.csv.gz'
+
+# Tuple of the id, name and state of a city
+CityRow = tuple[int, str, str]
+
+
+# Tuple of the IBGE code, name and state of a municipality
+IBGECity = tuple[int, str, str]
+
+CITY_SYNC_BATCH_SIZE = 500
+
+
+def parse_ibge_cities(municipalities: Iterable[dict[str, Any]]) -> list[IBGECity]:
+    """
+    Return the code, name and state of the municipalities of the
+    IBGE localities API, sorted by state and name
+    """
+    return sorted({
+        (
+            municipality['id'],
+            municipality['nome'],
+            municipality['regiao-imediata']['regiao-intermediaria']['UF']['sigla']
+        )
+        for municipality in municipalities
+    }, key=lambda city: (city[2], city[1]))
+
+
+@dataclass
+class CitySyncResult:
+    created: int = 0
+    renamed: int = 0
+    # Existing cities matched by name and state that got their IBGE code
+    linked: int = 0
+
+
+def sync_cities(municipalities: list[IBGECity]) -> CitySyncResult:
+    """
+    Diff the municipalities against the City table in memory and apply
+    only the differences: bulk inserts of the new codes and one bulk
+    update of the renamed cities and of the ones without a code yet.
+    Cities missing from the list are kept, since businesses refer to them.
+    """
+    from .models import City
+
+    cities = list(City.objects.only('id', 'name', 'state', 'ibge_code'))
+    by_code = {city.ibge_code: city for city in cities if city.ibge_code is not None}
+    by_name = {(city.name, city.state): city for city in cities if city.ibge_code is None}
+
+    result = CitySyncResult()
+    created: list[City] = []
+    updated: list[City] = []
+    for code, name, state in municipalities:
+        city = by_code.get(code)
+        if city is None:
+            city = by_name.pop((name, state), None)
+            if city is None:
+                created.append(City(ibge_code=code, name=name, state=state))
+                continue
+            result.linked += 1
+        elif (city.name, city.state) == (name, state):
+            continue
+        else:
+            result.renamed += 1
+        city.ibge_code, city.name, city.state = code, name, state
+        updated.append(city)
+
+    if not created and not updated:
+        return result
+
+    with transaction.atomic():
+        City.objects.bulk_update(updated, ['ibge_code', 'name', 'state'], batch_size=CITY_SYNC_BATCH_SIZE)
+        City.objects.bulk_create(created, batch_size=CITY_SYNC_BATCH_SIZE)
+    result.created = len(created)
+
+    transaction.on_commit(reset_city_index)
+    return result
+
+
+def read_city_snapshot(path: Path = CITY_SNAPSHOT_PATH) -> list[tuple[str, str]]:
+    """
+    Return the name and state of the cities of a snapshot
+    """
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as snapshot:
+        return [(row['name'], row['state']) for row in csv.DictReader(snapshot)]
+
+
+def write_city_snapshot(cities: Iterable[tuple[str, str]], path: Path = CITY_SNAPSHOT_PATH) -> None:
+    """
+    Write the cities as a snapshot, sorted by state and name
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['name', 'state'])
+    writer.writerows(sorted(set(cities), key=lambda city: (city[1], city[0])))
+    # mtime=0 keeps the file the same when the cities are
+    path.write_bytes(gzip.compress(buffer.getvalue().encode(), compresslevel=9, mtime=0))
+
+
+class CityIndex:
+    """
+    Sorted arrays of the folded city names, overall and by state. A prefix
+    search is two binary searches, so each lookup costs O(log n) with no
+    query. The City table only changes with the IBGE sync, so the index
+    is built once per process, by warm_city_cache() when the WSGI module
+    is loaded, and only rebuilt when a reload finds other cities.
+    """
+    __slots__ = ('keys', 'rows', 'states')
+
+    def __init__(self, cities: list[CityRow]) -> None:
+        entries = sorted((fold(name), name, city_id, state) for city_id, name, state in cities)
+        self.keys = [key for key, *_ in entries]
+        self.rows: list[CityRow] = [(city_id, name, state) for _, name, city_id, state in entries]
+
+        by_state: dict[str, tuple[list[str], list[CityRow]]] = {}
+        for key, row in zip(self.keys, self.rows):
+            keys, rows = by_state.setdefault(row[2], ([], []))
+            keys.append(key)
+            rows.append(row)
+        self.states = by_state
+
+    def search(
+        self,
+        query: str,
+        state: str | None = None,
+        limit: int = AUTOCOMPLETE_LIMIT
+    ) -> list[CityRow]:
+        """
+        Return the cities whose folded name starts with the folded query,
+        in alphabetical order
+        """
+        prefix = fold(query)
+        keys, rows = (self.keys, self.rows) if state is None else self.states.get(state, ([], []))
+
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and end - start < limit and keys[end].startswith(prefix):
+            end += 1
+        return rows[start:end]
+
+
+class RenderedJSON:
+    """
+    JSON body rendered once, with its gzip encoding when it is smaller,
+    and a strong ETag for each encoding
+    """
+    __slots__ = ('body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, data: Any) -> None:
+        # Same bytes as the JSONRenderer of the API
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+        # mtime=0 keeps the gzip bytes the same in every process
+        compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.gzip_body = compressed if len(compressed) < len(self.body) else None
+
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+class CityResponses:
+    """
+    Pre-rendered JSON of the whole city list, of the list of each
+    state and of each city, in the format of CitySerializer
+    """
+    __slots__ = ('all', 'by_state', 'by_id', 'empty')
+
+    def __init__(self, cities: list[CityRow]) -> None:
+        by_state: dict[str, list[dict[str, Any]]] = {}
+        by_id: dict[int, dict[str, Any]] = {}
+        for city_id, name, state in sorted(cities):
+            city = {'id': city_id, 'name': name, 'state': state}
+            by_state.setdefault(state, []).append(city)
+            by_id[city_id] = city
+
+        self.all = RenderedJSON(list(by_id.values()))
+        self.by_state = {state: RenderedJSON(rows) for state, rows in by_state.items()}
+        self.by_id = {city_id: RenderedJSON(city) for city_id, city in by_id.items()}
+        self.empty = RenderedJSON([])
+
+    def list(self, state: str | None = None) -> RenderedJSON:
+        if state is None:
+            return self.all
+        return self.by_state.get(state, self.empty)
+
+
+def load_cities() -> list[CityRow]:
+    from .models import City
+
+    return list(City.objects.order_by('id').values_list('id', 'name', 'state'))
+
+
+_cities: list[CityRow] | None = None
+_cities_loaded_at = 0.0
+_index: CityIndex | None = None
+_responses: CityResponses | None = None
+_index_lock = Lock()
+
+
+def get_cities() -> list[CityRow]:
+    """
+    Return the cities of the process, loading them on first use and
+    again after CITY_INDEX_TTL seconds. The index and the responses
+    are dropped only when the reload finds other cities.
+    """
+    global _cities, _cities_loaded_at, _index, _responses
+
+    if _cities is not None and time.monotonic() - _cities_loaded_at < CITY_INDEX_TTL:
+        return _cities
+
+    with _index_lock:
+        if _cities is None or time.monotonic() - _cities_loaded_at >= CITY_INDEX_TTL:
+            cities = load_cities()
+            if cities != _cities:
+                _cities, _index, _responses = cities, None, None
+            _cities_loaded_at = time.monotonic()
+        return _cities
+
+
+def get_city_index() -> CityIndex:
+    """
+    Return the index of the process, building it on first use
+    """
+    global _index
+
+    cities = get_cities()
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                # The cities of the process, unless a reset dropped them
+                _index = CityIndex(_cities if _cities is not None else cities)
+            index = _index
+    return index
+
+
+def get_city_responses() -> CityResponses:
+    """
+    Return the pre-rendered responses of the process, rendering
+    them on first use
+    """
+    global _responses
+
+    cities = get_cities()
+    responses = _responses
+    if responses is None:
+        with _index_lock:
+            if _responses is None:
+                _responses = CityResponses(_cities if _cities is not None else cities)
+            responses = _responses
+    return responses
+
+
+def reset_city_index() -> None:
+    """
+    Drop the cities, the index and the pre-rendered responses of the
+    process, so the next request rebuilds them from the City table
+    """
+    global _cities, _index, _responses
+    _cities = None
+    _index = None
+    _responses = None
+
+
+def warm_city_cache() -> None:
+    """
+    Build the index and the pre-rendered responses before the first
+    request, which would otherwise pay for them. A server that loads the
+    WSGI module before forking (gunicorn --preload) hands them to its
+    workers already built. Nothing is built when the City table cannot
+    be read yet, as before the first migrate.
+    """
+    try:
+        get_city_index()
+        get_city_responses()
+    except DatabaseError:
+        reset_city_index()
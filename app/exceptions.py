@@ -0,0 +1,15 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.views import exception_handler as drf_exception_handler
+from rest_framework.response import Response
+from typing import Any
+
+
+def exception_handler(exc: Exception, context: dict[str, Any]) -> Response | None:
+    """
+    Return the ValidationError raised by Model.full_clean() on save
+    as a 400 response, like the errors raised by the serializers
+    """
+    if isinstance(exc, DjangoValidationError):
+        exc = serializers.ValidationError(serializers.as_serializer_error(exc))
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from .utils import HolidayScope
+from datetime import date, timedelta
+from threading import Lock
+from typing import Iterable, TYPE_CHECKING
+import time
+import zlib
+
+if TYPE_CHECKING:
+    from .models import Business
+
+
+# Reload the in-memory calendar at most once in this interval, so the
+# holidays loaded by other processes are eventually seen
+HOLIDAY_CALENDAR_TTL = 60 * 60
+
+FIXED_NATIONAL_HOLIDAYS = [
+    (1, 1, 'Confraternização Universal'),
+    (4, 21, 'Tiradentes'),
+    (5, 1, 'Dia do Trabalho'),
+    (9, 7, 'Independência do Brasil'),
+    (10, 12, 'Nossa Senhora Aparecida'),
+    (11, 2, 'Finados'),
+    (11, 15, 'Proclamação da República'),
+    (12, 25, 'Natal'),
+]
+
+# Offsets in days from Easter Sunday
+MOVABLE_NATIONAL_HOLIDAYS = [
+    (-2, 'Sexta-feira Santa'),
+]
+
+# Federal optional days off (ponto facultativo), holidays only in the
+# states and cities whose laws say so, so they are loaded per state or city
+MOVABLE_REGIONAL_HOLIDAYS = [
+    (-48, 'Carnaval'),
+    (-47, 'Carnaval'),
+    (60, 'Corpus Christi'),
+]
+
+
+def easter(year: int) -> date:
+    """
+    Return the Easter Sunday of a year in the Gregorian calendar
+    (anonymous Gregorian algorithm)
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def national_holidays(year: int) -> list[tuple[date, str]]:
+    """
+    Return the national holidays of a year, sorted by date
+    """
+    holidays = [
+        (date(year, month, day), name)
+        for month, day, name in FIXED_NATIONAL_HOLIDAYS
+    ]
+    # National holiday since Law 14.759/2023
+    if year >= 2024:
+        holidays.append((date(year, 11, 20), 'Dia Nacional de Zumbi e da Consciência Negra'))
+
+    easter_sunday = easter(year)
+    holidays.extend(
+        (easter_sunday + timedelta(days=offset), name)
+        for offset, name in MOVABLE_NATIONAL_HOLIDAYS
+    )
+    return sorted(holidays)
+
+
+def regional_movable_holidays(year: int) -> list[tuple[date, str]]:
+    """
+    Return the Carnaval and Corpus Christi days of a year, sorted by date
+    """
+    easter_sunday = easter(year)
+    return [
+        (easter_sunday + timedelta(days=offset), name)
+        for offset, name in MOVABLE_REGIONAL_HOLIDAYS
+    ]
+
+
+class HolidayCalendar:
+    """
+    Immutable in-memory index of the holidays. The lookup by
+    date and city is a few set membership tests, with no query.
+    """
+    __slots__ = ('national', 'by_state', 'by_city', 'city_states', 'version')
+
+    def __init__(
+        self,
+        holidays: Iterable[tuple[date, str, str, int | None]],
+        city_states: dict[int, str]
+    ) -> None:
+        national: set[date] = set()
+        by_state: dict[str, set[date]] = {}
+        by_city: dict[int, set[date]] = {}
+        for day, scope, state, city_id in holidays:
+            if scope == HolidayScope.NATIONAL.name:
+                national.add(day)
+            elif scope == HolidayScope.STATE.name:
+                by_state.setdefault(state, set()).add(day)
+            elif scope == HolidayScope.MUNICIPAL.name:
+                by_city.setdefault(city_id, set()).add(day)
+
+        self.national = frozenset(national)
+        self.by_state = {state: frozenset(days) for state, days in by_state.items()}
+        self.by_city = {city_id: frozenset(days) for city_id, days in by_city.items()}
+        self.city_states = city_states
+        # Same holidays give the same version in every process
+        self.version = zlib.crc32(repr((
+            sorted(self.national),
+            sorted((state, sorted(days)) for state, days in self.by_state.items()),
+            sorted((city_id, sorted(days)) for city_id, days in self.by_city.items())
+        )).encode())
+
+    def is_holiday(self, day: date, city_id: int | None = None) -> bool:
+        """
+        Check if the date is a national holiday or a holiday
+        of the city or of its state
+        """
+        if day in self.national:
+            return True
+        if city_id is None:
+            return False
+        if day in self.by_city.get(city_id, ()):
+            return True
+        state = self.city_states.get(city_id)
+        return state is not None and day in self.by_state.get(state, ())
+
+
+_calendar: HolidayCalendar | None = None
+_calendar_loaded_at = 0.0
+_calendar_lock = Lock()
+
+
+def load_holiday_calendar() -> HolidayCalendar:
+    """
+    Build the calendar from the Holiday and City tables
+    """
+    from .models import City, Holiday
+
+    return HolidayCalendar(
+        Holiday.objects.values_list('date', 'scope', 'state', 'city_id'),
+        dict(City.objects.values_list('id', 'state'))
+    )
+
+
+def get_holiday_calendar() -> HolidayCalendar:
+    """
+    Return the calendar of the process, loading it on first use
+    and again after HOLIDAY_CALENDAR_TTL seconds
+    """
+    global _calendar, _calendar_loaded_at
+
+    if _calendar is not None and time.monotonic() - _calendar_loaded_at < HOLIDAY_CALENDAR_TTL:
+        return _calendar
+
+    with _calendar_lock:
+        if _calendar is None or time.monotonic() - _calendar_loaded_at >= HOLIDAY_CALENDAR_TTL:
+            _calendar = load_holiday_calendar()
+            _calendar_loaded_at = time.monotonic()
+    return _calendar
+
+
+def reset_holiday_calendar() -> None:
+    """
+    Drop the calendar of the process, so the next lookup reloads it
+    """
+    global _calendar
+    _calendar = None
+
+
+def is_holiday(day: date, city_id: int | None = None) -> bool:
+    return get_holiday_calendar().is_holiday(day, city_id)
+
+
+def is_closed_on_holiday(business: Business, day: date) -> bool:
+    """
+    Check if the business does not work on the date because it is
+    closed on holidays and the date is a holiday in its city
+    """
+    return business.closed_on_holidays and is_holiday(day, business.city_id)
@@ -0,0 +1,151 @@
+from .models import Appointment
+from .utils import AppointmentStatus
+from datetime import datetime, timedelta, timezone
+from django.db.models import Count, Max, QuerySet
+from rest_framework.renderers import BaseRenderer
+from typing import Any, Iterator
+
+
+# Appointments older than this are left out of the feeds
+ICS_PAST_DAYS = 90
+ICS_CHUNK_SIZE = 500
+
+ICS_STATUS = {
+    AppointmentStatus.SCHEDULED.name: 'TENTATIVE',
+    AppointmentStatus.CONFIRMED.name: 'CONFIRMED',
+    AppointmentStatus.CANCELLED.name: 'CANCELLED',
+    AppointmentStatus.COMPLETED.name: 'CONFIRMED',
+}
+
+
+class ICalendarRenderer(BaseRenderer):
+    """
+    Lets clients that ask for text/calendar through content negotiation.
+    The feeds are streamed, so this renderer is only used for errors,
+    whose message is rendered as plain text.
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: str | None = None,
+        renderer_context: dict | None = None
+    ) -> bytes:
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode(self.charset)
+
+
+def escape_text(value: str) -> str:
+    """
+    Escape a TEXT value (RFC 5545, section 3.3.11)
+    """
+    return (
+        value
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold_line(line: str) -> str:
+    """
+    Fold a content line in chunks of at most 75 octets (RFC 5545, section 3.1)
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    chunks: list[str] = []
+    current = ''
+    limit = 75
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            chunks.append(current)
+            current = ''
+            # Continuation lines start with a space
+            limit = 74
+        current += char
+    chunks.append(current)
+    return '\r\n '.join(chunks) + '\r\n'
+
+
+def format_datetime(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def feed_queryset(
+    appointments: QuerySet[Appointment],
+    now: datetime
+) -> QuerySet[Appointment]:
+    """
+    Restrict the appointments to the window published in the feeds
+    """
+    return appointments.filter(end_datetime__gte=now - timedelta(days=ICS_PAST_DAYS))
+
+
+def feed_etag(appointments: QuerySet[Appointment]) -> str:
+    """
+    Compute the ETag of a feed from the number of appointments and the
+    latest update of them and of the services and customers in their
+    SUMMARY, so a rename changes it too, with one aggregate query
+    """
+    summary = appointments.aggregate(
+        count=Count('id'),
+        last_update=Max('updated_at'),
+        service_update=Max('service__updated_at'),
+        customer_update=Max('customer__updated_at')
+    )
+    updates = '-'.join(
+        str(summary[name].timestamp() if summary[name] else 0)
+        for name in ('last_update', 'service_update', 'customer_update')
+    )
+    return f'"{summary["count"]}-{updates}"'
+
+
+def iter_calendar(appointments: QuerySet[Appointment], name: str) -> Iterator[str]:
+    """
+    Yield an iCalendar document with one event per appointment,
+    reading the rows in chunks instead of loading them all
+    """
+    yield 'BEGIN:VCALENDAR\r\n'
+    yield 'VERSION:2.0\r\n'
+    yield 'PRODID:-//project-api//Appointments//PT\r\n'
+    yield 'CALSCALE:GREGORIAN\r\n'
+    yield fold_line(f'X-WR-CALNAME:{escape_text(name)}')
+
+    rows = (
+        appointments
+        .select_related('service', 'customer')
+        .only(
+            'id', 'datetime', 'end_datetime', 'status', 'updated_at',
+            'service__name', 'customer__name', 'customer__phone'
+        )
+        .order_by('datetime')
+        .iterator(chunk_size=ICS_CHUNK_SIZE)
+    )
+    for appointment in rows:
+        yield ''.join([
+            'BEGIN:VEVENT\r\n',
+            f'UID:appointment-{appointment.id}@project-api\r\n',
+            f'DTSTAMP:{format_datetime(appointment.updated_at)}\r\n',
+            f'LAST-MODIFIED:{format_datetime(appointment.updated_at)}\r\n',
+            f'DTSTART:{format_datetime(appointment.datetime)}\r\n',
+            f'DTEND:{format_datetime(appointment.end_datetime)}\r\n',
+            fold_line(
+                f'SUMMARY:{escape_text(appointment.service.name)}'
+                f' - {escape_text(appointment.customer.name)}'
+            ),
+            fold_line(f'DESCRIPTION:{escape_text(appointment.customer.phone)}'),
+            f'STATUS:{ICS_STATUS[appointment.status]}\r\n',
+            'END:VEVENT\r\n',
+        ])
+
+    yield 'END:VCALENDAR\r\n'
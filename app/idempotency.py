@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from .models import IdempotencyKey
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
+from typing import Callable
+import hashlib
+
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Time a stored response is replayed to the retries of its key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Time after which a request that never finished, because its process
+# died, stops blocking the retries of its key
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(minutes=1)
+
+
+def request_fingerprint(request: Request) -> str:
+    """
+    Hash of the method, path and body of the request, which tells
+    a retry from a different request reusing the same key
+    """
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def idempotent(request: Request, create: Callable[[], Response]) -> Response:
+    """
+    Run create() once per Idempotency-Key of the user and replay its
+    response to the retries, which cost one lookup on the unique index
+    of the key instead of a validation and an insert. The key is taken
+    with an insert before create() runs, so concurrent retries get a 409
+    instead of creating twice. Responses with a server error, and the
+    errors raised by create(), release the key so it can be retried.
+    Requests without the header, or anonymous ones, run as usual.
+    """
+    key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    if key is None or not request.user.is_authenticated:
+        return create()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise ValidationError({
+            IDEMPOTENCY_KEY_HEADER: [
+                f'Must have between 1 and {IDEMPOTENCY_KEY_MAX_LENGTH} characters.'
+            ]
+        })
+
+    fingerprint = request_fingerprint(request)
+    now = timezone.now()
+    stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+    if stored is not None and (
+        stored.expires_at <= now
+        or stored.status_code is None and stored.created_at <= now - IDEMPOTENCY_LOCK_TIMEOUT
+    ):
+        # Conditional, so a key taken again meanwhile is not deleted
+        IdempotencyKey.objects.filter(pk=stored.pk, created_at=stored.created_at).delete()
+        stored = None
+
+    if stored is not None:
+        if stored.status_code is None:
+            return Response(
+                {'detail': f'A request with this {IDEMPOTENCY_KEY_HEADER} is still running.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if stored.fingerprint != fingerprint:
+            return Response(
+                {'detail': f'The {IDEMPOTENCY_KEY_HEADER} was already used by a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        response = Response(stored.response, status=stored.status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    try:
+        # A savepoint, so the error does not break an outer transaction
+        with transaction.atomic():
+            stored = IdempotencyKey.objects.create(
+                user=request.user,
+                key=key,
+                fingerprint=fingerprint,
+                created_at=now,
+                expires_at=now + IDEMPOTENCY_KEY_TTL
+            )
+    except IntegrityError:
+        return Response(
+            {'detail': f'A request with this {IDEMPOTENCY_KEY_HEADER} is still running.'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    try:
+        response = create()
+    except BaseException:
+        IdempotencyKey.objects.filter(pk=stored.pk).delete()
+        raise
+
+    if response.status_code >= 500:
+        IdempotencyKey.objects.filter(pk=stored.pk).delete()
+    else:
+        IdempotencyKey.objects.filter(pk=stored.pk).update(
+            status_code=response.status_code,
+            response=response.data
+        )
+    return response
+
+
+def purge_idempotency_keys() -> int:
+    """
+    Delete the expired keys through the index on expires_at
+    and return how many were deleted
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
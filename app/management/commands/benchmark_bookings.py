@@ -0,0 +1,137 @@
+from app.booking import book_appointment
+from app.models import Appointment, Business, City, Customer, Professional, Service
+from app.validators import SP_TZ
+from datetime import datetime, time as dt_time, timedelta
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from threading import Barrier, Lock, Thread
+from typing import Any
+import random
+import time
+
+
+SCHEDULE = {
+    str(weekday): {'start': '08:00', 'end': '18:00', 'breaks': []}
+    for weekday in range(7)
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Book the same slots of one professional from many threads at once '
+        'and report the bookings per second and the double bookings. The '
+        'rows are committed, since every thread has its own connection, '
+        'and deleted at the end.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=50, help='Bookings tried by each thread')
+        parser.add_argument('--slots', type=int, default=40, help='Distinct 30 minute slots to compete for')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        business = Business.objects.create(
+            name='Booking Benchmark',
+            category='C1',
+            city=City.objects.first(),
+            address='Rua 1',
+            public_phone='1234567890',
+            restricted_phone='1234567890',
+            email='benchmark@example.com',
+            schedule=SCHEDULE,
+            closed_on_holidays=False
+        )
+        try:
+            self.run(business, options['threads'], options['attempts'], options['slots'])
+        finally:
+            # Cascades to the professional, customer, service and appointments
+            business.delete()
+
+    def run(self, business: Business, threads: int, attempts: int, slots: int) -> None:
+        professional = Professional.objects.create(
+            business=business,
+            name='Benchmark Professional',
+            cpf='11144477735',
+            speciality='Dentista',
+            email='professional@example.com',
+            phone='11995954250',
+            schedule=SCHEDULE
+        )
+        customer = Customer.objects.create(
+            business=business,
+            name='Benchmark Customer',
+            registration_source='WHATSAPP',
+            cpf='11144477735',
+            phone='11995954250'
+        )
+        service = Service.objects.create(
+            business=business,
+            name='Benchmark Service',
+            description='Benchmark',
+            price=100,
+            duration=timedelta(minutes=30)
+        )
+
+        # Slots of 30 minutes between 08:00 and 18:00 from tomorrow on
+        first_day = datetime.now(tz=SP_TZ).date() + timedelta(days=1)
+        starts = [
+            datetime.combine(first_day + timedelta(days=index // 20), dt_time(8), tzinfo=SP_TZ)
+            + timedelta(minutes=30 * (index % 20))
+            for index in range(slots)
+        ]
+
+        counts = {'booked': 0, 'conflicts': 0}
+        counts_lock = Lock()
+        barrier = Barrier(threads)
+
+        def book() -> None:
+            booked = conflicts = 0
+            try:
+                barrier.wait()
+                for _ in range(attempts):
+                    appointment = Appointment(
+                        business=business,
+                        customer=customer,
+                        service=service,
+                        professional=professional,
+                        datetime=random.choice(starts),
+                        source='WHATSAPP'
+                    )
+                    try:
+                        book_appointment(appointment, fast=True)
+                        booked += 1
+                    except ValidationError:
+                        conflicts += 1
+            finally:
+                connection.close()
+                with counts_lock:
+                    counts['booked'] += booked
+                    counts['conflicts'] += conflicts
+
+        workers = [Thread(target=book) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        periods = sorted(
+            Appointment.objects.active()
+            .filter(professional=professional)
+            .values_list('datetime', 'end_datetime')
+        )
+        double_bookings = sum(
+            next_start < end
+            for (_, end), (next_start, _) in zip(periods, periods[1:])
+        )
+
+        total = threads * attempts
+        self.stdout.write(
+            f'{total} attempts from {threads} threads in {elapsed:.2f} s '
+            f'({total / elapsed:.0f} bookings per second): {counts["booked"]} booked, '
+            f'{counts["conflicts"]} conflicts and {double_bookings} double bookings.'
+        )
+        if double_bookings or counts['booked'] != len(periods):
+            raise CommandError('The professional was double booked.')
@@ -0,0 +1,70 @@
+from app.models import Business, City, Customer
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from typing import Any
+import time
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the queries and time per write of Model.save() and '
+        'Model.save(fast=True). The rows are rolled back at the end.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--rows', type=int, default=500)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        rows = options['rows']
+        try:
+            with transaction.atomic():
+                business = Business.objects.create(
+                    name='Benchmark',
+                    category='C1',
+                    city=City.objects.first(),
+                    address='Rua 1',
+                    public_phone='1234567890',
+                    restricted_phone='1234567890',
+                    email='benchmark@example.com',
+                    schedule={'1': {'start': '08:00', 'end': '17:00', 'breaks': []}},
+                    closed_on_holidays=False
+                )
+                for fast in (False, True):
+                    self.run(business, rows, fast)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, business: Business, rows: int, fast: bool) -> None:
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            for index in range(rows):
+                Customer(
+                    business=business,
+                    name=f'Customer {index}',
+                    registration_source='WEBSITE',
+                    cpf=self.cpf(index + fast * rows),
+                    phone='11995954250'
+                ).save(fast=fast)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f'save(fast={fast}): {len(context.captured_queries) / rows:.1f} queries '
+            f'and {elapsed / rows * 1000:.2f} ms per write'
+        )
+
+    @staticmethod
+    def cpf(number: int) -> str:
+        """
+        Build a valid CPF from a number
+        """
+        digits = [int(digit) for digit in f'{100000000 + number:09d}']
+        for size in (9, 10):
+            total = sum(digit * (size + 1 - index) for index, digit in enumerate(digits))
+            digits.append(total * 10 % 11 % 10)
+        return ''.join(map(str, digits))
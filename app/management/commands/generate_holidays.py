@@ -0,0 +1,58 @@
+from app.holidays import national_holidays, regional_movable_holidays
+from app.models import City, Holiday
+from app.utils import HolidayScope
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from typing import Any
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the national holidays, fixed and movable, of a range of years. '
+        'With --state, and optionally --city, create instead the Carnaval and '
+        'Corpus Christi days of that state or city.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        current_year = date.today().year
+        parser.add_argument('--start-year', type=int, default=current_year)
+        parser.add_argument('--end-year', type=int, default=current_year + 10)
+        parser.add_argument('--state')
+        parser.add_argument('--city')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        years = range(options['start_year'], options['end_year'] + 1)
+        state = (options['state'] or '').strip().upper()
+        city_name = (options['city'] or '').strip()
+
+        if city_name and not state:
+            raise CommandError('--city requires --state.')
+
+        if not state:
+            holidays = [
+                Holiday(date=day, name=name, scope=HolidayScope.NATIONAL.name)
+                for year in years
+                for day, name in national_holidays(year)
+            ]
+        elif city_name:
+            city = City.objects.filter(name__iexact=city_name, state=state).first()
+            if city is None:
+                raise CommandError(f'Unknown city {city_name!r} in {state}.')
+            holidays = [
+                Holiday(
+                    date=day, name=name, scope=HolidayScope.MUNICIPAL.name,
+                    state=state, city=city
+                )
+                for year in years
+                for day, name in regional_movable_holidays(year)
+            ]
+        else:
+            holidays = [
+                Holiday(date=day, name=name, scope=HolidayScope.STATE.name, state=state)
+                for year in years
+                for day, name in regional_movable_holidays(year)
+            ]
+
+        # The existing dates are kept by the unique constraints
+        created = Holiday.objects.bulk_create(holidays, ignore_conflicts=True)
+        self.stdout.write(f'{len(created)} holidays processed.')
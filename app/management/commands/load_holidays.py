@@ -0,0 +1,52 @@
+from app.models import City, Holiday
+from app.utils import HolidayScope
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from typing import Any
+import csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Load state and municipal holidays from a CSV file with the columns '
+        'date (YYYY-MM-DD), name, state and city. Rows without a city are '
+        'state holidays.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+
+        # Resolve every city with one query
+        cities = {
+            (name.casefold(), state): city_id
+            for city_id, name, state in City.objects.values_list('id', 'name', 'state')
+        }
+
+        holidays = []
+        for line, row in enumerate(rows, start=2):
+            state = row['state'].strip().upper()
+            city_name = (row.get('city') or '').strip()
+            try:
+                day = date.fromisoformat(row['date'].strip())
+            except ValueError:
+                raise CommandError(f'Line {line}: invalid date {row["date"]!r}.')
+
+            if city_name:
+                city_id = cities.get((city_name.casefold(), state))
+                if city_id is None:
+                    raise CommandError(f'Line {line}: unknown city {city_name!r} in {state}.')
+                holidays.append(Holiday(
+                    date=day, name=row['name'].strip(), scope=HolidayScope.MUNICIPAL.name,
+                    state=state, city_id=city_id
+                ))
+            else:
+                holidays.append(Holiday(
+                    date=day, name=row['name'].strip(), scope=HolidayScope.STATE.name, state=state
+                ))
+
+        created = Holiday.objects.bulk_create(holidays, ignore_conflicts=True)
+        self.stdout.write(f'{len(created)} holidays processed.')
@@ -0,0 +1,14 @@
+from app.idempotency import purge_idempotency_keys
+from django.core.management.base import BaseCommand
+from typing import Any
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the expired Idempotency-Key responses. Expired keys are '
+        'never replayed, so this only keeps the table small.'
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        deleted = purge_idempotency_keys()
+        self.stdout.write(f'Deleted {deleted} expired idempotency keys.')
@@ -0,0 +1,43 @@
+from app.cities import parse_ibge_cities, sync_cities, write_city_snapshot
+from app.utils import fetch_cities
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from pathlib import Path
+from typing import Any
+
+
+class Command(BaseCommand):
+    help = 'Fetch the municipalities from IBGE and apply the new and renamed cities'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--url', default=settings.IBGE_MUNICIPALITIES_URL)
+        parser.add_argument(
+            '--cache-dir',
+            type=Path,
+            default=settings.IBGE_CACHE_DIR,
+            help='Directory of the last response, sent back as a conditional request'
+        )
+        parser.add_argument('--no-cache', action='store_true')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument(
+            '--write-snapshot',
+            action='store_true',
+            help='Also rewrite the bundled snapshot loaded by the migrations'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        municipalities = parse_ibge_cities(fetch_cities(
+            options['url'],
+            cache_dir=None if options['no_cache'] else options['cache_dir'],
+            timeout=options['timeout']
+        ))
+
+        result = sync_cities(municipalities)
+        self.stdout.write(
+            f'{len(municipalities)} municipalities fetched: {result.created} cities created, '
+            f'{result.renamed} renamed and {result.linked} linked to their IBGE code.'
+        )
+
+        if options['write_snapshot']:
+            write_city_snapshot((name, state) for _, name, state in municipalities)
+            self.stdout.write(f'{len(municipalities)} cities written to the snapshot.')
@@ -1,25 +1,16 @@
-from app.utils import fetch_cities
-from typing import Any, Iterable
+from app.cities import read_city_snapshot
 from django.db import migrations
 
 
-
 def populate_cities(apps, schema_editor):
     City = apps.get_model('app', 'City')
-    
-    # Get cities data
-    cities_data: Iterable[dict[str, Any]] = fetch_cities()
-    
-    # Create cities in the database
-    for city_data in cities_data:
-        city_name = city_data['nome']
-        state_uf = city_data['regiao-imediata']['regiao-intermediaria']['UF']['sigla']
-        
-        if not City.objects.filter(name=city_name, state=state_uf).exists():
-            City.objects.create(
-                name=city_name,
-                state=state_uf
-            )
+
+    # Bundled snapshot, so migrate needs no network. The cities are
+    # refreshed from IBGE with the sync_cities command.
+    City.objects.bulk_create(
+        [City(name=name, state=state) for name, state in read_city_snapshot()],
+        ignore_conflicts=True
+    )
 
 def reverse_populate_cities(apps, schema_editor):
     City = apps.get_model('app', 'City')
@@ -32,4 +23,4 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.RunPython(populate_cities, reverse_code=reverse_populate_cities),
-    ] 
\ No newline at end of file
+    ]
@@ -0,0 +1,113 @@
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+# Only PostgreSQL supports exclusion constraints. Other databases rely on
+# Appointment.clean() and the appointment_professional_end index.
+CREATE_EXCLUSION_CONSTRAINT = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE app_appointment
+    ADD CONSTRAINT appointment_no_overlap
+    EXCLUDE USING gist (
+        professional_id WITH =,
+        tstzrange(datetime, end_datetime, '[)') WITH &&
+    )
+    WHERE (status <> 'CANCELLED')
+    """,
+]
+
+# Pairs of active appointments of the same professional that overlap,
+# which would make the exclusion constraint fail
+FIND_OVERLAPS = """
+    SELECT a.id, b.id, a.professional_id
+    FROM app_appointment a
+    JOIN app_appointment b
+        ON b.professional_id = a.professional_id
+        AND b.id > a.id
+        AND b.datetime < a.end_datetime
+        AND a.datetime < b.end_datetime
+    WHERE a.status <> 'CANCELLED' AND b.status <> 'CANCELLED'
+    ORDER BY a.id, b.id
+    LIMIT %s
+"""
+
+# Overlapping pairs listed in the error
+MAX_OVERLAPS_REPORTED = 20
+
+DROP_EXCLUSION_CONSTRAINT = [
+    "ALTER TABLE app_appointment DROP CONSTRAINT IF EXISTS appointment_no_overlap",
+]
+
+
+def populate_end_datetime(apps, schema_editor):
+    Appointment = apps.get_model('app', 'Appointment')
+    Service = apps.get_model('app', 'Service')
+
+    # One UPDATE, so the appointments are not loaded in memory
+    duration = Service.objects.filter(pk=OuterRef('service_id')).values('duration')[:1]
+    Appointment.objects.update(
+        end_datetime=F('datetime') + Subquery(duration, output_field=models.DurationField())
+    )
+
+
+def check_overlaps(schema_editor):
+    """
+    Fail with the overlapping appointments, instead of the error of
+    the constraint, so they can be cancelled or moved before migrating
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FIND_OVERLAPS, [MAX_OVERLAPS_REPORTED + 1])
+        overlaps = cursor.fetchall()
+    if not overlaps:
+        return
+
+    pairs = '\n'.join(
+        f'  appointments {first} and {second} of professional {professional}'
+        for first, second, professional in overlaps[:MAX_OVERLAPS_REPORTED]
+    )
+    more = '\n  ...' if len(overlaps) > MAX_OVERLAPS_REPORTED else ''
+    raise RuntimeError(
+        'Cannot add the appointment_no_overlap constraint: these active '
+        'appointments of the same professional overlap. Cancel or move one '
+        'of each pair and run the migration again.\n' + pairs + more
+    )
+
+
+def create_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        check_overlaps(schema_editor)
+        for sql in CREATE_EXCLUSION_CONSTRAINT:
+            schema_editor.execute(sql)
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_EXCLUSION_CONSTRAINT:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_alter_business_schedule_alter_customer_birth_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='end_datetime',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_end_datetime, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_datetime',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['professional', 'end_datetime', 'datetime'], name='appointment_professional_end'),
+        ),
+        migrations.RunPython(create_exclusion_constraint, reverse_code=drop_exclusion_constraint),
+    ]
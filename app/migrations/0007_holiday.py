@@ -0,0 +1,53 @@
+from app.holidays import national_holidays
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# National holidays created with the table. Later years
+# are added with the generate_holidays command.
+FIRST_YEAR = 2020
+LAST_YEAR = 2050
+
+
+def populate_national_holidays(apps, schema_editor):
+    Holiday = apps.get_model('app', 'Holiday')
+
+    Holiday.objects.bulk_create(
+        [
+            Holiday(date=day, name=name, scope='NATIONAL')
+            for year in range(FIRST_YEAR, LAST_YEAR + 1)
+            for day, name in national_holidays(year)
+        ],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_appointment_end_datetime'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=80)),
+                ('scope', models.CharField(choices=[('NATIONAL', 'nacional'), ('STATE', 'estadual'), ('MUNICIPAL', 'municipal')], max_length=20)),
+                ('state', models.CharField(blank=True, default='', max_length=2)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.city')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('scope', 'NATIONAL')), fields=('date',), name='unique_national_holiday_date'),
+                    models.UniqueConstraint(condition=models.Q(('scope', 'STATE')), fields=('date', 'state'), name='unique_state_holiday_date'),
+                    models.UniqueConstraint(condition=models.Q(('scope', 'MUNICIPAL')), fields=('date', 'city'), name='unique_municipal_holiday_date'),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_national_holidays, reverse_code=migrations.RunPython.noop),
+    ]
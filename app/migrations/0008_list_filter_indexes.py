@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_holiday'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['business', 'professional', 'datetime'], name='appointment_business_prof_dt'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['business', 'status', 'datetime'], name='appointment_business_status_dt'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['customer', 'datetime'], name='appointment_customer_dt'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'is_active', 'is_opt_in'], name='customer_business_active'),
+        ),
+        migrations.AddIndex(
+            model_name='professional',
+            index=models.Index(fields=['business', 'is_active'], name='professional_business_active'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['datetime', 'id'], name='appointment_datetime_id'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_appointment_datetime_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='ibge_code',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.1 on 2026-10-18 04:04
+
+from app.utils import fold, standardize_email, standardize_numeric_string
+from django.db import migrations, models
+from itertools import islice
+
+
+# Only PostgreSQL has trigram indexes. They serve the word prefix
+# match of customer_search (LIKE '% term%') on the folded name.
+CREATE_TRIGRAM_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX customer_search_name_trgm ON app_customer USING gin (search_name gin_trgm_ops)",
+]
+
+DROP_TRIGRAM_INDEX = [
+    "DROP INDEX IF EXISTS customer_search_name_trgm",
+]
+
+
+def populate_search_fields(apps, schema_editor):
+    Customer = apps.get_model('app', 'Customer')
+
+    # Only one batch of customers is kept in memory at a time
+    rows = (
+        Customer.objects
+        .only('pk', 'name', 'email', 'cpf', 'phone')
+        .iterator(chunk_size=1000)
+    )
+    while customers := list(islice(rows, 1000)):
+        for customer in customers:
+            customer.search_name = fold(customer.name)
+            customer.search_phone = standardize_numeric_string(customer.phone)
+            customer.search_cpf = standardize_numeric_string(customer.cpf)
+            customer.search_email = (
+                standardize_email(customer.email) if customer.email else ''
+            )
+        Customer.objects.bulk_update(
+            customers,
+            ['search_name', 'search_phone', 'search_cpf', 'search_email']
+        )
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_TRIGRAM_INDEX:
+            schema_editor.execute(sql)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in DROP_TRIGRAM_INDEX:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_city_ibge_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='search_cpf',
+            field=models.CharField(blank=True, default='', editable=False, max_length=14),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_email',
+            field=models.CharField(blank=True, default='', editable=False, max_length=60),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_phone',
+            field=models.CharField(blank=True, default='', editable=False, max_length=15),
+        ),
+        migrations.RunPython(populate_search_fields, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'search_name'], name='customer_business_name', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'search_phone'], name='customer_business_phone'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'search_cpf'], name='customer_business_cpf'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['business', 'search_email'], name='customer_business_email'),
+        ),
+        migrations.RunPython(create_trigram_index, reverse_code=drop_trigram_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_customer_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='customer_business_active',
+        ),
+        migrations.RemoveIndex(
+            model_name='professional',
+            name='professional_business_active',
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='business_active_id'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business', 'is_opt_in'], name='customer_active_business'),
+        ),
+        migrations.AddIndex(
+            model_name='professional',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business'], name='professional_active_business'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business'], name='service_active_business'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professional',
+            name='availability_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 04:35
+
+import app.models
+from django.db import migrations, models
+from itertools import islice
+import secrets
+
+
+def populate_calendar_tokens(apps, schema_editor):
+    # AddField sets the same default on every existing row
+    for model_name in ('Business', 'Professional'):
+        model = apps.get_model('app', model_name)
+        rows = model.objects.only('pk').iterator(chunk_size=1000)
+        while batch := list(islice(rows, 1000)):
+            for row in batch:
+                row.calendar_token = secrets.token_urlsafe(32)
+            model.objects.bulk_update(batch, ['calendar_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_professional_availability_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='calendar_token',
+            field=models.CharField(default=app.models.new_calendar_token, editable=False, max_length=43),
+        ),
+        migrations.AddField(
+            model_name='professional',
+            name='calendar_token',
+            field=models.CharField(default=app.models.new_calendar_token, editable=False, max_length=43),
+        ),
+        migrations.RunPython(populate_calendar_tokens, reverse_code=migrations.RunPython.noop),
+    ]
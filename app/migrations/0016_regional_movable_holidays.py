@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def delete_national_carnaval_and_corpus_christi(apps, schema_editor):
+    # Created as national holidays by 0007, but they are optional days
+    # off nationwide and only holidays where a state or city says so
+    Holiday = apps.get_model('app', 'Holiday')
+    Holiday.objects.filter(
+        scope='NATIONAL',
+        name__in=['Carnaval', 'Corpus Christi']
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_calendar_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_national_carnaval_and_corpus_christi,
+            reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from .utils import (
+    fold,
     standardize_numeric_string,
     standardize_email,
     Source,
     AppointmentStatus,
-    BusinessCategory
+    BusinessCategory,
+    HolidayScope
 )
 from .validators import (
     validate_price,
@@ -15,9 +17,20 @@ from .validators import (
     validate_duration,
     validate_phone_number,
     validate_birth_date,
-    validate_schedule
+    validate_schedule,
+    SP_TZ
 )
-from django.db import models
+from .holidays import is_closed_on_holiday
+from .schedules import CompiledScheduleMixin, cache_compiled_schedule
+from contextlib import contextmanager
+from datetime import datetime
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, models
+from django.db.models import Q
+from typing import Iterator
+import secrets
 
 
 SOURCE_CHOICES = [
@@ -25,9 +38,87 @@ SOURCE_CHOICES = [
 ]
 
 
+def constraint_error(instance: models.Model, exc: IntegrityError) -> ValidationError | None:
+    """
+    Return the ValidationError full_clean() raises for the constraint
+    violated in the IntegrityError, or None for other errors. PostgreSQL
+    names the constraint and SQLite lists the columns of the unique index.
+    """
+    message = str(exc)
+    messages = getattr(instance, 'constraint_error_messages', {})
+    for name, error in messages.items():
+        if name in message:
+            return ValidationError({NON_FIELD_ERRORS: [ValidationError(error, code='constraint')]})
+
+    columns = None
+    if 'UNIQUE constraint failed: ' in message:
+        columns = {
+            column.rsplit('.', 1)[-1]
+            for column in message.split('UNIQUE constraint failed: ', 1)[1].split(', ')
+        }
+
+    meta = instance._meta
+    for constraint in meta.constraints:
+        if not isinstance(constraint, models.UniqueConstraint) or not constraint.fields:
+            continue
+        constraint_columns = {meta.get_field(field).column for field in constraint.fields}
+        if constraint.name in message or constraint_columns == columns:
+            if constraint.condition is None:
+                error = instance.unique_error_message(type(instance), constraint.fields)
+            else:
+                error = ValidationError(
+                    constraint.get_violation_error_message(),
+                    code=constraint.violation_error_code
+                )
+            return ValidationError({NON_FIELD_ERRORS: [error]})
+    return None
+
+
+def full_clean_for_save(instance: models.Model, fast: bool) -> None:
+    """
+    Run full_clean() before a write. The fast mode runs the field
+    validators and clean() but leaves to the database the unique
+    constraints and the foreign keys to related objects already loaded.
+    """
+    if not fast:
+        instance.full_clean()
+        return
+
+    loaded = [
+        field.name for field in instance._meta.concrete_fields
+        if field.is_relation and field.is_cached(instance)
+        and field.get_cached_value(instance) is not None
+    ]
+    instance.full_clean(exclude=loaded, validate_unique=False, validate_constraints=False)
+
+
+@contextmanager
+def constraint_errors(instance: models.Model) -> Iterator[None]:
+    """
+    Raise the IntegrityError of a known constraint as the
+    ValidationError full_clean() would raise before the write
+    """
+    try:
+        yield
+    except IntegrityError as exc:
+        error = constraint_error(instance, exc)
+        if error is None:
+            raise
+        raise error from exc
+
+
+def new_calendar_token() -> str:
+    """
+    Return a random secret for the URL of a calendar feed
+    """
+    return secrets.token_urlsafe(32)
+
+
 class City(models.Model):
     name = models.CharField(max_length=50)
     state = models.CharField(max_length=2)
+    # Municipality code of IBGE, set by sync_cities to detect renames
+    ibge_code = models.PositiveIntegerField(null=True, blank=True, unique=True, editable=False)
     
     class Meta:
         constraints = [
@@ -40,13 +131,77 @@ class City(models.Model):
     def __str__(self):
         return f"{self.name}/{self.state}"
 
-    def save(self, **kwargs):
+    def save(self, fast: bool = False, **kwargs):
+        # Run all validations for the model
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+
+
+class Holiday(models.Model):
+    SCOPE_CHOICES = [
+        (scope.name, scope.value) for scope in HolidayScope
+    ]
+
+    date = models.DateField()
+    name = models.CharField(max_length=80)
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    # Set for state holidays
+    state = models.CharField(max_length=2, blank=True, default='')
+    # Set for municipal holidays
+    city = models.ForeignKey(City, on_delete=models.CASCADE, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(scope=HolidayScope.NATIONAL.name),
+                name='unique_national_holiday_date'
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'state'],
+                condition=models.Q(scope=HolidayScope.STATE.name),
+                name='unique_state_holiday_date'
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'city'],
+                condition=models.Q(scope=HolidayScope.MUNICIPAL.name),
+                name='unique_municipal_holiday_date'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.name}"
+
+    def clean(self):
+        """
+        Check that the state or city is set according to the scope
+        """
+        if self.scope == HolidayScope.STATE.name and not self.state:
+            raise ValidationError('State holidays must have a state.')
+        if self.scope == HolidayScope.MUNICIPAL.name and self.city_id is None:
+            raise ValidationError('Municipal holidays must have a city.')
+
+    def save(self, fast: bool = False, **kwargs):
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+
+
+class ActiveQuerySet(models.QuerySet):
+
+    def active(self) -> ActiveQuerySet:
+        """
+        Rows that were not deactivated, served by the partial
+        indexes WHERE is_active
+        """
+        return self.filter(is_active=True)
 
 
-class Business(models.Model):
+class Business(CompiledScheduleMixin, models.Model):
     CATEGORY_CHOICES = [
         (category.name, category.value) for category in BusinessCategory
     ]
@@ -62,25 +217,41 @@ class Business(models.Model):
     schedule = models.JSONField(validators=[validate_schedule])
     closed_on_holidays = models.BooleanField()
     is_active = models.BooleanField(default=True)
+    # Secret of the calendar feed URL, for the apps that cannot send headers
+    calendar_token = models.CharField(max_length=43, default=new_calendar_token, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    objects = ActiveQuerySet.as_manager()
 
     class Meta:
+        # The unique constraints keep counting the inactive rows, so
+        # reactivating a record never conflicts
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'city', 'category'],
                 name='unique_name_category_city'
             )
         ]
+        indexes = [
+            # Serves the default list, of the active businesses
+            models.Index(
+                fields=['id'],
+                condition=models.Q(is_active=True),
+                name='business_active_id'
+            )
+        ]
 
     def __str__(self):
         return f"{self.name} | {self.category} | {self.city}"
 
-    def save(self, **kwargs):
+    def save(self, fast: bool = False, **kwargs):
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+        # Compile the schedule once per write
+        cache_compiled_schedule(self)
 
 
 class Customer(models.Model):
@@ -102,6 +273,15 @@ class Customer(models.Model):
     is_opt_in = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Normalized copies searched by customer_search, filled on every save
+    search_name = models.CharField(max_length=80, blank=True, default='', editable=False)
+    search_phone = models.CharField(max_length=15, blank=True, default='', editable=False)
+    search_cpf = models.CharField(max_length=14, blank=True, default='', editable=False)
+    search_email = models.CharField(max_length=60, blank=True, default='', editable=False)
+
+    search_fields = ['search_name', 'search_phone', 'search_cpf', 'search_email']
+
+    objects = ActiveQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -110,14 +290,60 @@ class Customer(models.Model):
                 name='unique_customer_business'
             )
         ]
+        indexes = [
+            # Serves the filters of the customer list, which
+            # lists the active customers by default
+            models.Index(
+                fields=['business', 'is_opt_in'],
+                condition=models.Q(is_active=True),
+                name='customer_active_business'
+            ),
+            # Serve customer_search. The pattern operator class lets
+            # PostgreSQL use the name index for prefix LIKE queries.
+            models.Index(
+                fields=['business', 'search_name'],
+                name='customer_business_name',
+                opclasses=['int8_ops', 'varchar_pattern_ops']
+            ),
+            models.Index(fields=['business', 'search_phone'], name='customer_business_phone'),
+            models.Index(fields=['business', 'search_cpf'], name='customer_business_cpf'),
+            models.Index(fields=['business', 'search_email'], name='customer_business_email')
+        ]
 
     def __str__(self):
         return self.name
 
-    def save(self, **kwargs):
+    def set_search_fields(self) -> None:
+        self.search_name = fold(self.name or '')
+        self.search_phone = standardize_numeric_string(self.phone or '')
+        self.search_cpf = standardize_numeric_string(self.cpf or '')
+        self.search_email = standardize_email(self.email) if self.email else ''
+
+    def save(self, fast: bool = False, **kwargs):
+        self.set_search_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.search_fields}
+
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+
+
+def customer_search(term: str) -> Q:
+    """
+    Filter of the customers whose email, CPF or phone is the term, or
+    whose name has a word starting with it, ignoring accents and case
+    """
+    if '@' in term:
+        return Q(search_email=standardize_email(term))
+
+    digits = standardize_numeric_string(term)
+    if digits and not any(char.isalpha() for char in term):
+        return Q(search_cpf=digits) | Q(search_phone=digits)
+
+    name = fold(term)
+    return Q(search_name__startswith=name) | Q(search_name__contains=f' {name}')
 
 
 class Service(models.Model):
@@ -134,6 +360,8 @@ class Service(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ActiveQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -141,17 +369,25 @@ class Service(models.Model):
                 name='unique_business_name'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['business'],
+                condition=models.Q(is_active=True),
+                name='service_active_business'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
-    def save(self, **kwargs):
+    def save(self, fast: bool = False, **kwargs):
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
 
 
-class Professional(models.Model):
+class Professional(CompiledScheduleMixin, models.Model):
     business = models.ForeignKey(Business, on_delete=models.CASCADE)
     name = models.CharField(max_length=80)
     cpf = models.CharField(
@@ -163,9 +399,17 @@ class Professional(models.Model):
     phone = models.CharField(max_length=15, validators=[validate_phone_number])
     is_active = models.BooleanField(default=True)
     schedule = models.JSONField(validators=[validate_schedule])
+    # Bumped after each committed change of the appointments or blocks of
+    # the professional. Part of the availability cache keys, so every
+    # process stops reading the stale entries, whatever the cache backend.
+    availability_version = models.PositiveIntegerField(default=0, editable=False)
+    # Secret of the calendar feed URL, for the apps that cannot send headers
+    calendar_token = models.CharField(max_length=43, default=new_calendar_token, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ActiveQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -173,14 +417,26 @@ class Professional(models.Model):
                 name='unique_business_professional'
             )
         ]
+        indexes = [
+            # Serves the professional list and the availability,
+            # which only read the active professionals
+            models.Index(
+                fields=['business'],
+                condition=models.Q(is_active=True),
+                name='professional_active_business'
+            )
+        ]
 
     def __str__(self):
         return self.name
     
-    def save(self, **kwargs):
+    def save(self, fast: bool = False, **kwargs):
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+        # Compile the schedule once per write
+        cache_compiled_schedule(self)
 
 
 class AvailableDay(models.Model):
@@ -208,10 +464,47 @@ class AvailableDay(models.Model):
             )
         ]
 
-    def save(self, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the loaded date to refresh its availability if it changes
+        instance._loaded_day = (
+            instance.__dict__.get('business_id'),
+            instance.__dict__.get('professional_id'),
+            instance.__dict__.get('date')
+        )
+        return instance
+
+    def save(self, fast: bool = False, **kwargs):
         # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
+        full_clean_for_save(self, fast)
+        with constraint_errors(self):
+            super().save(**kwargs)
+
+
+class AppointmentQuerySet(models.QuerySet):
+
+    def active(self) -> AppointmentQuerySet:
+        """
+        Appointments that still hold the time of the professional
+        """
+        return self.exclude(status=AppointmentStatus.CANCELLED.name)
+
+    def overlapping(
+        self,
+        professional: Professional | int,
+        start: datetime,
+        end: datetime
+    ) -> AppointmentQuerySet:
+        """
+        Active appointments of the professional that intersect
+        the half-open period between start and end
+        """
+        return self.active().filter(
+            professional=professional,
+            datetime__lt=end,
+            end_datetime__gt=start
+        )
 
 
 class Appointment(models.Model):
@@ -224,6 +517,8 @@ class Appointment(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
     professional = models.ForeignKey(Professional, on_delete=models.CASCADE)
     datetime = models.DateTimeField(validators=[validate_datetime])
+    # Filled from the service duration on every save
+    end_datetime = models.DateTimeField(editable=False)
     status = models.CharField(
         max_length=50,
         choices=STATUS_CHOICES,
@@ -236,6 +531,15 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
+    # Errors of the constraints created outside the model state
+    constraint_error_messages = {
+        'appointment_no_overlap': 'The professional already has an appointment in this period.'
+    }
+    # Set by save(fast=True) while the database checks the overlaps
+    _overlap_checked_on_write = False
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -243,8 +547,121 @@ class Appointment(models.Model):
                 name='unique_business_professional_datetime_customer_service_status'
             ) 
         ]
+        indexes = [
+            # Serves the overlap check on databases without the
+            # exclusion constraint created by migration 0006
+            models.Index(
+                fields=['professional', 'end_datetime', 'datetime'],
+                name='appointment_professional_end'
+            ),
+            # Serve the filters of the appointment list, as range
+            # scans on the datetime of one professional or status
+            models.Index(
+                fields=['business', 'professional', 'datetime'],
+                name='appointment_business_prof_dt'
+            ),
+            models.Index(
+                fields=['business', 'status', 'datetime'],
+                name='appointment_business_status_dt'
+            ),
+            models.Index(
+                fields=['customer', 'datetime'],
+                name='appointment_customer_dt'
+            ),
+            # Ordering of the cursor pagination
+            models.Index(
+                fields=['datetime', 'id'],
+                name='appointment_datetime_id'
+            )
+        ]
 
-    def save(self, **kwargs):
-        # Run all validations for the model
-        self.full_clean()
-        super().save(**kwargs)
\ No newline at end of file
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the loaded period to refresh its availability if it changes
+        instance._loaded_period = (
+            instance.__dict__.get('professional_id'),
+            instance.__dict__.get('datetime'),
+            instance.__dict__.get('end_datetime')
+        )
+        return instance
+
+    def clean(self):
+        """
+        Check that the business is open on the date and that the
+        professional has no other active appointment during the
+        period of this one
+        """
+        if (
+            self.status == AppointmentStatus.CANCELLED.name
+            or self.datetime is None
+            or self.end_datetime is None
+            or self.professional_id is None
+        ):
+            return
+
+        if self.business_id is not None and is_closed_on_holiday(
+            self.business, self.datetime.astimezone(SP_TZ).date()
+        ):
+            raise ValidationError(
+                'The business is closed on holidays. Got: %(value)s',
+                params={'value': self.datetime.astimezone(SP_TZ).date()}
+            )
+
+        if self._overlap_checked_on_write:
+            return
+
+        overlapping = (
+            Appointment.objects
+            .overlapping(self.professional_id, self.datetime, self.end_datetime)
+            .exclude(pk=self.pk)
+        )
+        if overlapping.exists():
+            raise ValidationError(
+                'The professional already has an appointment between %(start)s and %(end)s.',
+                params={'start': self.datetime, 'end': self.end_datetime}
+            )
+
+    def save(self, fast: bool = False, **kwargs):
+        # Store the end of the appointment from the service duration
+        if self.datetime is not None and self.service_id is not None:
+            self.end_datetime = self.datetime + self.service.duration
+
+        # On PostgreSQL the appointment_no_overlap constraint rejects the
+        # overlap on the write, so the fast mode skips the query of clean()
+        self._overlap_checked_on_write = fast and connection.vendor == 'postgresql'
+        try:
+            # Run all validations for the model
+            full_clean_for_save(self, fast)
+        finally:
+            self._overlap_checked_on_write = False
+        with constraint_errors(self):
+            super().save(**kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a create request sent with an Idempotency-Key header,
+    replayed to the retries of the same user with the same key until
+    it expires. Written only by app.idempotency, with plain queries.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # SHA-256 of the method, path and body of the first request
+    fingerprint = models.CharField(max_length=64)
+    # Null while the first request is running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key')
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_key_expires')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} | {self.key}"
@@ -0,0 +1,62 @@
+from django.db.models import QuerySet
+from rest_framework import pagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from typing import Any
+
+
+# Largest page a client can ask for with ?page_size=
+MAX_PAGE_SIZE = 1000
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class CursorPagination(pagination.CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class OptionalCursorPagination(pagination.BasePagination):
+    """
+    Page numbers by default. Clients that send ?pagination=cursor, or a
+    cursor from a previous page, get cursor pagination over `ordering`,
+    which must be indexed: no COUNT(*) and every page costs the same,
+    however deep it is.
+    """
+    ordering: tuple[str, ...] = ('id',)
+
+    def __init__(self) -> None:
+        self.cursor_pagination = CursorPagination()
+        self.cursor_pagination.ordering = self.ordering
+        self.paginator: pagination.BasePagination = PageNumberPagination()
+
+    def use_cursor(self, request: Request) -> bool:
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_pagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view: Any = None) -> list | None:
+        if self.use_cursor(request):
+            self.paginator = self.cursor_pagination
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return self.paginator.get_paginated_response(data)
+
+    def __getattr__(self, name: str) -> Any:
+        # The browsable API reads the page controls of the paginator in use
+        if name in ('cursor_pagination', 'paginator'):
+            raise AttributeError(name)
+        return getattr(self.paginator, name)
+
+
+class AppointmentPagination(OptionalCursorPagination):
+    ordering = ('datetime', 'id')
+
+
+class CustomerPagination(OptionalCursorPagination):
+    ordering = ('id',)
@@ -0,0 +1,34 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from typing import Any, IO, Iterator
+import codecs
+import json
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON lazily: the rows are read from the
+    request stream as they are consumed. A malformed line is returned
+    as a ParseError in its position, so it can be reported with the
+    other errors of its row instead of failing the whole request.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(
+        self,
+        stream: IO[bytes],
+        media_type: str | None = None,
+        parser_context: dict | None = None
+    ) -> Iterator[Any]:
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        return self.iter_rows(codecs.getreader(encoding)(stream))
+
+    @staticmethod
+    def iter_rows(lines: IO[str]) -> Iterator[Any]:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield ParseError(f'Line {number}: {exc}')
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from .availability import local_dates, refresh_availability_on_commit
+from .booking import professional_lock
+from .holidays import is_closed_on_holiday
+from .models import Appointment, AvailableDay, Business, Customer, Professional, Service
+from .schedules import Interval, time_to_minutes
+from .validators import SP_TZ
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from django.db.models import Q
+
+
+@dataclass
+class Occurrence:
+    start: datetime
+    end: datetime
+    conflict: str | None = None
+    appointment: Appointment | None = None
+
+
+def build_occurrences(
+    start: datetime,
+    duration: timedelta,
+    interval_weeks: int,
+    count: int
+) -> list[Occurrence]:
+    """
+    Return the occurrences of a weekly series. The local time of
+    the first occurrence is kept in every week.
+    """
+    local_start = start.astimezone(SP_TZ)
+    occurrences = []
+    for index in range(count):
+        # Add the weeks to the local wall time, not to the UTC instant
+        occurrence_start = (
+            local_start.replace(tzinfo=None) + timedelta(weeks=index * interval_weeks)
+        ).replace(tzinfo=SP_TZ)
+        occurrences.append(Occurrence(occurrence_start, occurrence_start + duration))
+    return occurrences
+
+
+def check_occurrences(
+    business: Business,
+    professional: Professional,
+    occurrences: list[Occurrence],
+    now: datetime | None = None
+) -> None:
+    """
+    Set the conflict of the occurrences that are past, on a closed holiday,
+    outside working hours, blocked or over another appointment, with one
+    range query for the blocks and one for the appointments of the series
+    """
+    if not occurrences:
+        return
+
+    now = now or datetime.now(tz=SP_TZ)
+    schedule = business.compiled_schedule & professional.compiled_schedule
+    first_start = occurrences[0].start
+    last_end = occurrences[-1].end
+
+    blocks: dict[date, list[Interval]] = defaultdict(list)
+    for day, blocked_start, blocked_end in (
+        AvailableDay.objects
+        .filter(
+            Q(professional=professional) | Q(professional__isnull=True),
+            business=business,
+            date__range=(first_start.date(), last_end.astimezone(SP_TZ).date()),
+            blocked_start_time__isnull=False,
+            blocked_end_time__isnull=False
+        )
+        .values_list('date', 'blocked_start_time', 'blocked_end_time')
+    ):
+        blocks[day].append((
+            time_to_minutes(blocked_start),
+            time_to_minutes(blocked_end, round_up=True)
+        ))
+
+    appointments = list(
+        Appointment.objects
+        .overlapping(professional, first_start, last_end)
+        .values_list('datetime', 'end_datetime')
+    )
+
+    for occurrence in occurrences:
+        start_minute = occurrence.start.hour * 60 + occurrence.start.minute
+        end_minute = start_minute + (occurrence.end - occurrence.start).total_seconds() / 60
+
+        if occurrence.start < now:
+            occurrence.conflict = 'The datetime is in the past.'
+        elif is_closed_on_holiday(business, occurrence.start.date()):
+            occurrence.conflict = 'The business is closed on holidays.'
+        elif not schedule.covers(occurrence.start, occurrence.end):
+            occurrence.conflict = 'The datetime is outside the working hours.'
+        elif any(
+            blocked_start < end_minute and blocked_end > start_minute
+            for blocked_start, blocked_end in blocks.get(occurrence.start.date(), [])
+        ):
+            occurrence.conflict = 'The datetime is blocked for the professional.'
+        elif any(
+            start < occurrence.end and end > occurrence.start
+            for start, end in appointments
+        ):
+            occurrence.conflict = 'The professional already has an appointment in this period.'
+
+
+def book_series(
+    business: Business,
+    customer: Customer,
+    service: Service,
+    professional: Professional,
+    start: datetime,
+    interval_weeks: int,
+    occurrences: int,
+    source: str,
+    status: str
+) -> list[Occurrence]:
+    """
+    Check every occurrence of a weekly series and create the ones
+    without conflicts with one bulk insert, inside one transaction
+    holding the lock of the professional
+    """
+    series = build_occurrences(start, service.duration, interval_weeks, occurrences)
+
+    with professional_lock(professional.id):
+        check_occurrences(business, professional, series)
+
+        accepted = [occurrence for occurrence in series if occurrence.conflict is None]
+        for occurrence in accepted:
+            occurrence.appointment = Appointment(
+                business=business,
+                customer=customer,
+                service=service,
+                professional=professional,
+                datetime=occurrence.start,
+                end_datetime=occurrence.end,
+                source=source,
+                status=status
+            )
+        Appointment.objects.bulk_create([occurrence.appointment for occurrence in accepted])
+
+        # bulk_create does not send post_save
+        refresh_availability_on_commit(
+            {day for occurrence in accepted for day in local_dates(occurrence.start, occurrence.end)},
+            professional_id=professional.id
+        )
+    return series
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+from .validators import SP_TZ
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, time
+from threading import Lock
+from typing import Any
+
+
+# Half-open interval [start, end) in minutes since local midnight
+Interval = tuple[int, int]
+
+MINUTES_PER_DAY = 24 * 60
+COMPILED_SCHEDULE_CACHE_SIZE = 4096
+
+
+def schedule_key(day: date) -> str:
+    """
+    Return the schedule key of a date, from Sunday (0) to Saturday (6)
+    """
+    return str(day.isoweekday() % 7)
+
+
+def time_to_minutes(value: time, round_up: bool = False) -> int:
+    """
+    Convert a time to minutes since midnight.
+    Seconds are truncated, unless round_up is set.
+    """
+    minutes = value.hour * 60 + value.minute
+    if round_up and (value.second or value.microsecond):
+        minutes += 1
+    return minutes
+
+
+def merge_intervals(intervals: list[Interval]) -> list[Interval]:
+    """
+    Sort the intervals and merge the overlapping or adjacent ones
+    """
+    merged: list[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect_intervals(first: list[Interval], second: list[Interval]) -> list[Interval]:
+    """
+    Intersect two sorted lists of disjoint intervals
+    """
+    result: list[Interval] = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+
+        # Advance the interval that finishes first
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def subtract_intervals(intervals: list[Interval], busy: list[Interval]) -> list[Interval]:
+    """
+    Remove the busy intervals from a sorted list of disjoint intervals
+    """
+    busy = merge_intervals(busy)
+    result: list[Interval] = []
+    j = 0
+    for start, end in intervals:
+        # Skip the busy intervals that finish before this one starts
+        while j < len(busy) and busy[j][1] <= start:
+            j += 1
+
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > start:
+                result.append((start, busy[k][0]))
+            start = max(start, busy[k][1])
+            k += 1
+
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+class CompiledSchedule:
+    """
+    Schedule JSON compiled to sorted minute intervals per weekday,
+    from Sunday (0) to Saturday (6), with the breaks already removed.
+    All the checks are integer operations over the intervals.
+    """
+    __slots__ = ('days', '_starts')
+
+    def __init__(self, days: tuple[tuple[Interval, ...], ...]) -> None:
+        self.days = days
+        self._starts = tuple(
+            tuple(start for start, _ in intervals) for intervals in days
+        )
+
+    @classmethod
+    def from_json(
+        cls,
+        schedule: dict[str, dict[str, str | list[dict[str, str]]]]
+    ) -> CompiledSchedule:
+        """
+        Compile a schedule in the format accepted by validate_schedule
+        """
+        days: list[tuple[Interval, ...]] = [()] * 7
+        for day_key, day_schedule in schedule.items():
+            start = time_to_minutes(time.fromisoformat(day_schedule['start']), round_up=True)
+            end = time_to_minutes(time.fromisoformat(day_schedule['end']))
+            breaks = [
+                (
+                    time_to_minutes(time.fromisoformat(break_period['start'])),
+                    time_to_minutes(time.fromisoformat(break_period['end']), round_up=True)
+                )
+                for break_period in day_schedule.get('breaks', [])
+            ]
+            days[int(day_key)] = tuple(subtract_intervals([(start, end)], breaks))
+        return cls(tuple(days))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CompiledSchedule) and self.days == other.days
+
+    def __hash__(self) -> int:
+        return hash(self.days)
+
+    def __and__(self, other: CompiledSchedule) -> CompiledSchedule:
+        """
+        Return the hours that are in both schedules
+        """
+        return CompiledSchedule(tuple(
+            tuple(intersect_intervals(list(first), list(second)))
+            for first, second in zip(self.days, other.days)
+        ))
+
+    def intervals(self, day: date) -> list[Interval]:
+        """
+        Return the working intervals of a date
+        """
+        return list(self.days[day.isoweekday() % 7])
+
+    def _interval_at(self, weekday: int, minute: int) -> Interval | None:
+        index = bisect_right(self._starts[weekday], minute) - 1
+        if index >= 0 and minute < self.days[weekday][index][1]:
+            return self.days[weekday][index]
+        return None
+
+    def is_open(self, moment: datetime) -> bool:
+        """
+        Check if the moment is inside the working hours
+        """
+        local = moment.astimezone(SP_TZ)
+        return self._interval_at(
+            local.isoweekday() % 7,
+            local.hour * 60 + local.minute
+        ) is not None
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        """
+        Check if the period between start and end fits
+        entirely inside one working interval
+        """
+        local_start = start.astimezone(SP_TZ)
+        start_minute = local_start.hour * 60 + local_start.minute
+        interval = self._interval_at(local_start.isoweekday() % 7, start_minute)
+        if interval is None:
+            return False
+
+        # Periods that cross midnight end after any working interval
+        end_minute = start_minute + (end - start).total_seconds() / 60
+        return end_minute <= interval[1]
+
+
+compile_schedule = CompiledSchedule.from_json
+
+_compiled_schedules: OrderedDict[tuple[str, Any], tuple[datetime, CompiledSchedule]] = OrderedDict()
+_compiled_schedules_lock = Lock()
+
+
+def cache_compiled_schedule(instance: Any) -> CompiledSchedule:
+    """
+    Compile the schedule of a saved instance and store it in the
+    process cache, keyed by the instance and its updated_at
+    """
+    compiled = compile_schedule(instance.schedule)
+    with _compiled_schedules_lock:
+        key = (instance._meta.label, instance.pk)
+        _compiled_schedules[key] = (instance.updated_at, compiled)
+        _compiled_schedules.move_to_end(key)
+        while len(_compiled_schedules) > COMPILED_SCHEDULE_CACHE_SIZE:
+            _compiled_schedules.popitem(last=False)
+    return compiled
+
+
+def get_compiled_schedule(instance: Any) -> CompiledSchedule:
+    """
+    Return the compiled schedule of an instance. The cached entry is
+    only used while it matches the updated_at of the instance.
+    """
+    if instance.pk is None or instance.updated_at is None:
+        return compile_schedule(instance.schedule)
+
+    cached = _compiled_schedules.get((instance._meta.label, instance.pk))
+    if cached is not None and cached[0] == instance.updated_at:
+        return cached[1]
+    return cache_compiled_schedule(instance)
+
+
+class CompiledScheduleMixin:
+    """
+    Give access to the compiled form of the schedule JSONField
+    """
+
+    @property
+    def compiled_schedule(self) -> CompiledSchedule:
+        return get_compiled_schedule(self)
+
+    def is_open(self, moment: datetime | None = None) -> bool:
+        """
+        Check if the schedule is open at the moment (default: now)
+        """
+        return self.compiled_schedule.is_open(moment or datetime.now(tz=SP_TZ))
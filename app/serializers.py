@@ -10,15 +10,167 @@ from .models import (
     Service,
     Professional,
     AvailableDay,
-    Appointment
+    Appointment,
+    customer_search
 )
+from .availability import MAX_RANGE_DAYS, DEFAULT_SLOT_STEP
+from .cities import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT
+from .utils import Source, AppointmentStatus
+from .validators import SP_TZ
+from datetime import datetime, timedelta
+from django.db.models import Q
 from typing import Any
 
 
-class CitySerializer(serializers.ModelSerializer):
+# Business.__str__ reads the city, so the choices of the
+# business field in the browsable API join it
+BUSINESS_FIELD_KWARGS = {'queryset': Business.objects.select_related('city')}
+
+
+def parse_field_names(value: str | None) -> list[str]:
+    """
+    Split a comma separated list of field names
+    """
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def root_query_params(serializer: serializers.BaseSerializer) -> Any:
+    """
+    Return the query parameters of a GET request for the top level
+    serializer of the response, or None for nested serializers
+    """
+    request = serializer.context.get('request')
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+
+    is_root = serializer.root is serializer or (
+        serializer.parent is serializer.root
+        and isinstance(serializer.root, serializers.ListSerializer)
+    )
+    return request.query_params if is_root else None
+
+
+class FieldSelectionMixin:
+    """
+    On GET requests, keep only the fields listed in the `fields`
+    query parameter or drop the ones listed in `omit`, both comma
+    separated. Nested serializers keep all their fields.
+    """
+
+    def get_fields(self) -> dict[str, serializers.Field]:
+        fields = super().get_fields()
+        params = root_query_params(self)
+        if params is None:
+            return fields
+
+        selected = parse_field_names(params.get('fields'))
+        omitted = parse_field_names(params.get('omit'))
+        unknown = sorted(set(selected + omitted) - set(fields))
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': [f'Unknown fields: {", ".join(unknown)}.']
+            })
+
+        if selected:
+            fields = {name: field for name, field in fields.items() if name in selected}
+        return {name: field for name, field in fields.items() if name not in omitted}
+
+
+class FastSaveMixin:
+    """
+    Saves with Model.save(fast=True). The serializer already checks the
+    unique constraints, so the model leaves them to the database instead
+    of running the same SELECTs again before the write.
+    """
+
+    def create(self, validated_data: dict[str, Any]) -> Any:
+        serializers.raise_errors_on_nested_writes('create', self, validated_data)
+        instance = self.Meta.model(**validated_data)
+        instance.save(fast=True)
+        return instance
+
+    def update(self, instance: Any, validated_data: dict[str, Any]) -> Any:
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(fast=True)
+        return instance
+
+
+# Longest path of relations in the `expand` query parameter,
+# such as business.city in an appointment
+MAX_EXPAND_DEPTH = 2
+
+ExpandTree = dict[str, 'ExpandTree']
+
+
+def parse_expand(serializer_class: type[serializers.BaseSerializer], value: str | None) -> ExpandTree:
+    """
+    Parse the comma separated relation paths of the `expand` query
+    parameter into a tree, checking each step against the
+    `expandable_fields` of the serializers along the path
+    """
+    tree: ExpandTree = {}
+    for path in parse_field_names(value):
+        names = path.split('.')
+        if len(names) > MAX_EXPAND_DEPTH:
+            raise serializers.ValidationError({
+                'expand': [f'{path} is deeper than {MAX_EXPAND_DEPTH} relations.']
+            })
+
+        node, current = tree, serializer_class
+        for name in names:
+            expandable = getattr(current, 'expandable_fields', {})
+            if name not in expandable:
+                raise serializers.ValidationError({'expand': [f'{path} cannot be expanded.']})
+            node = node.setdefault(name, {})
+            current = globals()[expandable[name]]
+    return tree
+
+
+def expand_select_related(tree: ExpandTree, prefix: str = '') -> list[str]:
+    """
+    Return the select_related paths of an expand tree
+    """
+    paths = []
+    for name, children in tree.items():
+        paths.append(prefix + name)
+        paths.extend(expand_select_related(children, f'{prefix}{name}__'))
+    return paths
+
+
+class ExpandMixin:
+    """
+    On GET requests, replace the primary keys of the relations listed
+    in the `expand` query parameter by the related objects. The relation
+    field names are mapped to the names of their serializers in
+    `expandable_fields`.
+    """
+    expandable_fields: dict[str, str] = {}
+
+    def __init__(self, *args: Any, expand: ExpandTree | None = None, **kwargs: Any) -> None:
+        self.expand = expand
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self) -> dict[str, serializers.Field]:
+        fields = super().get_fields()
+        expand = self.expand
+        if expand is None:
+            params = root_query_params(self)
+            expand = parse_expand(type(self), params.get('expand')) if params is not None else {}
+
+        for name, children in expand.items():
+            if name in fields:
+                serializer_class = globals()[self.expandable_fields[name]]
+                kwargs = {'expand': children} if issubclass(serializer_class, ExpandMixin) else {}
+                fields[name] = serializer_class(read_only=True, **kwargs)
+        return fields
+
+
+class CitySerializer(FieldSelectionMixin, serializers.ModelSerializer):
     class Meta:
         model = City
-        fields = '__all__'
+        fields = ['id', 'name', 'state']
         read_only_fields = ['id', 'name', 'state']
 
     def create(self, validated_data: dict[str, Any]) -> None:
@@ -28,7 +180,14 @@ class CitySerializer(serializers.ModelSerializer):
         raise serializers.ValidationError('This table is read only')
 
 
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(
+    FastSaveMixin,
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {'city': 'CitySerializer'}
+
     class Meta:
         model = Business
         fields = '__all__'
@@ -57,10 +216,18 @@ class BusinessSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(
+    FastSaveMixin,
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {'business': 'BusinessSerializer'}
+
     class Meta:
         model = Customer
-        fields = '__all__'
+        exclude = Customer.search_fields
+        extra_kwargs = {'business': BUSINESS_FIELD_KWARGS}
 
     def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
         """
@@ -89,10 +256,29 @@ class CustomerSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class CustomerBulkSerializer(CustomerSerializer):
+    """
+    Validates one row of the bulk upsert without queries. The
+    business and the uniqueness are checked for the whole batch.
+    """
+    business = serializers.IntegerField(min_value=1, source='business_id')
+
+    class Meta(CustomerSerializer.Meta):
+        validators = []
+
+
+class ServiceSerializer(
+    FastSaveMixin,
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {'business': 'BusinessSerializer'}
+
     class Meta:
         model = Service
         fields = '__all__'
+        extra_kwargs = {'business': BUSINESS_FIELD_KWARGS}
 
     def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
         """
@@ -109,10 +295,18 @@ class ServiceSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class ProfessionalSerializer(serializers.ModelSerializer):
+class ProfessionalSerializer(
+    FastSaveMixin,
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {'business': 'BusinessSerializer'}
+
     class Meta:
         model = Professional
-        fields = '__all__'
+        exclude = ['availability_version']
+        extra_kwargs = {'business': BUSINESS_FIELD_KWARGS}
 
     def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
         """
@@ -141,10 +335,33 @@ class ProfessionalSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class AvailableDaySerializer(serializers.ModelSerializer):
+class ProfessionalBulkSerializer(ProfessionalSerializer):
+    """
+    Validates one row of the bulk upsert without queries. The
+    business and the uniqueness are checked for the whole batch.
+    """
+    business = serializers.IntegerField(min_value=1, source='business_id')
+
+    class Meta(ProfessionalSerializer.Meta):
+        validators = []
+
+
+# Keeps the full validation: SQLite does not create the unique
+# constraint with nulls_distinct=False of business-wide blocks
+class AvailableDaySerializer(
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {
+        'business': 'BusinessSerializer',
+        'professional': 'ProfessionalSerializer'
+    }
+
     class Meta:
         model = AvailableDay
         fields = '__all__'
+        extra_kwargs = {'business': BUSINESS_FIELD_KWARGS}
 
     def validate(self, data: dict[str, Any]) -> dict[str, Any]:
         """
@@ -168,10 +385,23 @@ class AvailableDaySerializer(serializers.ModelSerializer):
         return data
         
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(
+    FastSaveMixin,
+    ExpandMixin,
+    FieldSelectionMixin,
+    serializers.ModelSerializer
+):
+    expandable_fields = {
+        'business': 'BusinessSerializer',
+        'customer': 'CustomerSerializer',
+        'service': 'ServiceSerializer',
+        'professional': 'ProfessionalSerializer'
+    }
+
     class Meta:
         model = Appointment
         fields = '__all__'
+        extra_kwargs = {'business': BUSINESS_FIELD_KWARGS}
 
     def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
         """
@@ -189,3 +419,230 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
         # Call the parent method with standardized data
         return super().to_internal_value(data)
+
+
+class CityQuerySerializer(serializers.Serializer):
+    """
+    Validates the filters of the city list and the autocomplete
+    """
+    q = serializers.CharField(required=False, max_length=50)
+    state = serializers.CharField(required=False, min_length=2, max_length=2)
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=MAX_AUTOCOMPLETE_LIMIT,
+        default=AUTOCOMPLETE_LIMIT
+    )
+
+    def validate_state(self, value: str) -> str:
+        return value.upper()
+
+
+class AppointmentFilterSerializer(serializers.Serializer):
+    """
+    Validates the filters of the appointment list. The validated
+    data maps the ORM lookups to their values.
+    """
+    business = serializers.IntegerField(required=False, min_value=1, source='business_id')
+    professional = serializers.IntegerField(required=False, min_value=1, source='professional_id')
+    customer = serializers.IntegerField(required=False, min_value=1, source='customer_id')
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES, required=False)
+    # Half-open range of the appointment start
+    start = serializers.DateTimeField(required=False, source='datetime__gte')
+    end = serializers.DateTimeField(required=False, source='datetime__lt')
+
+    def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
+        data = data.copy() if hasattr(data, 'copy') else dict(data)
+
+        if 'status' in data and data['status']:
+            data['status'] = data['status'].upper()
+
+        return super().to_internal_value(data)
+
+
+class ActiveQuerySerializer(serializers.Serializer):
+    """
+    Validates the escape hatch of the lists of active rows
+    """
+    include_inactive = serializers.BooleanField(required=False, default=False)
+
+
+class CustomerFilterSerializer(serializers.Serializer):
+    """
+    Validates the filters of the customer list. The search is
+    validated into the Q object of customer_search.
+    """
+    business = serializers.IntegerField(required=False, min_value=1, source='business_id')
+    is_active = serializers.BooleanField(required=False)
+    is_opt_in = serializers.BooleanField(required=False)
+    search = serializers.CharField(required=False, max_length=80)
+
+    def validate_search(self, value: str) -> Q:
+        return customer_search(value)
+
+    def validate(self, attrs: dict[str, Any]) -> dict[str, Any]:
+        # Without the business, the search would scan every customer
+        if 'search' in attrs and 'business_id' not in attrs:
+            raise serializers.ValidationError({'business': 'This field is required to search.'})
+        return attrs
+
+
+class ProfessionalFilterSerializer(serializers.Serializer):
+    """
+    Validates the filters of the professional list
+    """
+    business = serializers.IntegerField(required=False, min_value=1, source='business_id')
+    is_active = serializers.BooleanField(required=False)
+
+
+class AppointmentTransitionSerializer(serializers.Serializer):
+    """
+    Validates the body of the bulk status transition
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES)
+
+    def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
+        data = data.copy() if hasattr(data, 'copy') else dict(data)
+
+        if isinstance(data.get('status'), str):
+            data['status'] = data['status'].upper()
+
+        return super().to_internal_value(data)
+
+    def validate_status(self, value: str) -> str:
+        if not AppointmentStatus.sources(value):
+            raise serializers.ValidationError(f'No appointment can change to {value}.')
+        return value
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the availability endpoint.
+    The professional must be given in the context.
+    """
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.all())
+    start = serializers.DateField()
+    end = serializers.DateField(required=False)
+    step = serializers.IntegerField(
+        min_value=5,
+        max_value=240,
+        default=int(DEFAULT_SLOT_STEP.total_seconds() // 60)
+    )
+
+    def validate(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        Check the date range and if the service belongs
+        to the business of the professional
+        """
+        data['end'] = data.get('end') or data['start']
+
+        if data['end'] < data['start']:
+            raise serializers.ValidationError('The end date must not be before the start date')
+
+        if (data['end'] - data['start']).days >= MAX_RANGE_DAYS:
+            raise serializers.ValidationError(
+                f'The date range must have at most {MAX_RANGE_DAYS} days'
+            )
+
+        professional = self.context['professional']
+        if data['service'].business_id != professional.business_id:
+            raise serializers.ValidationError(
+                'The service does not belong to the business of the professional'
+            )
+
+        data['step'] = timedelta(minutes=data['step'])
+        return data
+
+
+class NextAvailableQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the next available slots endpoint
+    """
+    start = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    step = serializers.IntegerField(
+        min_value=5,
+        max_value=240,
+        default=int(DEFAULT_SLOT_STEP.total_seconds() // 60)
+    )
+
+    def validate(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        Start the search today by default
+        """
+        today = datetime.now(tz=SP_TZ).date()
+        data['start'] = max(data.get('start') or today, today)
+        data['step'] = timedelta(minutes=data['step'])
+        return data
+
+
+class OccupancyQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the occupancy endpoint
+    """
+    month = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', required=False)
+
+    def validate(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        Split the month (YYYY-MM) in year and month, the current one by default
+        """
+        if 'month' in data:
+            year, month = map(int, data['month'].split('-'))
+        else:
+            today = datetime.now(tz=SP_TZ).date()
+            year, month = today.year, today.month
+        return {'year': year, 'month': month}
+
+
+class RecurringAppointmentSerializer(serializers.Serializer):
+    """
+    Validates a weekly series of appointments,
+    e.g. every Tuesday at 14:00 for 24 weeks
+    """
+    MAX_OCCURRENCES = 52
+
+    business = serializers.PrimaryKeyRelatedField(queryset=Business.objects.all())
+    customer = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all())
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.all())
+    professional = serializers.PrimaryKeyRelatedField(queryset=Professional.objects.all())
+    datetime = serializers.DateTimeField()
+    interval_weeks = serializers.IntegerField(min_value=1, max_value=4, default=1)
+    occurrences = serializers.IntegerField(min_value=1, max_value=MAX_OCCURRENCES)
+    source = serializers.ChoiceField(choices=[source.name for source in Source])
+    status = serializers.ChoiceField(
+        choices=[AppointmentStatus.SCHEDULED.name, AppointmentStatus.CONFIRMED.name],
+        default=AppointmentStatus.SCHEDULED.name
+    )
+
+    def to_internal_value(self, data: dict[str, Any] | Any) -> dict[str, Any]:
+        """
+        Standardize the data before validation
+        """
+        # Create a copy to avoid modifying the original
+        data = data.copy() if hasattr(data, 'copy') else dict(data)
+
+        # Standardize specific fields for database
+        if 'status' in data and data['status']:
+            data['status'] = data['status'].upper()
+
+        if 'source' in data and data['source']:
+            data['source'] = data['source'].upper()
+
+        # Call the parent method with standardized data
+        return super().to_internal_value(data)
+
+    def validate(self, data: dict[str, Any]) -> dict[str, Any]:
+        """
+        Check if the customer, service and professional belong to the business
+        """
+        for field in ['customer', 'service', 'professional']:
+            if data[field].business_id != data['business'].id:
+                raise serializers.ValidationError(
+                    {field: f'The {field} does not belong to the business'}
+                )
+        return data
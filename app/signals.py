@@ -0,0 +1,49 @@
+from .models import Appointment, AvailableDay, Holiday
+from .availability import local_dates, refresh_availability_on_commit
+from .holidays import reset_holiday_calendar
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from typing import Any
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def refresh_appointment_availability(sender: type, instance: Appointment, **kwargs: Any) -> None:
+    """
+    Refresh the availability of the dates the appointment
+    occupies now and the ones it occupied when loaded
+    """
+    periods = [(instance.professional_id, instance.datetime, instance.end_datetime)]
+    if getattr(instance, '_loaded_period', None):
+        periods.append(instance._loaded_period)
+
+    for professional_id, start, end in set(periods):
+        if professional_id is not None and start is not None and end is not None:
+            refresh_availability_on_commit(local_dates(start, end), professional_id=professional_id)
+
+
+@receiver([post_save, post_delete], sender=AvailableDay)
+def refresh_available_day_availability(sender: type, instance: AvailableDay, **kwargs: Any) -> None:
+    """
+    Refresh the availability of the date of the block, for the
+    professional or for every professional of the business
+    """
+    days = [(instance.business_id, instance.professional_id, instance.date)]
+    if getattr(instance, '_loaded_day', None):
+        days.append(instance._loaded_day)
+
+    for business_id, professional_id, day in set(days):
+        refresh_availability_on_commit(
+            [day],
+            professional_id=professional_id,
+            business_id=business_id
+        )
+
+
+@receiver([post_save, post_delete], sender=Holiday)
+def reset_holidays(sender: type, instance: Holiday, **kwargs: Any) -> None:
+    """
+    Reload the holiday calendar of this process on the next lookup.
+    Its new version makes the cached availability of the businesses
+    closed on holidays stale.
+    """
+    reset_holiday_calendar()
@@ -1,8 +1,10 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection
 from app.models import Appointment, Business, Customer, Service, Professional, City
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from unittest import skipUnless
 from unittest.mock import patch
 
 
@@ -14,7 +16,7 @@ class TestAppointmentModel(TestCase):
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
             category="C1",
-            city=City.objects.get(name="Ariquemes", state="RO"),
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
             address="Rua 1",
             public_phone="(12) 3456-7890",
             restricted_phone="(12) 3456-7890",
@@ -147,3 +149,77 @@ class TestAppointmentModel(TestCase):
 
         with self.assertRaises(ValidationError):
             Appointment.objects.create(**params)
+
+    def test_end_datetime_from_service_duration(self):
+        appointment = Appointment.objects.create(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=self.now + timedelta(days=1),
+            source="WEBSITE"
+        )
+        self.assertEqual(
+            appointment.end_datetime,
+            appointment.datetime + self.service.duration
+        )
+
+    def test_refuse_overlapping_appointment(self):
+        params = {
+            "business": self.business,
+            "customer": self.customer,
+            "service": self.service,
+            "professional": self.professional,
+            "source": "WEBSITE"
+        }
+        start = self.now + timedelta(days=1)
+
+        Appointment.objects.create(**params, datetime=start)
+
+        # The service takes 1 hour, so 15 minutes later still overlaps
+        with self.assertRaises(ValidationError):
+            Appointment.objects.create(**params, datetime=start + timedelta(minutes=15))
+
+        # Back-to-back appointments are accepted
+        appointment = Appointment.objects.create(**params, datetime=start + timedelta(hours=1))
+        self.assertIsInstance(appointment, Appointment)
+
+    def test_cancelled_appointments_do_not_overlap(self):
+        params = {
+            "business": self.business,
+            "customer": self.customer,
+            "service": self.service,
+            "professional": self.professional,
+            "source": "WEBSITE"
+        }
+        start = self.now + timedelta(days=1)
+
+        Appointment.objects.create(**params, datetime=start, status="CANCELLED")
+        appointment = Appointment.objects.create(**params, datetime=start + timedelta(minutes=15))
+        self.assertIsInstance(appointment, Appointment)
+        self.assertEqual(
+            Appointment.objects.overlapping(self.professional, start, start + timedelta(hours=2)).count(),
+            1
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'Exclusion constraints require PostgreSQL')
+    def test_exclusion_constraint(self):
+        params = {
+            "business": self.business,
+            "customer": self.customer,
+            "service": self.service,
+            "professional": self.professional,
+            "source": "WEBSITE"
+        }
+        start = self.now + timedelta(days=1)
+
+        # bulk_create skips Model.clean(), so only the database can refuse it
+        with self.assertRaises(IntegrityError):
+            Appointment.objects.bulk_create([
+                Appointment(**params, datetime=start, end_datetime=start + timedelta(hours=1)),
+                Appointment(
+                    **params,
+                    datetime=start + timedelta(minutes=15),
+                    end_datetime=start + timedelta(minutes=75)
+                )
+            ])
@@ -0,0 +1,105 @@
+from django.test import TestCase, TransactionTestCase
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from app.booking import BOOKING_LOCK_NAMESPACE, book_appointment, professional_lock
+from app.models import Appointment, Business, City, Customer, Professional, Service
+from datetime import datetime, timedelta
+from io import StringIO
+from threading import Thread
+from unittest import skipUnless
+from zoneinfo import ZoneInfo
+import re
+
+
+class TestBooking(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.now = datetime.now(ZoneInfo("America/Sao_Paulo"))
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule={"0": {"start": "08:00", "end": "17:00", "breaks": []}},
+            closed_on_holidays=False
+        )
+        cls.professional = Professional.objects.create(
+            business=cls.business,
+            name="João da Silva",
+            cpf="111.444.777-35",
+            speciality="cardiologista",
+            email="joao.silva@example.com",
+            phone="(21) 3456-7890",
+            schedule={"0": {"start": "08:00", "end": "17:00", "breaks": []}}
+        )
+        cls.service = Service.objects.create(
+            business=cls.business,
+            name="serviço de teste",
+            description="Descrição do serviço",
+            price=100.00,
+            duration=timedelta(hours=1)
+        )
+        cls.customer = Customer.objects.create(
+            business=cls.business,
+            name="João da Silva",
+            phone="(21) 3456-7890",
+            cpf="111.444.777-35",
+            registration_source="WEBSITE"
+        )
+
+    def _appointment(self, hours: float) -> Appointment:
+        return Appointment(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=self.now + timedelta(hours=hours),
+            source="WHATSAPP"
+        )
+
+    def test_book_appointment(self):
+        appointment = book_appointment(self._appointment(2))
+        self.assertIsNotNone(appointment.pk)
+
+        with self.assertRaises(ValidationError):
+            book_appointment(self._appointment(2.5), fast=True)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite runs one write transaction at a time')
+class TestBookingContention(TransactionTestCase):
+    # Restore the cities of the migrations after the flush
+    serialized_rollback = True
+
+    def test_lock_blocks_other_connections(self):
+        professional_id = 123
+        acquired = {}
+
+        def try_lock(key: int) -> None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_xact_lock(%s, %s)', [BOOKING_LOCK_NAMESPACE, key])
+                acquired[key] = cursor.fetchone()[0]
+            connection.close()
+
+        with professional_lock(professional_id):
+            for key in (professional_id, professional_id + 1):
+                thread = Thread(target=try_lock, args=[key])
+                thread.start()
+                thread.join()
+
+        self.assertEqual(acquired, {professional_id: False, professional_id + 1: True})
+
+    def test_no_double_bookings_under_contention(self):
+        out = StringIO()
+        call_command('benchmark_bookings', threads=8, attempts=15, slots=10, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('0 double bookings', output)
+        booked = int(re.search(r'(\d+) booked', output).group(1))
+        self.assertEqual(booked, 10)
+        self.assertEqual(Appointment.objects.count(), 0)
@@ -7,7 +7,7 @@ class TestBusinessModel(TestCase):
 
     @classmethod
     def setUpTestData(cls) -> None:
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
 
     def test_validate_category(self):
         fixed_params = {
@@ -148,3 +148,29 @@ class TestBusinessModel(TestCase):
 
         with self.assertRaises(ValidationError):
             Business.objects.create(**params)
+
+    def test_compiled_schedule(self):
+        business = Business.objects.create(
+            name="NAME",
+            category="C1",
+            city=self.city,
+            address="Rua 1",
+            public_phone="(89) 99595-4250",
+            restricted_phone="(89) 99595-4250",
+            email="clinica@fagundes.com",
+            schedule={"0": {"start": "08:00", "end": "17:00", "breaks": []}},
+            closed_on_holidays=True
+        )
+        self.assertEqual(business.compiled_schedule.days[0], ((480, 1020),))
+
+        # A fresh instance with the same updated_at reuses the compiled form
+        fetched = Business.objects.get(id=business.id)
+        self.assertIs(fetched.compiled_schedule, business.compiled_schedule)
+
+        # Saving again changes updated_at and invalidates the entry
+        fetched.schedule = {"0": {"start": "09:00", "end": "12:00"}}
+        fetched.save()
+        self.assertEqual(
+            Business.objects.get(id=business.id).compiled_schedule.days[0],
+            ((540, 720),)
+        )
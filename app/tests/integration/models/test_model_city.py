@@ -6,5 +6,6 @@ from django.core.exceptions import ValidationError
 class TestCityModel(TestCase):
 
     def test_unique_constraint(self):
+        City.objects.create(name="Cidade de Teste", state="RO")
         with self.assertRaises(ValidationError):
-            City.objects.create(name="Ariquemes", state="RO")
+            City.objects.create(name="Cidade de Teste", state="RO")
@@ -10,7 +10,7 @@ class TestCustomerModel(TestCase):
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
             category="C1",
-            city=City.objects.get(name="Ariquemes", state="RO"),
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
             address="Rua 1",
             public_phone="(12) 3456-7890",
             restricted_phone="(12) 3456-7890",
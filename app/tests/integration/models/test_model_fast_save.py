@@ -0,0 +1,124 @@
+from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from app.models import Appointment, Business, City, Customer, Holiday, Professional, Service
+from datetime import datetime, timedelta
+from unittest import skipUnless
+from zoneinfo import ZoneInfo
+
+
+class TestFastSave(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.now = datetime.now(ZoneInfo("America/Sao_Paulo"))
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule={"0": {"start": "08:00", "end": "17:00", "breaks": []}},
+            closed_on_holidays=False
+        )
+        cls.professional = Professional.objects.create(
+            business=cls.business,
+            name="JOÃO DA SILVA",
+            cpf="111.444.777-35",
+            speciality="cardiologista",
+            email="Joao.silva@example.com",
+            phone="(21) 3456-7890",
+            schedule={"0": {"start": "08:00", "end": "17:00", "breaks": []}}
+        )
+        cls.service = Service.objects.create(
+            business=cls.business,
+            name="serviço de teste",
+            description="Descrição do serviço",
+            price=100.00,
+            duration=timedelta(hours=1)
+        )
+        cls.customer_args = {
+            "business": cls.business,
+            "name": "João da Silva",
+            "phone": "(21) 3456-7890",
+            "cpf": "111.444.777-35",
+            "registration_source": "WEBSITE"
+        }
+
+    def test_queries_per_write(self):
+        # Default: SELECT for the business, SELECT for
+        # unique_customer_business, then INSERT
+        with self.assertNumQueries(3):
+            Customer(**self.customer_args).save()
+
+        # Fast: the INSERT only, the business is already loaded
+        with self.assertNumQueries(1):
+            Customer(**self.customer_args | {"cpf": "529.982.247-25"}).save(fast=True)
+
+        customer = Customer.objects.get(cpf="529.982.247-25")
+        appointment_args = {
+            "business": self.business,
+            "customer": customer,
+            "service": self.service,
+            "professional": self.professional,
+            "source": "WEBSITE"
+        }
+        # Default: the four foreign keys, the unique constraint,
+        # the overlap check and INSERT
+        with self.assertNumQueries(7):
+            Appointment(**appointment_args, datetime=self.now + timedelta(hours=2)).save()
+
+        # Fast: overlap check and INSERT, or only the INSERT on PostgreSQL,
+        # whose exclusion constraint checks the overlap
+        with self.assertNumQueries(1 if connection.vendor == 'postgresql' else 2):
+            Appointment(**appointment_args, datetime=self.now + timedelta(hours=4)).save(fast=True)
+
+    def test_unique_violation_has_the_full_clean_error(self):
+        Customer.objects.create(**self.customer_args)
+
+        with self.assertRaises(ValidationError) as full_clean:
+            Customer(**self.customer_args).save()
+
+        with self.assertRaises(ValidationError) as fast, transaction.atomic():
+            Customer(**self.customer_args).save(fast=True)
+
+        self.assertEqual(fast.exception.message_dict, full_clean.exception.message_dict)
+
+    def test_conditional_unique_violation(self):
+        day = self.now.date() + timedelta(days=400)
+        Holiday.objects.create(date=day, name="Data Magna", scope="STATE", state="RO")
+
+        with self.assertRaises(ValidationError) as full_clean:
+            Holiday(date=day, name="Outro", scope="STATE", state="RO").save()
+
+        with self.assertRaises(ValidationError) as fast, transaction.atomic():
+            Holiday(date=day, name="Outro", scope="STATE", state="RO").save(fast=True)
+
+        self.assertEqual(fast.exception.message_dict, full_clean.exception.message_dict)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Exclusion constraints require PostgreSQL')
+    def test_exclusion_violation(self):
+        customer = Customer.objects.create(**self.customer_args)
+        start = self.now + timedelta(hours=2)
+        Appointment.objects.create(
+            business=self.business,
+            customer=customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=start,
+            source="WEBSITE"
+        )
+
+        # The fast mode leaves the overlap to the constraint
+        appointment = Appointment(
+            business=self.business,
+            customer=customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=start + timedelta(minutes=30),
+            source="WHATSAPP"
+        )
+        with self.assertRaisesMessage(ValidationError, 'The professional already has an appointment'), transaction.atomic():
+            appointment.save(fast=True)
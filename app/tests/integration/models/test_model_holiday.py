@@ -0,0 +1,140 @@
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.core.exceptions import ValidationError
+from app.availability import free_intervals, month_occupancy
+from app.holidays import get_holiday_calendar, is_holiday, reset_holiday_calendar
+from app.models import Appointment, Business, City, Customer, Holiday, Professional, Service
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from zoneinfo import ZoneInfo
+
+
+class TestHolidayModel(TestCase):
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=cls.city,
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule={str(day): {"start": "08:00", "end": "17:00", "breaks": []} for day in range(7)},
+            closed_on_holidays=True
+        )
+        cls.professional = Professional.objects.create(
+            business=cls.business,
+            name="JOÃO DA SILVA",
+            cpf="111.444.777-35",
+            speciality="cardiologista",
+            email="Joao.silva@example.com",
+            phone="(21) 3456-7890",
+            schedule={str(day): {"start": "08:00", "end": "17:00", "breaks": []} for day in range(7)}
+        )
+        cls.customer = Customer.objects.create(
+            business=cls.business,
+            name="João da Silva",
+            email="joao.silva@example.com",
+            phone="(21) 3456-7890",
+            cpf="111.444.777-35",
+            registration_source="WEBSITE"
+        )
+        cls.service = Service.objects.create(
+            business=cls.business,
+            name="serviço de teste",
+            description="Descrição do serviço",
+            price=100.00,
+            duration=timedelta(hours=1)
+        )
+
+        # A future date that is not a national holiday
+        cls.day = datetime.now(ZoneInfo("America/Sao_Paulo")).date() + timedelta(days=10)
+        while is_holiday(cls.day) or is_holiday(cls.day + timedelta(days=1)):
+            cls.day += timedelta(days=1)
+
+    def tearDown(self) -> None:
+        # The rollback of the test does not send post_delete
+        reset_holiday_calendar()
+
+    def test_national_holidays_migration(self):
+        self.assertTrue(Holiday.objects.filter(date=datetime(2030, 12, 25).date(), scope="NATIONAL").exists())
+        # Carnaval and Corpus Christi are loaded per state or city
+        self.assertFalse(Holiday.objects.filter(name__in=["Carnaval", "Corpus Christi"]).exists())
+
+    def test_generate_regional_movable_holidays(self):
+        out = StringIO()
+        call_command(
+            "generate_holidays", "--start-year", "2030", "--end-year", "2030",
+            "--state", "ro", stdout=out
+        )
+        call_command(
+            "generate_holidays", "--start-year", "2030", "--end-year", "2030",
+            "--state", "RO", "--city", "cidade de teste", stdout=out
+        )
+
+        self.assertEqual(
+            set(Holiday.objects.filter(name="Carnaval").values_list("date", "scope", "state", "city")),
+            {
+                (date(2030, 3, 4), "STATE", "RO", None),
+                (date(2030, 3, 5), "STATE", "RO", None),
+                (date(2030, 3, 4), "MUNICIPAL", "RO", self.city.id),
+                (date(2030, 3, 5), "MUNICIPAL", "RO", self.city.id),
+            }
+        )
+        # bulk_create sends no signal to reload the calendar
+        reset_holiday_calendar()
+        self.assertTrue(is_holiday(date(2030, 6, 20), self.city.id))
+        self.assertFalse(is_holiday(date(2030, 6, 20)))
+
+        with self.assertRaises(CommandError):
+            call_command(
+                "generate_holidays", "--state", "RO", "--city", "Inexistente", stdout=out
+            )
+
+    def test_scope_requires_state_or_city(self):
+        with self.assertRaises(ValidationError):
+            Holiday.objects.create(date=self.day, name="Aniversário", scope="MUNICIPAL")
+        with self.assertRaises(ValidationError):
+            Holiday.objects.create(date=self.day, name="Data Magna", scope="STATE")
+
+    def test_calendar_is_reloaded_on_save(self):
+        self.assertFalse(is_holiday(self.day, self.city.id))
+        version = get_holiday_calendar().version
+
+        Holiday.objects.create(date=self.day, name="Data Magna", scope="STATE", state="RO")
+
+        self.assertTrue(is_holiday(self.day, self.city.id))
+        self.assertFalse(is_holiday(self.day, City.objects.create(name="Outra Cidade de Teste", state="SP").id))
+        self.assertNotEqual(get_holiday_calendar().version, version)
+
+    def test_closed_on_holidays(self):
+        Holiday.objects.create(date=self.day, name="Aniversário", scope="MUNICIPAL", city=self.city)
+        start = datetime.combine(self.day, time(9), tzinfo=ZoneInfo("America/Sao_Paulo"))
+
+        appointment = Appointment(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=start,
+            source="WEBSITE"
+        )
+        with self.assertRaisesMessage(ValidationError, "The business is closed on holidays."):
+            appointment.save()
+
+        intervals = free_intervals(self.professional, self.day, self.day + timedelta(days=1))
+        self.assertEqual(intervals[self.day], [])
+        self.assertEqual(intervals[self.day + timedelta(days=1)], [(480, 1020)])
+
+        occupancy = month_occupancy(self.business, self.day.year, self.day.month)
+        self.assertEqual(occupancy[self.day][self.professional.id]["free_minutes"], 0)
+
+        # Businesses open on holidays keep their working hours
+        self.business.closed_on_holidays = False
+        self.business.save()
+        appointment.business = self.business
+        appointment.save()
+        self.assertEqual(appointment.end_datetime, start + timedelta(hours=1))
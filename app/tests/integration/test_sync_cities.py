@@ -0,0 +1,117 @@
+from app.cities import get_city_index
+from app.models import City
+from django.core.management import call_command
+from django.test import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+import hashlib
+import json
+
+
+class StubIBGEHandler(BaseHTTPRequestHandler):
+    """
+    Serves the municipalities of the server with an ETag and
+    answers 304 to a matching If-None-Match
+    """
+
+    def do_GET(self):
+        self.server.requests.append({name.lower(): value for name, value in self.headers.items()})
+        body = json.dumps(self.server.municipalities).encode()
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Mon, 06 Oct 2025 12:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def municipality(code: int, name: str, state: str) -> dict:
+    return {
+        'id': code,
+        'nome': name,
+        'regiao-imediata': {'regiao-intermediaria': {'UF': {'sigla': state}}}
+    }
+
+
+class TestSyncCities(TestCase):
+
+    def setUp(self):
+        # Existing cities without an IBGE code, linked by name and state
+        City.objects.create(name='Cidade de Teste', state='RO')
+        City.objects.create(name='Outra Cidade de Teste', state='SP')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubIBGEHandler)
+        self.server.requests = []
+        self.server.municipalities = [
+            municipality(9999902, 'Cidade de Teste', 'RO'),
+            municipality(9999903, 'Outra Cidade de Teste', 'SP'),
+            municipality(9999901, 'Cidade Nova', 'MG')
+        ]
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/municipios'
+
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = Path(directory.name)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sync(self) -> str:
+        out = StringIO()
+        call_command('sync_cities', url=self.url, cache_dir=self.cache_dir, stdout=out)
+        return out.getvalue()
+
+    def test_sync_cities(self):
+        count = City.objects.count()
+        get_city_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self._sync()
+        self.assertIn('1 cities created, 0 renamed and 2 linked', output)
+        self.assertEqual(City.objects.count(), count + 1)
+        self.assertEqual(City.objects.get(ibge_code=9999901).name, 'Cidade Nova')
+        self.assertEqual(City.objects.get(name='Cidade de Teste').ibge_code, 9999902)
+        self.assertNotIn('if-none-match', self.server.requests[0])
+        # The index is rebuilt after the sync
+        self.assertEqual(
+            get_city_index().search('cidade nova'),
+            [(City.objects.get(ibge_code=9999901).id, 'Cidade Nova', 'MG')]
+        )
+
+    def test_sync_cities_unchanged_is_a_conditional_request(self):
+        self._sync()
+
+        # 304 read back from the cache, and one query to diff it
+        with self.assertNumQueries(1):
+            output = self._sync()
+        self.assertIn('0 cities created, 0 renamed and 0 linked', output)
+        body = json.dumps(self.server.municipalities).encode()
+        self.assertEqual(self.server.requests[1]['if-none-match'], '"%s"' % hashlib.sha256(body).hexdigest())
+        self.assertEqual(self.server.requests[1]['if-modified-since'], 'Mon, 06 Oct 2025 12:00:00 GMT')
+
+    def test_sync_cities_renames(self):
+        self._sync()
+        city = City.objects.get(ibge_code=9999901)
+
+        self.server.municipalities[2] = municipality(9999901, 'Cidade Velha', 'MG')
+        output = self._sync()
+        self.assertIn('0 cities created, 1 renamed and 0 linked', output)
+        city.refresh_from_db()
+        self.assertEqual(city.name, 'Cidade Velha')
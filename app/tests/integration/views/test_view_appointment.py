@@ -24,7 +24,7 @@ class TestAppointmentView(APITestCase):
             password='testpass123'
         )
 
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
         
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
@@ -225,6 +225,33 @@ class TestAppointmentView(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @patch('app.validators.datetime')
+    def test_refuse_overlapping_appointment(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        _ = Appointment.objects.create(**self.appointment_args)
+
+        appointment_data = (
+            self.appointment_args
+            |
+            {
+                "business": self.business.id,
+                "customer": self.customer.id,
+                "service": self.service.id,
+                "professional": self.professional.id,
+                "datetime": (
+                    (self.appointment_args["datetime"] + timedelta(minutes=15))
+                    .isoformat()
+                )
+            }
+        )
+        response = self.client.post(
+            reverse('appointment-list'),
+            appointment_data,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Appointment.objects.count(), 1)
+
     @patch('app.validators.datetime')
     def test_update_appointment_field(self, mock_datetime):
         mock_datetime.now.return_value = self.mock_datetime
@@ -289,3 +316,200 @@ class TestAppointmentView(APITestCase):
             reverse('appointment-detail', args=[appointment.id])
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch('app.validators.datetime')
+    def test_filter_appointments(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        first = Appointment.objects.create(**self.appointment_args)
+        second = Appointment.objects.create(
+            **self.appointment_args | {
+                "datetime": self.mock_datetime + timedelta(hours=5),
+                "status": "CANCELLED"
+            }
+        )
+
+        def ids(**params):
+            response = self.client.get(reverse('appointment-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {appointment['id'] for appointment in response.data['results']}
+
+        self.assertEqual(ids(business=self.business.id), {first.id, second.id})
+        self.assertEqual(ids(professional=self.professional.id, status='cancelled'), {second.id})
+        self.assertEqual(ids(customer=self.customer.id, status='SCHEDULED'), {first.id})
+        self.assertEqual(ids(professional=self.professional.id + 1), set())
+        self.assertEqual(
+            ids(
+                start=(self.mock_datetime + timedelta(hours=4)).isoformat(),
+                end=(self.mock_datetime + timedelta(hours=6)).isoformat()
+            ),
+            {second.id}
+        )
+        self.assertEqual(ids(end=second.datetime.isoformat()), {first.id})
+
+        response = self.client.get(reverse('appointment-list'), {'status': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+    @patch('app.validators.datetime')
+    def test_cursor_pagination(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        appointments = [
+            Appointment.objects.create(
+                **self.appointment_args | {"datetime": self.mock_datetime + timedelta(hours=hours)}
+            )
+            for hours in (7, 3, 5)
+        ]
+
+        response = self.client.get(reverse('appointment-list'), {'page_size': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+
+        # One query per page, without COUNT(*)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('appointment-list'),
+                {'pagination': 'cursor', 'page_size': 2}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(
+            [appointment['id'] for appointment in response.data['results']],
+            [appointments[1].id, appointments[2].id]
+        )
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [appointment['id'] for appointment in response.data['results']],
+            [appointments[0].id]
+        )
+        self.assertIsNone(response.data['next'])
+
+    @patch('app.validators.datetime')
+    def test_select_fields_with_cursor_pagination(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        for hours in (3, 5):
+            Appointment.objects.create(
+                **self.appointment_args | {"datetime": self.mock_datetime + timedelta(hours=hours)}
+            )
+
+        # The ordering fields are loaded with the selected ones
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('appointment-list'),
+                {'pagination': 'cursor', 'page_size': 1, 'fields': 'id,status'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+
+    @patch('app.validators.datetime')
+    def test_expand_relations(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        appointment = Appointment.objects.create(**self.appointment_args)
+
+        # The related rows come in the same query as the appointment
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('appointment-detail', args=[appointment.id]),
+                {'expand': 'customer,service,professional,business.city'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['customer']['name'], self.customer.name)
+        self.assertEqual(response.data['service']['id'], self.service.id)
+        self.assertEqual(response.data['professional']['id'], self.professional.id)
+        self.assertEqual(response.data['business']['city']['name'], self.city.name)
+        # Relations not listed keep their primary key
+        self.assertEqual(response.data['professional']['business'], self.business.id)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('appointment-list'),
+                {'expand': 'customer', 'fields': 'id,customer'}
+            )
+        self.assertEqual(
+            response.data['results'],
+            [{'id': appointment.id, 'customer': response.data['results'][0]['customer']}]
+        )
+        self.assertEqual(response.data['results'][0]['customer']['cpf'], self.customer.cpf)
+
+        # Expanding a relation left out by `fields` does nothing
+        response = self.client.get(
+            reverse('appointment-list'),
+            {'expand': 'customer', 'fields': 'id'}
+        )
+        self.assertEqual(response.data['results'], [{'id': appointment.id}])
+
+        for expand in ('professional.business.city', 'unknown', 'status'):
+            response = self.client.get(reverse('appointment-list'), {'expand': expand})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('expand', response.data)
+
+    @patch('app.validators.datetime')
+    def test_bulk_transition(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        scheduled, confirmed, cancelled = [
+            Appointment.objects.create(
+                **self.appointment_args | {
+                    "datetime": self.mock_datetime + timedelta(hours=hours),
+                    "status": status_name
+                }
+            )
+            for hours, status_name in ((3, "SCHEDULED"), (5, "CONFIRMED"), (7, "CANCELLED"))
+        ]
+        ids = [scheduled.id, confirmed.id, cancelled.id, cancelled.id + 100]
+
+        # One UPDATE and one SELECT inside a savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                reverse('appointment-transition'),
+                {'ids': ids, 'status': 'completed'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['succeeded'], [scheduled.id, confirmed.id])
+        self.assertEqual(response.data['invalid'], [{'id': cancelled.id, 'status': 'CANCELLED'}])
+        self.assertEqual(response.data['not_found'], [cancelled.id + 100])
+
+        scheduled.refresh_from_db()
+        self.assertEqual(scheduled.status, "COMPLETED")
+        self.assertGreater(scheduled.updated_at, scheduled.created_at)
+
+        # Completed appointments are final
+        response = self.client.post(
+            reverse('appointment-transition'),
+            {'ids': [scheduled.id], 'status': 'CANCELLED'},
+            format='json'
+        )
+        self.assertEqual(response.data['succeeded'], [])
+        self.assertEqual(response.data['invalid'], [{'id': scheduled.id, 'status': 'COMPLETED'}])
+
+        response = self.client.post(
+            reverse('appointment-transition'),
+            {'ids': [scheduled.id], 'status': 'SCHEDULED'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+    @patch('app.validators.datetime')
+    def test_bulk_transition_skips_cancelled_twin(self, mock_datetime):
+        mock_datetime.now.return_value = self.mock_datetime
+        # Booked, cancelled and booked again on the same slot
+        cancelled = Appointment.objects.create(**self.appointment_args | {"status": "CANCELLED"})
+        rebooked = Appointment.objects.create(**self.appointment_args)
+        other = Appointment.objects.create(
+            **self.appointment_args | {"datetime": self.mock_datetime + timedelta(hours=5)}
+        )
+
+        response = self.client.post(
+            reverse('appointment-transition'),
+            {'ids': [rebooked.id, other.id], 'status': 'cancelled'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['succeeded'], [other.id])
+        self.assertEqual(response.data['invalid'], [{'id': rebooked.id, 'status': 'SCHEDULED'}])
+
+        rebooked.refresh_from_db()
+        self.assertEqual(rebooked.status, "SCHEDULED")
+        self.assertEqual(Appointment.objects.filter(status="CANCELLED").count(), 2)
+        self.assertTrue(Appointment.objects.filter(pk=cancelled.pk, status="CANCELLED").exists())
@@ -0,0 +1,375 @@
+from app.availability import refresh_availability_on_commit
+from app.models import (
+    Appointment,
+    AvailableDay,
+    Business,
+    Professional,
+    City,
+    Customer,
+    Service
+)
+from datetime import datetime, timedelta, time
+import calendar
+from zoneinfo import ZoneInfo
+from unittest.mock import patch
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class TestAvailabilityView(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule={
+                "1": {
+                    "start": "08:00",
+                    "end": "12:00",
+                    "breaks": [{"start": "10:00", "end": "10:30"}]
+                }
+            },
+            closed_on_holidays=False
+        )
+
+        cls.professional = Professional.objects.create(
+            name="John Doe",
+            email="email@example.com",
+            phone="11 99595-4250",
+            business=cls.business,
+            cpf="111.444.777-35",
+            speciality="Dentista",
+            schedule={
+                "1": {
+                    "start": "09:00",
+                    "end": "17:00",
+                    "breaks": []
+                }
+            }
+        )
+
+        cls.customer = Customer.objects.create(
+            business=cls.business,
+            name="Test Customer",
+            registration_source="WEBSITE",
+            cpf="111.444.777-35",
+            email="test@example.com",
+            phone="11995954250"
+        )
+
+        cls.service = Service.objects.create(
+            name="Test Service",
+            description="Test Description",
+            price=100.00,
+            duration=timedelta(minutes=30),
+            business=cls.business
+        )
+
+        # A Monday at least one week ahead
+        today = datetime.now(ZoneInfo("America/Sao_Paulo")).date()
+        cls.monday = today + timedelta(days=7 + (7 - today.weekday()) % 7)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _at(self, hour: int, minute: int = 0) -> datetime:
+        return datetime.combine(
+            self.monday,
+            time(hour, minute),
+            tzinfo=ZoneInfo("America/Sao_Paulo")
+        )
+
+    def _get(self, **params):
+        return self.client.get(
+            reverse('professional-availability', args=[self.professional.id]),
+            {'service': self.service.id, 'step': 30} | params
+        )
+
+    def test_availability(self):
+        AvailableDay.objects.create(
+            business=self.business,
+            professional=self.professional,
+            date=self.monday,
+            blocked_start_time=time(9, 0),
+            blocked_end_time=time(9, 30)
+        )
+        Appointment.objects.create(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=self._at(11),
+            source="WHATSAPP"
+        )
+
+        response = self._get(start=self.monday.isoformat())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['days'],
+            [{
+                'date': self.monday,
+                'slots': [self._at(9, 30), self._at(10, 30), self._at(11, 30)]
+            }]
+        )
+
+    def test_availability_ignores_cancelled_appointments(self):
+        Appointment.objects.create(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=self._at(9),
+            status="CANCELLED",
+            source="WHATSAPP"
+        )
+
+        response = self._get(start=self.monday.isoformat())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(self._at(9), response.data['days'][0]['slots'])
+
+    def test_availability_query_count_does_not_depend_on_range(self):
+        with self.assertNumQueries(4):
+            response = self._get(start=self.monday.isoformat())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(4):
+            response = self._get(
+                start=self.monday.isoformat(),
+                end=(self.monday + timedelta(days=60)).isoformat()
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['days']), 61)
+
+    def test_availability_invalid_range(self):
+        response = self._get(
+            start=self.monday.isoformat(),
+            end=(self.monday - timedelta(days=1)).isoformat()
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self._get(
+            start=self.monday.isoformat(),
+            end=(self.monday + timedelta(days=90)).isoformat()
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_availability_unauthenticated(self):
+        self.client.force_authenticate(user=None)
+        response = self._get(start=self.monday.isoformat())
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_next_available(self):
+        other = Professional.objects.create(
+            name="Jane Doe",
+            email="jane@example.com",
+            phone="11 99595-4251",
+            business=self.business,
+            cpf="529.982.247-25",
+            speciality="Dentista",
+            schedule={
+                "1": {
+                    "start": "08:00",
+                    "end": "09:00",
+                    "breaks": []
+                }
+            }
+        )
+
+        # The first date of each stream costs two queries. Jane has no
+        # other slot in the week, so her stream looks ahead in three more
+        # chunks (2, 4 and 8 dates) to the next Monday and then stops.
+        with self.assertNumQueries(12):
+            response = self.client.get(
+                reverse('service-next-available', args=[self.service.id]),
+                {'start': self.monday.isoformat(), 'limit': 4, 'step': 30}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['slots'],
+            [
+                {'professional': other.id, 'datetime': self._at(8)},
+                {'professional': other.id, 'datetime': self._at(8, 30)},
+                {'professional': self.professional.id, 'datetime': self._at(9)},
+                {'professional': self.professional.id, 'datetime': self._at(9, 30)}
+            ]
+        )
+
+    def test_next_available_skips_busy_dates(self):
+        Appointment.objects.create(
+            business=self.business,
+            customer=self.customer,
+            service=Service.objects.create(
+                name="Long Service",
+                description="Test Description",
+                price=100.00,
+                duration=timedelta(hours=3),
+                business=self.business
+            ),
+            professional=self.professional,
+            datetime=self._at(9),
+            source="WHATSAPP"
+        )
+
+        response = self.client.get(
+            reverse('service-next-available', args=[self.service.id]),
+            {'start': self.monday.isoformat(), 'limit': 1, 'step': 30}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['slots'],
+            [{
+                'professional': self.professional.id,
+                'datetime': self._at(9) + timedelta(days=7)
+            }]
+        )
+
+    def test_availability_cache_is_refreshed_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(
+                business=self.business,
+                customer=self.customer,
+                service=self.service,
+                professional=self.professional,
+                datetime=self._at(11),
+                source="WHATSAPP"
+            )
+
+        # The date was rebuilt on commit, so the read is a cache hit
+        # without the blocks and appointments queries
+        with self.assertNumQueries(2):
+            response = self._get(start=self.monday.isoformat())
+        self.assertNotIn(self._at(11), response.data['days'][0]['slots'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = "CANCELLED"
+            appointment.save()
+
+        with self.assertNumQueries(2):
+            response = self._get(start=self.monday.isoformat())
+        self.assertIn(self._at(11), response.data['days'][0]['slots'])
+
+    def test_availability_cache_is_refreshed_by_bulk_transition(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(
+                business=self.business,
+                customer=self.customer,
+                service=self.service,
+                professional=self.professional,
+                datetime=self._at(11),
+                source="WHATSAPP"
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('appointment-transition'),
+                {'ids': [appointment.id], 'status': 'CANCELLED'},
+                format='json'
+            )
+        self.assertEqual(response.data['succeeded'], [appointment.id])
+
+        with self.assertNumQueries(2):
+            response = self._get(start=self.monday.isoformat())
+        self.assertIn(self._at(11), response.data['days'][0]['slots'])
+
+    def test_availability_cache_refreshes_the_previous_date(self):
+        next_monday = self.monday + timedelta(days=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                business=self.business,
+                customer=self.customer,
+                service=self.service,
+                professional=self.professional,
+                datetime=self._at(11),
+                source="WHATSAPP"
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.get()
+            appointment.datetime += timedelta(days=7)
+            appointment.save()
+
+        # Both the old and the new date were rebuilt on commit
+        with self.assertNumQueries(2):
+            response = self._get(start=self.monday.isoformat())
+        self.assertIn(self._at(11), response.data['days'][0]['slots'])
+
+        with self.assertNumQueries(2):
+            response = self._get(start=next_monday.isoformat())
+        self.assertNotIn(self._at(11) + timedelta(days=7), response.data['days'][0]['slots'])
+
+    def test_availability_cache_of_other_processes_is_not_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_availability_on_commit([self.monday], professional_id=self.professional.id)
+        with self.assertNumQueries(2):
+            response = self._get(start=self.monday.isoformat())
+        self.assertIn(self._at(11), response.data['days'][0]['slots'])
+
+        # Booked by another process, which refreshes its own cache only
+        with patch('app.availability.cache.set_many'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Appointment.objects.create(
+                    business=self.business,
+                    customer=self.customer,
+                    service=self.service,
+                    professional=self.professional,
+                    datetime=self._at(11),
+                    source="WHATSAPP"
+                )
+
+        # The version read from the database misses the stale entry
+        response = self._get(start=self.monday.isoformat())
+        self.assertNotIn(self._at(11), response.data['days'][0]['slots'])
+
+    def test_occupancy(self):
+        for hour in (9, 11):
+            Appointment.objects.create(
+                business=self.business,
+                customer=self.customer,
+                service=self.service,
+                professional=self.professional,
+                datetime=self._at(hour),
+                source="WHATSAPP"
+            )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('business-occupancy', args=[self.business.id]),
+                {'month': self.monday.strftime('%Y-%m')}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        days = {day['date']: day['professionals'] for day in response.data['days']}
+        self.assertEqual(
+            len(days),
+            calendar.monthrange(self.monday.year, self.monday.month)[1]
+        )
+        # 09:00-10:00 and 10:30-12:00 are the common hours on Mondays
+        self.assertEqual(
+            days[self.monday],
+            [{'professional': self.professional.id, 'booked_minutes': 60, 'free_minutes': 90}]
+        )
+
+    def test_occupancy_invalid_month(self):
+        response = self.client.get(
+            reverse('business-occupancy', args=[self.business.id]),
+            {'month': '2025-13'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -17,7 +17,7 @@ class TestAvailableDayView(APITestCase):
             password='testpass123'
         )
 
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
 
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
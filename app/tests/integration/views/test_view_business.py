@@ -1,4 +1,6 @@
 from app.models import Business, City
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework import status
@@ -13,7 +15,7 @@ class TestBusinessView(APITestCase):
             email='test@example.com',
             password='testpass123'
         )
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
         cls.business_args = {
             "name": "Clínica Fagundes",
             "category": "C1",
@@ -158,4 +160,27 @@ class TestBusinessView(APITestCase):
         response = self.client.delete(
             reverse('business-detail', args=[business.id])
         )
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_select_fields(self):
+        business = Business.objects.create(**self.business_args)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('business-list'), {'fields': 'id,name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': business.id, 'name': business.name}])
+        # The schedule column is not fetched
+        self.assertNotIn('schedule', context.captured_queries[-1]['sql'])
+
+        response = self.client.get(
+            reverse('business-detail', args=[business.id]),
+            {'omit': 'schedule,email'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('schedule', response.data)
+        self.assertNotIn('email', response.data)
+        self.assertEqual(response.data['city'], business.city_id)
+
+        response = self.client.get(reverse('business-list'), {'fields': 'id,unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
@@ -0,0 +1,215 @@
+from app.models import (
+    Appointment,
+    Business,
+    Professional,
+    City,
+    Customer,
+    Service
+)
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class TestCalendarView(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule={
+                "0": {
+                    "start": "08:00",
+                    "end": "17:00",
+                    "breaks": []
+                }
+            },
+            closed_on_holidays=False
+        )
+
+        cls.professional = Professional.objects.create(
+            name="John Doe",
+            email="email@example.com",
+            phone="11 99595-4250",
+            business=cls.business,
+            cpf="111.444.777-35",
+            speciality="Dentista",
+            schedule={
+                "0": {
+                    "start": "08:00",
+                    "end": "17:00",
+                    "breaks": []
+                }
+            }
+        )
+
+        cls.customer = Customer.objects.create(
+            business=cls.business,
+            name="Test Customer",
+            registration_source="WEBSITE",
+            cpf="111.444.777-35",
+            email="test@example.com",
+            phone="11995954250"
+        )
+
+        cls.service = Service.objects.create(
+            name="Test Service",
+            description="Test Description",
+            price=100.00,
+            duration=timedelta(minutes=30),
+            business=cls.business
+        )
+
+        cls.appointment = Appointment.objects.create(
+            business=cls.business,
+            customer=cls.customer,
+            service=cls.service,
+            professional=cls.professional,
+            datetime=datetime.now(ZoneInfo("America/Sao_Paulo")) + timedelta(days=1),
+            source="WHATSAPP"
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_professional_calendar(self):
+        response = self.client.get(
+            reverse('professional-calendar', args=[self.professional.id]),
+            HTTP_ACCEPT='text/calendar'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        self.assertIn('ETag', response)
+
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:appointment-{self.appointment.id}@project-api', content)
+        self.assertIn('SUMMARY:Test Service - Test Customer', content)
+
+    def test_business_calendar(self):
+        response = self.client.get(reverse('business-calendar', args=[self.business.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count('BEGIN:VEVENT'), 1)
+
+    def test_calendar_not_modified(self):
+        url = reverse('professional-calendar', args=[self.professional.id])
+        etag = self.client.get(url)['ETag']
+
+        # A 304 costs the professional lookup and one aggregate query
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.appointment.status = "CONFIRMED"
+        self.appointment.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('STATUS:CONFIRMED', b''.join(response.streaming_content).decode())
+
+    def test_calendar_unauthenticated(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('professional-calendar', args=[self.professional.id]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_calendar_token(self):
+        self.client.force_authenticate(user=None)
+        url = reverse('professional-calendar', args=[self.professional.id])
+
+        response = self.client.get(url, {'token': self.professional.calendar_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn(f'UID:appointment-{self.appointment.id}@project-api', content)
+
+        response = self.client.get(
+            reverse('business-calendar', args=[self.business.id]),
+            {'token': self.business.calendar_token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_calendar_invalid_token(self):
+        self.client.force_authenticate(user=None)
+        url = reverse('professional-calendar', args=[self.professional.id])
+
+        response = self.client.get(url, {'token': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # A token only opens the feed of its own owner
+        other = Professional.objects.create(
+            name="Jane Doe",
+            email="jane@example.com",
+            phone="11 99595-4251",
+            business=self.business,
+            cpf="529.982.247-25",
+            speciality="Dentista",
+            schedule=self.professional.schedule
+        )
+        self.assertNotEqual(other.calendar_token, self.professional.calendar_token)
+        response = self.client.get(url, {'token': other.calendar_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(
+            reverse('business-calendar', args=[self.business.id]),
+            {'token': self.professional.calendar_token}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_calendar_etag_follows_renames(self):
+        url = reverse('professional-calendar', args=[self.professional.id])
+        etag = self.client.get(url)['ETag']
+
+        self.customer.name = "Renamed Customer"
+        self.customer.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            'SUMMARY:Test Service - Renamed Customer',
+            b''.join(response.streaming_content).decode()
+        )
+
+    def test_calendar_error_bodies(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(
+            reverse('professional-calendar', args=[self.professional.id]),
+            {'token': 'wrong'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        self.assertEqual(response.content.decode(), 'Invalid calendar token.')
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('professional-calendar', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            response.content.decode(),
+            'No Professional matches the given query.'
+        )
+
+        response = self.client.get(
+            reverse('professional-calendar', args=[0]),
+            HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            response.json(),
+            {'detail': 'No Professional matches the given query.'}
+        )
@@ -1,7 +1,20 @@
+from app.cities import (
+    CITY_CACHE_MAX_AGE,
+    CITY_INDEX_TTL,
+    get_city_index,
+    get_city_responses,
+    reset_city_index,
+    warm_city_cache
+)
+from app.models import City
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.test import APITestCase
+from unittest import mock
+import gzip
+import json
+import time
 
 
 class TestCityView(APITestCase):
@@ -13,6 +26,16 @@ class TestCityView(APITestCase):
             email='test@example.com',
             password='testpass123'
         )
+        cls.city = City.objects.create(name='Cidade de Teste', state='RO')
+        cls.north = City.objects.create(name='Testópolis do Norte', state='RN')
+        City.objects.create(name='Testópolis', state='SP')
+        City.objects.create(name='Testópolis Velha', state='SP')
+
+    def setUp(self):
+        # The index and the rendered responses are kept per process,
+        # so they are rebuilt with the cities of this test case
+        reset_city_index()
+        self.addCleanup(reset_city_index)
 
     def test_list_cities(self):
         self.client.force_authenticate(user=self.user)
@@ -23,3 +46,137 @@ class TestCityView(APITestCase):
     def test_list_cities_unauthenticated(self):
         response = self.client.get(reverse('city-list'))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_autocomplete_cities(self):
+        self.client.force_authenticate(user=self.user)
+        get_city_index()
+
+        # Served from the index built once per process
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-list'), {'q': '  TESTOPO'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['name'], 'Testópolis')
+        self.assertEqual(response.data[0]['state'], 'SP')
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(city['name'].startswith('Testópolis') for city in response.data))
+
+        response = self.client.get(reverse('city-list'), {'q': 'testópolis', 'state': 'rn', 'limit': 1})
+        self.assertEqual(
+            response.data,
+            [{'id': self.north.id, 'name': 'Testópolis do Norte', 'state': 'RN'}]
+        )
+
+        response = self.client.get(reverse('city-list'), {'q': 'xyz'})
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(reverse('city-list'), {'q': 'sao', 'limit': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_cities_by_state(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('city-list'), {'state': 'ro'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], City.objects.filter(state='RO').count())
+        self.assertTrue(all(city['state'] == 'RO' for city in response.data['results']))
+
+    def test_all_cities_are_pre_rendered(self):
+        get_city_responses()
+
+        # Public, and served from the rendered bytes with no query
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-all'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={CITY_CACHE_MAX_AGE}')
+        self.assertEqual(
+            json.loads(response.content),
+            list(City.objects.order_by('id').values('id', 'name', 'state'))
+        )
+
+        response = self.client.get(reverse('city-all'), {'state': 'ro'})
+        self.assertEqual(
+            [city['name'] for city in json.loads(response.content)],
+            list(City.objects.filter(state='RO').order_by('id').values_list('name', flat=True))
+        )
+
+        response = self.client.get(reverse('city-all'), {'state': 'XX'})
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_all_cities_gzip_and_etag(self):
+        plain = self.client.get(reverse('city-all'))
+        response = self.client.get(reverse('city-all'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+
+        # Either ETag revalidates the list
+        for etag in (plain['ETag'], response['ETag']):
+            response = self.client.get(reverse('city-all'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+        reset_city_index()
+        response = self.client.get(reverse('city-all'), HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_city_is_pre_rendered(self):
+        self.client.force_authenticate(user=self.user)
+        city = self.city
+        get_city_responses()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-detail', args=[city.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), {'id': city.id, 'name': 'Cidade de Teste', 'state': 'RO'})
+        self.assertEqual(response['Cache-Control'], f'private, max-age={CITY_CACHE_MAX_AGE}')
+
+        response = self.client.get(reverse('city-detail', args=[city.id]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(reverse('city-detail', args=[city.id]), {'fields': 'name'})
+        self.assertEqual(response.data, {'name': 'Cidade de Teste'})
+
+        response = self.client.get(reverse('city-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_city_unauthenticated(self):
+        response = self.client.get(reverse('city-detail', args=[self.city.id]))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_warm_city_cache(self):
+        self.client.force_authenticate(user=self.user)
+        warm_city_cache()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-all'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city-list'), {'q': 'testo'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cities_reload_after_ttl(self):
+        self.client.force_authenticate(user=self.user)
+        responses = get_city_responses()
+        index = get_city_index()
+        etag = self.client.get(reverse('city-all'))['ETag']
+
+        # A reload that finds the same cities keeps what was built
+        later = time.monotonic() + CITY_INDEX_TTL
+        with mock.patch('app.cities.time.monotonic', return_value=later):
+            self.assertIs(get_city_responses(), responses)
+            self.assertIs(get_city_index(), index)
+
+        # A sync of another process reaches this one after the TTL
+        City.objects.create(name='Testópolis Nova', state='SP')
+        response = self.client.get(reverse('city-all'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with mock.patch('app.cities.time.monotonic', return_value=later + CITY_INDEX_TTL):
+            response = self.client.get(reverse('city-all'), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Testópolis Nova', [city['name'] for city in json.loads(response.content)])
+
+            response = self.client.get(reverse('city-list'), {'q': 'testopolis n'})
+            self.assertEqual([city['name'] for city in response.data], ['Testópolis Nova'])
@@ -17,7 +17,7 @@ class TestCustomerView(APITestCase):
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
             category="C1",
-            city=City.objects.get(name="Ariquemes", state="RO"),
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
             address="Rua 1",
             public_phone="(12) 3456-7890",
             restricted_phone="(12) 3456-7890",
@@ -165,3 +165,217 @@ class TestCustomerView(APITestCase):
             reverse('customer-detail', args=[customer.id])
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_filter_customers(self):
+        customer = Customer.objects.create(**self.customer_args)
+        opt_in = Customer.objects.create(
+            **self.customer_args | {"cpf": "529.982.247-25", "is_opt_in": True}
+        )
+        inactive = Customer.objects.create(
+            **self.customer_args | {"cpf": "390.533.447-05", "is_active": False}
+        )
+
+        def ids(**params):
+            response = self.client.get(reverse('customer-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {customer['id'] for customer in response.data['results']}
+
+        # Only the active customers unless asked otherwise
+        self.assertEqual(ids(business=self.business.id), {customer.id, opt_in.id})
+        self.assertEqual(ids(business=self.business.id, include_inactive='true'), {customer.id, opt_in.id, inactive.id})
+        self.assertEqual(ids(is_active='true'), {customer.id, opt_in.id})
+        self.assertEqual(ids(is_active='false'), {inactive.id})
+        self.assertEqual(ids(business=self.business.id, is_opt_in='1'), {opt_in.id})
+        self.assertEqual(ids(business=self.business.id + 1), set())
+
+        response = self.client.get(reverse('customer-list'), {'business': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('customer-list'), {'include_inactive': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Inactive customers are still reachable by id, to reactivate them
+        response = self.client.patch(
+            reverse('customer-detail', args=[inactive.id]),
+            {'is_active': True},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_customers(self):
+        maria = Customer.objects.create(**self.customer_args | {"name": "Maria da Conceição"})
+        joao = Customer.objects.create(
+            **self.customer_args | {
+                "name": "João Conceicao",
+                "cpf": "529.982.247-25",
+                "email": "Joao@Example.com",
+                "phone": "(11) 98888-7777"
+            }
+        )
+        other_business = Business.objects.create(
+            name="Clínica Outra",
+            category="C1",
+            city=self.business.city,
+            address="Rua 2",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@outra.com",
+            schedule=self.business.schedule,
+            closed_on_holidays=False
+        )
+        Customer.objects.create(**self.customer_args | {"business": other_business, "name": "Maria Outra"})
+
+        def ids(search):
+            response = self.client.get(
+                reverse('customer-list'),
+                {'business': self.business.id, 'search': search}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {customer['id'] for customer in response.data['results']}
+
+        self.assertEqual(ids('MARIA'), {maria.id})
+        self.assertEqual(ids('conceiç'), {maria.id, joao.id})
+        self.assertEqual(ids('joão conc'), {joao.id})
+        self.assertEqual(ids('aria'), set())
+        self.assertEqual(ids('111.444.777-35'), {maria.id})
+        self.assertEqual(ids('11 98888-7777'), {joao.id})
+        self.assertEqual(ids('98888'), set())
+        self.assertEqual(ids(' joao@example.com'), {joao.id})
+
+        response = self.client.get(reverse('customer-list'), {'business': self.business.id, 'search': 'maria'})
+        self.assertNotIn('search_name', response.data['results'][0])
+
+        # The search is scoped to a business
+        response = self.client.get(reverse('customer-list'), {'search': 'maria'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('business', response.data)
+
+    def test_search_fields_follow_updates(self):
+        customer = Customer.objects.create(**self.customer_args)
+        response = self.client.patch(
+            reverse('customer-detail', args=[customer.id]),
+            {'name': 'Ângela Souza', 'email': 'ANGELA@example.com'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        customer.refresh_from_db()
+        self.assertEqual(customer.search_name, 'angela souza')
+        self.assertEqual(customer.search_email, 'angela@example.com')
+        self.assertEqual(customer.search_cpf, '11144477735')
+        self.assertEqual(customer.search_phone, '11995954250')
+
+    def test_cursor_pagination(self):
+        customers = [
+            Customer.objects.create(**self.customer_args | {"cpf": cpf})
+            for cpf in ("111.444.777-35", "529.982.247-25", "390.533.447-05")
+        ]
+
+        response = self.client.get(
+            reverse('customer-list'),
+            {'pagination': 'cursor', 'page_size': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(
+            [customer['id'] for customer in response.data['results']],
+            [customers[0].id, customers[1].id]
+        )
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [customer['id'] for customer in response.data['results']],
+            [customers[2].id]
+        )
+
+    def test_bulk_upsert_customers(self):
+        existing = Customer.objects.create(**self.customer_args | {"cpf": "11144477735"})
+        row = {
+            "business": self.business.id,
+            "name": "bulk customer",
+            "registration_source": "website",
+            "cpf": "529.982.247-25",
+            "phone": "(11) 99595-4250"
+        }
+        rows = [
+            row,
+            row | {"cpf": "111.444.777-35", "name": "renamed customer"},
+            row | {"cpf": "123.456.789-00"},
+            row | {"cpf": "529.982.247-25"},
+            row | {"cpf": "390.533.447-05", "business": self.business.id + 100},
+            row | {"cpf": "390.533.447-05", "phone": "123"},
+            "not an object",
+        ]
+
+        response = self.client.post(reverse('customer-bulk'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5, 6])
+        self.assertIn('cpf', response.data['errors'][0]['errors'])
+        self.assertIn('business', response.data['errors'][2]['errors'])
+        self.assertIn('phone', response.data['errors'][3]['errors'])
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, "Renamed Customer")
+        self.assertEqual(existing.search_name, "renamed customer")
+        created = Customer.objects.get(cpf="52998224725")
+        self.assertEqual(created.name, "Bulk Customer")
+        self.assertEqual(created.phone, "11995954250")
+        self.assertEqual(created.search_cpf, "52998224725")
+
+    def test_bulk_upsert_customers_ndjson(self):
+        lines = [
+            '{"business": %d, "name": "a", "registration_source": "WEBSITE", '
+            '"cpf": "52998224725", "phone": "11995954250"}' % self.business.id,
+            '',
+            '{"business": ',
+            '{"business": %d, "name": "b", "registration_source": "WEBSITE", '
+            '"cpf": "39053344705", "phone": "11995954250"}' % self.business.id,
+        ]
+        response = self.client.post(
+            reverse('customer-bulk'),
+            '\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertEqual(Customer.objects.count(), 2)
+
+        response = self.client.post(reverse('customer-bulk'), {'name': 'a'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_upsert_query_count(self):
+        def cpf(number):
+            digits = [int(digit) for digit in f"{number:09d}"]
+            for size in (9, 10):
+                total = sum(digit * (size + 1 - index) for index, digit in enumerate(digits))
+                digits.append(total * 10 % 11 % 10)
+            return "".join(map(str, digits))
+
+        def rows(count):
+            return [
+                {
+                    "business": self.business.id,
+                    "name": f"customer {index}",
+                    "registration_source": "WEBSITE",
+                    "cpf": cpf(100000000 + index),
+                    "phone": "11995954250"
+                }
+                for index in range(count)
+            ]
+
+        # Savepoint, businesses, existing CPFs, insert and release,
+        # whatever the number of rows in the batch (SQLite splits
+        # inserts of more than 999 parameters)
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('customer-bulk'), rows(2), format='json')
+        self.assertEqual(response.data['created'], 2)
+
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('customer-bulk'), rows(60), format='json')
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(response.data['created'], 58)
+        self.assertEqual(response.data['updated'], 2)
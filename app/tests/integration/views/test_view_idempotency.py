@@ -0,0 +1,190 @@
+from app.idempotency import IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_LOCK_TIMEOUT
+from app.models import Appointment, Business, City, Customer, IdempotencyKey, Professional, Service
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from io import StringIO
+from rest_framework import status
+from rest_framework.test import APITestCase
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+
+class TestIdempotencyView(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        cls.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+
+        schedule = {
+            "0": {
+                "start": "08:00",
+                "end": "17:00",
+                "breaks": []
+            }
+        }
+        cls.business = Business.objects.create(
+            name="Clínica Fagundes",
+            category="C1",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@fagundes.com",
+            schedule=schedule,
+            closed_on_holidays=False
+        )
+        cls.professional = Professional.objects.create(
+            name="John Doe",
+            email="email@example.com",
+            phone="11 99595-4250",
+            business=cls.business,
+            cpf="111.444.777-35",
+            speciality="Dentista",
+            schedule=schedule
+        )
+        cls.service = Service.objects.create(
+            name="Test Service",
+            description="Test Description",
+            price=100.00,
+            duration=timedelta(minutes=30),
+            business=cls.business
+        )
+
+        cls.customer_data = {
+            "business": cls.business.id,
+            "name": "Test Customer",
+            "registration_source": "WHATSAPP",
+            "cpf": "111.444.777-35",
+            "email": "customer@example.com",
+            "phone": "11995954250"
+        }
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def _create_customer(self, key, data=None):
+        return self.client.post(
+            reverse('customer-list'),
+            data or self.customer_data,
+            format='json',
+            headers={'Idempotency-Key': key}
+        )
+
+    def test_replay_create(self):
+        response = self._create_customer('key-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+        # The retry only looks the key up
+        with self.assertNumQueries(1):
+            replay = self._create_customer('key-1')
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), response.json())
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_without_key(self):
+        response = self.client.post(reverse('customer-list'), self.customer_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_reused_by_a_different_request(self):
+        self._create_customer('key-1')
+        response = self._create_customer('key-1', self.customer_data | {"name": "Other Customer"})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_keys_are_scoped_by_user(self):
+        self._create_customer('key-1')
+        self.client.force_authenticate(user=self.other_user)
+        response = self._create_customer('key-1', self.customer_data | {"cpf": "529.982.247-25"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_invalid_key(self):
+        response = self._create_customer('k' * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Idempotency-Key', response.data)
+
+    def test_validation_error_releases_key(self):
+        data = self.customer_data | {"cpf": "123"}
+        response = self._create_customer('key-1', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self._create_customer('key-1', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_running_request(self):
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key='key-1',
+            fingerprint='0' * 64,
+            created_at=now,
+            expires_at=now + IDEMPOTENCY_KEY_TTL
+        )
+
+        response = self._create_customer('key-1')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Customer.objects.exists())
+
+        # A request that never finished stops blocking its key
+        IdempotencyKey.objects.update(created_at=now - IDEMPOTENCY_LOCK_TIMEOUT)
+        response = self._create_customer('key-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired_key(self):
+        self._create_customer('key-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        Customer.objects.all().delete()
+
+        response = self._create_customer('key-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_purge_idempotency_keys(self):
+        self._create_customer('key-1')
+        self._create_customer('key-2', self.customer_data | {"cpf": "529.982.247-25"})
+        IdempotencyKey.objects.filter(key='key-1').update(expires_at=timezone.now())
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
+
+    @patch('app.validators.datetime')
+    def test_replay_appointment_create(self, mock_datetime):
+        now = datetime.now(ZoneInfo("America/Sao_Paulo"))
+        mock_datetime.now.return_value = now
+        customer = Customer.objects.create(**self.customer_data | {"business": self.business})
+        data = {
+            "business": self.business.id,
+            "customer": customer.id,
+            "service": self.service.id,
+            "professional": self.professional.id,
+            "datetime": (now + timedelta(hours=3)).isoformat(),
+            "source": "WHATSAPP"
+        }
+
+        responses = [
+            self.client.post(reverse('appointment-list'), data, format='json', headers={'Idempotency-Key': 'key-1'})
+            for _ in range(3)
+        ]
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_201_CREATED] * 3)
+        self.assertEqual({response.json()['id'] for response in responses}, {Appointment.objects.get().id})
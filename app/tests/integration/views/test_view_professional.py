@@ -14,7 +14,7 @@ class TestProfessionalView(APITestCase):
             password='testpass123'
         )
 
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
 
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
@@ -186,4 +186,40 @@ class TestProfessionalView(APITestCase):
         
         
     
-        
\ No newline at end of file
+        
+    def test_filter_professionals(self):
+        professional = Professional.objects.create(**self.professional_args)
+        inactive = Professional.objects.create(
+            **self.professional_args | {"cpf": "529.982.247-25", "is_active": False}
+        )
+
+        def ids(**params):
+            response = self.client.get(reverse('professional-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {professional['id'] for professional in response.data['results']}
+
+        # Only the active professionals unless asked otherwise
+        self.assertEqual(ids(business=self.business.id), {professional.id})
+        self.assertEqual(ids(business=self.business.id, include_inactive='1'), {professional.id, inactive.id})
+        self.assertEqual(ids(business=self.business.id, is_active='true'), {professional.id})
+        self.assertEqual(ids(is_active='false'), {inactive.id})
+        self.assertEqual(ids(business=self.business.id + 1), set())
+
+    def test_bulk_upsert_professionals(self):
+        existing = Professional.objects.create(**self.professional_args | {"cpf": "11144477735"})
+        row = self.professional_args | {"business": self.business.id, "cpf": "529.982.247-25"}
+
+        response = self.client.post(
+            reverse('professional-bulk'),
+            [row, row | {"cpf": "111.444.777-35", "speciality": "Ortodontista"}, row | {"schedule": {"9": {}}}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertIn('schedule', response.data['errors'][0]['errors'])
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.speciality, "Ortodontista")
+        self.assertGreater(existing.updated_at, existing.created_at)
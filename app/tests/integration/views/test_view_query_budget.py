@@ -0,0 +1,140 @@
+from app.models import (
+    Appointment,
+    Business,
+    City,
+    Customer,
+    Professional,
+    Service
+)
+from app.tests.query_budget import QueryBudgetMixin
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from django.db import transaction
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class TestViewQueryBudget(QueryBudgetMixin, APITestCase):
+    """
+    The list endpoints, in JSON and in the browsable API,
+    run the same number of queries for 1 or 10 rows
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
+        cls.schedule = {
+            "0": {
+                "start": "08:00",
+                "end": "17:00",
+                "breaks": []
+            }
+        }
+        cls.start = datetime.now(ZoneInfo("America/Sao_Paulo")) + timedelta(days=1)
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def grow(self, size: int) -> None:
+        """
+        Create rows until there are `size` businesses, each with
+        a customer, a service, a professional and an appointment
+        """
+        for index in range(Business.objects.count(), size):
+            business = Business.objects.create(
+                name=f"Clínica {index}",
+                category="C1",
+                city=self.city,
+                address="Rua 1",
+                public_phone="(12) 3456-7890",
+                restricted_phone="(12) 3456-7890",
+                email="clinica@fagundes.com",
+                schedule=self.schedule,
+                closed_on_holidays=False
+            )
+            customer = Customer.objects.create(
+                business=business,
+                name="Test Customer",
+                registration_source="WEBSITE",
+                cpf="111.444.777-35",
+                email="test@example.com",
+                phone="11995954250"
+            )
+            service = Service.objects.create(
+                business=business,
+                name="Test Service",
+                description="Test Description",
+                price=100.00,
+                duration=timedelta(minutes=30)
+            )
+            professional = Professional.objects.create(
+                business=business,
+                name="John Doe",
+                email="email@example.com",
+                phone="11 99595-4250",
+                cpf="111.444.777-35",
+                speciality="Dentista",
+                schedule=self.schedule
+            )
+            # Skip the validation of the datetime against the schedule
+            Appointment.objects.bulk_create([Appointment(
+                business=business,
+                customer=customer,
+                service=service,
+                professional=professional,
+                datetime=self.start,
+                end_datetime=self.start + service.duration,
+                source="WEBSITE"
+            )])
+
+    def get(self, name: str, **params: str):
+        def request():
+            response = self.client.get(reverse(name), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response
+        return request
+
+    def test_list_budget(self):
+        budgets = {
+            'business-list': 2,
+            'customer-list': 2,
+            'service-list': 2,
+            'professional-list': 2,
+            'appointment-list': 2,
+        }
+        for name, budget in budgets.items():
+            with self.subTest(name), transaction.atomic():
+                self.assertQueryBudget(budget, self.get(name), self.grow)
+                # Start the next endpoint without rows
+                transaction.set_rollback(True)
+
+    def test_expand_budget(self):
+        with transaction.atomic():
+            self.assertQueryBudget(
+                2,
+                self.get('appointment-list', expand='customer,service,professional,business.city'),
+                self.grow
+            )
+            transaction.set_rollback(True)
+
+        self.assertQueryBudget(2, self.get('customer-list', expand='business.city'), self.grow)
+
+    def test_browsable_api_budget(self):
+        budgets = {
+            'business-list': 3,
+            'customer-list': 3,
+            'service-list': 3,
+            'professional-list': 3,
+            'appointment-list': 6,
+        }
+        for name, budget in budgets.items():
+            with self.subTest(name), transaction.atomic():
+                self.assertQueryBudget(budget, self.get(name, format='api'), self.grow)
+                transaction.set_rollback(True)
@@ -0,0 +1,188 @@
+from app.models import (
+    Appointment,
+    AvailableDay,
+    Business,
+    Professional,
+    City,
+    Customer,
+    Service
+)
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+
+class TestRecurringAppointmentView(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+        schedule = {
+            "2": {
+                "start": "08:00",
+                "end": "18:00",
+                "breaks": [{"start": "12:00", "end": "13:00"}]
+            }
+        }
+
+        cls.business = Business.objects.create(
+            name="Clínica Mente Sã",
+            category="C2",
+            city=City.objects.create(name="Cidade de Teste", state="RO"),
+            address="Rua 1",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="clinica@mentesa.com",
+            schedule=schedule,
+            closed_on_holidays=False
+        )
+
+        cls.professional = Professional.objects.create(
+            name="John Doe",
+            email="email@example.com",
+            phone="11 99595-4250",
+            business=cls.business,
+            cpf="111.444.777-35",
+            speciality="Psicólogo",
+            schedule=schedule
+        )
+
+        cls.customer = Customer.objects.create(
+            business=cls.business,
+            name="Test Customer",
+            registration_source="WEBSITE",
+            cpf="111.444.777-35",
+            email="test@example.com",
+            phone="11995954250"
+        )
+
+        cls.service = Service.objects.create(
+            name="Sessão",
+            description="Sessão semanal",
+            price=150.00,
+            duration=timedelta(minutes=50),
+            business=cls.business
+        )
+
+        # A Tuesday at 14:00 at least one week ahead
+        today = datetime.now(ZoneInfo("America/Sao_Paulo")).date()
+        tuesday = today + timedelta(days=7 + (1 - today.weekday()) % 7)
+        cls.start = datetime.combine(tuesday, time(14), tzinfo=ZoneInfo("America/Sao_Paulo"))
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def _post(self, **data):
+        return self.client.post(
+            reverse('appointment-recurring'),
+            {
+                "business": self.business.id,
+                "customer": self.customer.id,
+                "service": self.service.id,
+                "professional": self.professional.id,
+                "datetime": self.start.isoformat(),
+                "source": "whatsapp"
+            } | data,
+            format='json'
+        )
+
+    def test_create_series(self):
+        response = self._post(occurrences=4)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(
+            sorted(Appointment.objects.values_list('datetime', flat=True)),
+            [self.start + timedelta(weeks=week) for week in range(4)]
+        )
+        self.assertTrue(all(
+            appointment.end_datetime == appointment.datetime + self.service.duration
+            for appointment in Appointment.objects.all()
+        ))
+
+    def test_create_series_reports_conflicts(self):
+        Appointment.objects.create(
+            business=self.business,
+            customer=self.customer,
+            service=self.service,
+            professional=self.professional,
+            datetime=self.start + timedelta(weeks=1, minutes=15),
+            source="WEBSITE"
+        )
+        AvailableDay.objects.create(
+            business=self.business,
+            date=(self.start + timedelta(weeks=2)).date(),
+            blocked_start_time=time(13),
+            blocked_end_time=time(14, 30)
+        )
+
+        response = self._post(occurrences=4, interval_weeks=1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['conflicts'], 2)
+
+        conflicts = [occurrence['conflict'] for occurrence in response.data['occurrences']]
+        self.assertIsNone(conflicts[0])
+        self.assertIn('already has an appointment', conflicts[1])
+        self.assertIn('blocked', conflicts[2])
+        self.assertIsNone(conflicts[3])
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_create_series_outside_working_hours(self):
+        response = self._post(
+            datetime=(self.start - timedelta(hours=2)).isoformat(),
+            occurrences=2
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(Appointment.objects.count(), 0)
+
+    def test_query_count_does_not_depend_on_occurrences(self):
+        # Including the lock of the professional (SELECT ... FOR UPDATE,
+        # or the advisory lock in PostgreSQL)
+        with self.assertNumQueries(10):
+            response = self._post(occurrences=2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(10):
+            response = self._post(
+                datetime=(self.start + timedelta(hours=1)).isoformat(),
+                occurrences=24
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 24)
+
+    def test_create_series_with_foreign_service(self):
+        other_business = Business.objects.create(
+            name="Outra Clínica",
+            category="C2",
+            city=self.business.city,
+            address="Rua 2",
+            public_phone="(12) 3456-7890",
+            restricted_phone="(12) 3456-7890",
+            email="outra@clinica.com",
+            schedule=self.business.schedule,
+            closed_on_holidays=False
+        )
+        service = Service.objects.create(
+            name="Sessão",
+            description="Sessão semanal",
+            price=150.00,
+            duration=timedelta(minutes=50),
+            business=other_business
+        )
+
+        response = self._post(service=service.id, occurrences=2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_series_unauthenticated(self):
+        self.client.force_authenticate(user=None)
+        response = self._post(occurrences=2)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
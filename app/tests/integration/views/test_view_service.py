@@ -15,7 +15,7 @@ class TestServiceView(APITestCase):
             email='test@example.com',
             password='testpass123'
         )
-        cls.city = City.objects.get(name="Ariquemes", state="RO")
+        cls.city = City.objects.create(name="Cidade de Teste", state="RO")
 
         cls.business = Business.objects.create(
             name="Clínica Fagundes",
@@ -53,6 +53,19 @@ class TestServiceView(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 1)
 
+    def test_list_active_services(self):
+        service = Service.objects.create(**self.service_args)
+        inactive = Service.objects.create(**self.service_args | {"name": "Old Service", "is_active": False})
+
+        response = self.client.get(reverse('service-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [service.id])
+
+        response = self.client.get(reverse('service-list'), {'include_inactive': '1'})
+        self.assertEqual({row['id'] for row in response.data['results']}, {service.id, inactive.id})
+
+        response = self.client.get(reverse('service-detail', args=[inactive.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_list_services_unauthenticated(self):
         self.client.force_authenticate(user=None)
         response = self.client.get(reverse('service-list'))
@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from typing import Callable
+
+
+class QueryBudgetMixin:
+    """
+    Checks that an endpoint stays inside its declared number of
+    queries and that the number does not grow with the rows it returns
+    """
+
+    def assertQueryBudget(
+        self,
+        budget: int,
+        request: Callable[[], object],
+        grow: Callable[[int], None],
+        sizes: tuple[int, ...] = (1, 10)
+    ) -> None:
+        """
+        For each size, call grow(size) to have that many rows,
+        run the request and count its queries
+        """
+        counts = {}
+        for size in sizes:
+            grow(size)
+            with CaptureQueriesContext(connection) as context:
+                request()
+            counts[size] = len(context.captured_queries)
+            queries = '\n'.join(query['sql'] for query in context.captured_queries)
+            self.assertLessEqual(
+                counts[size],
+                budget,
+                f'{counts[size]} queries with {size} rows, over the budget of {budget}:\n{queries}'
+            )
+
+        self.assertEqual(
+            len(set(counts.values())),
+            1,
+            f'The number of queries grows with the number of rows: {counts}'
+        )
@@ -0,0 +1,40 @@
+from app.availability import slots_from_intervals, local_midnight
+from unittest import TestCase
+from datetime import date, timedelta
+
+
+class TestAvailability(TestCase):
+
+    def test_slots_from_intervals(self):
+        day = date(2025, 1, 6)
+        midnight = local_midnight(day)
+
+        slots = slots_from_intervals(
+            day,
+            [(485, 600)],
+            timedelta(minutes=30),
+            timedelta(minutes=30)
+        )
+        self.assertEqual(
+            slots,
+            [midnight + timedelta(minutes=minute) for minute in (510, 540, 570)]
+        )
+
+        slots = slots_from_intervals(
+            day,
+            [(480, 600)],
+            timedelta(minutes=30),
+            timedelta(minutes=30),
+            not_before=midnight + timedelta(minutes=500)
+        )
+        self.assertEqual(
+            slots,
+            [midnight + timedelta(minutes=minute) for minute in (510, 540, 570)]
+        )
+
+    def test_slots_from_intervals_without_room(self):
+        day = date(2025, 1, 6)
+        self.assertEqual(
+            slots_from_intervals(day, [(480, 500)], timedelta(minutes=30)),
+            []
+        )
@@ -0,0 +1,59 @@
+from app.cities import CityIndex, fold, parse_ibge_cities, read_city_snapshot, write_city_snapshot
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+
+class TestCities(TestCase):
+
+    def test_fold(self):
+        self.assertEqual(fold('São  Paulo'), 'sao paulo')
+        self.assertEqual(fold(' GOIÂNIA '), 'goiania')
+        self.assertEqual(fold("Pau-d'Arco"), "pau-d'arco")
+
+    def test_search(self):
+        index = CityIndex([
+            (1, 'São Paulo', 'SP'),
+            (2, 'São Paulo do Potengi', 'RN'),
+            (3, 'Santos', 'SP'),
+            (4, 'Santo André', 'SP'),
+            (5, 'Salvador', 'BA'),
+        ])
+
+        self.assertEqual(index.search('sao paulo'), [(1, 'São Paulo', 'SP'), (2, 'São Paulo do Potengi', 'RN')])
+        self.assertEqual(index.search('SAO PAULO', state='RN'), [(2, 'São Paulo do Potengi', 'RN')])
+        self.assertEqual(index.search('sant'), [(4, 'Santo André', 'SP'), (3, 'Santos', 'SP')])
+        self.assertEqual(index.search('sa', limit=2), [(5, 'Salvador', 'BA'), (4, 'Santo André', 'SP')])
+        self.assertEqual(index.search('sao', state='MG'), [])
+        self.assertEqual(index.search('x'), [])
+
+    def test_snapshot(self):
+        municipalities = [
+            {'id': code, 'nome': name, 'regiao-imediata': {'regiao-intermediaria': {'UF': {'sigla': state}}}}
+            for code, name, state in [
+                (3548500, 'Santos', 'SP'),
+                (1100023, 'Ariquemes', 'RO'),
+                (3550308, 'São Paulo', 'SP'),
+                (3548500, 'Santos', 'SP')
+            ]
+        ]
+        self.assertEqual(
+            parse_ibge_cities(municipalities),
+            [(1100023, 'Ariquemes', 'RO'), (3548500, 'Santos', 'SP'), (3550308, 'São Paulo', 'SP')]
+        )
+        cities = [('Ariquemes', 'RO'), ('Santos', 'SP'), ('São Paulo', 'SP')]
+
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'cities.csv.gz'
+            write_city_snapshot(cities, path)
+            content = path.read_bytes()
+            self.assertEqual(read_city_snapshot(path), cities)
+
+            # Same cities, same bytes
+            write_city_snapshot(reversed(cities), path)
+            self.assertEqual(path.read_bytes(), content)
+
+    def test_bundled_snapshot(self):
+        cities = read_city_snapshot()
+        self.assertIn(('São Paulo', 'SP'), cities)
+        self.assertEqual(len(cities), len(set(cities)))
@@ -0,0 +1,62 @@
+from app.holidays import HolidayCalendar, easter, national_holidays, regional_movable_holidays
+from datetime import date
+from unittest import TestCase
+
+
+class TestHolidays(TestCase):
+
+    def test_easter(self):
+        self.assertEqual(easter(2024), date(2024, 3, 31))
+        self.assertEqual(easter(2025), date(2025, 4, 20))
+        self.assertEqual(easter(2038), date(2038, 4, 25))
+        self.assertEqual(easter(2285), date(2285, 3, 22))
+
+    def test_national_holidays(self):
+        holidays = dict(national_holidays(2025))
+        self.assertEqual(len(holidays), 10)
+        self.assertEqual(holidays[date(2025, 4, 18)], 'Sexta-feira Santa')
+        self.assertIn(date(2025, 11, 20), holidays)
+        # Optional days off nationwide, not national holidays
+        self.assertNotIn(date(2025, 3, 3), holidays)
+        self.assertNotIn(date(2025, 3, 4), holidays)
+        self.assertNotIn(date(2025, 6, 19), holidays)
+        self.assertEqual(list(holidays), sorted(holidays))
+
+        # Consciência Negra became a national holiday in 2024
+        self.assertNotIn(date(2023, 11, 20), dict(national_holidays(2023)))
+
+    def test_regional_movable_holidays(self):
+        self.assertEqual(
+            regional_movable_holidays(2025),
+            [
+                (date(2025, 3, 3), 'Carnaval'),
+                (date(2025, 3, 4), 'Carnaval'),
+                (date(2025, 6, 19), 'Corpus Christi'),
+            ]
+        )
+
+    def test_holiday_calendar(self):
+        calendar = HolidayCalendar(
+            [
+                (date(2025, 1, 1), 'NATIONAL', '', None),
+                (date(2025, 7, 9), 'STATE', 'SP', None),
+                (date(2025, 1, 25), 'MUNICIPAL', 'SP', 1),
+            ],
+            {1: 'SP', 2: 'SP', 3: 'RJ'}
+        )
+
+        self.assertTrue(calendar.is_holiday(date(2025, 1, 1)))
+        self.assertTrue(calendar.is_holiday(date(2025, 1, 1), 3))
+        self.assertFalse(calendar.is_holiday(date(2025, 7, 9)))
+        self.assertTrue(calendar.is_holiday(date(2025, 7, 9), 2))
+        self.assertFalse(calendar.is_holiday(date(2025, 7, 9), 3))
+        self.assertTrue(calendar.is_holiday(date(2025, 1, 25), 1))
+        self.assertFalse(calendar.is_holiday(date(2025, 1, 25), 2))
+
+        same = HolidayCalendar([(date(2025, 1, 1), 'NATIONAL', '', None)], {})
+        other = HolidayCalendar([(date(2025, 1, 2), 'NATIONAL', '', None)], {})
+        self.assertEqual(
+            same.version,
+            HolidayCalendar([(date(2025, 1, 1), 'NATIONAL', '', None)], {1: 'SP'}).version
+        )
+        self.assertNotEqual(same.version, other.version)
@@ -0,0 +1,27 @@
+from app.ical import escape_text, fold_line, format_datetime
+from unittest import TestCase
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+
+class TestICal(TestCase):
+
+    def test_escape_text(self):
+        self.assertEqual(escape_text("Limpeza; clareamento, etc"), "Limpeza\\; clareamento\\, etc")
+        self.assertEqual(escape_text("linha 1\nlinha 2"), "linha 1\\nlinha 2")
+
+    def test_fold_line(self):
+        self.assertEqual(fold_line("SUMMARY:Consulta"), "SUMMARY:Consulta\r\n")
+
+        folded = fold_line("SUMMARY:" + "ã" * 80)
+        lines = folded.rstrip("\r\n").split("\r\n")
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(all(len(line.encode("utf-8")) <= 75 for line in lines))
+        self.assertTrue(all(line.startswith(" ") for line in lines[1:]))
+        self.assertEqual("".join(line[1:] if i else line for i, line in enumerate(lines)), "SUMMARY:" + "ã" * 80)
+
+    def test_format_datetime(self):
+        self.assertEqual(
+            format_datetime(datetime(2025, 1, 6, 9, 30, tzinfo=ZoneInfo("America/Sao_Paulo"))),
+            "20250106T123000Z"
+        )
@@ -1,42 +1,200 @@
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from unittest.mock import patch
+from app.cities import read_city_snapshot
 from app.models import City
+from datetime import datetime, timedelta, timezone
 from django.core.management import call_command
-import httpx
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+import math
 
 
 class TestDataMigration(TestCase):
+    # Have the runner create the test database, which these tests migrate
+    databases = {"default"}
 
-    def test_migration_with_mocked_httpx(self):
-        def mock_send(request):
-            json_data = [
-                {
-                    "nome": "Cidade1",
-                    "regiao-imediata": {
-                        "regiao-intermediaria": {"UF": {"sigla": "RO"}}
-                    }
-                },
-                {
-                    "nome": "Cidade2",
-                    "regiao-imediata": {
-                        "regiao-intermediaria": {"UF": {"sigla": "MG"}}
-                    }
-                }
-            ]
-            return httpx.Response(200, json=json_data)
-
-        transport = httpx.MockTransport(mock_send)
-        OriginalClient = httpx.Client
-
-        def mock_client(*args, **kwargs):
-            return OriginalClient(transport=transport)
-
-        with patch("httpx.Client", mock_client):
-            call_command("migrate", "app", "0002")
-
-        self.assertEqual(City.objects.count(), 2)
-        self.assertEqual(City.objects.get(name="Cidade1").state, "RO")
-        self.assertEqual(City.objects.get(name="Cidade2").state, "MG")
-
-        call_command("migrate", "app", "0001")
+    def tearDown(self):
+        call_command("migrate", "app", verbosity=0)
+
+    def test_migration_loads_the_snapshot_without_network(self):
+        call_command("migrate", "app", "0001", verbosity=0)
+        self.assertEqual(City.objects.count(), 0)
+
+        with patch("httpx.Client", side_effect=AssertionError("The migration must not use the network")):
+            with CaptureQueriesContext(connection) as queries:
+                call_command("migrate", "app", "0002", verbosity=0)
+
+        snapshot = read_city_snapshot()
+        self.assertEqual(
+            set(City.objects.values_list("name", "state")),
+            set(snapshot)
+        )
+        # INSERT ... ON CONFLICT DO NOTHING (INSERT OR IGNORE in SQLite), in
+        # as few statements as the query parameters of the database allow
+        inserts = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith("INSERT") and '"app_city"' in query["sql"]
+        ]
+        cities = [City(name=name, state=state) for name, state in snapshot]
+        batch_size = connection.ops.bulk_batch_size([City._meta.get_field("name"), City._meta.get_field("state")], cities)
+        self.assertEqual(len(inserts), math.ceil(len(snapshot) / batch_size))
+        # The full municipality list, not only a sample of it
+        self.assertGreater(len(snapshot), 5500)
+
+        call_command("migrate", "app", "0001", verbosity=0)
         self.assertEqual(City.objects.count(), 0)
+
+
+class TestEndDatetimeMigration(TestCase):
+    databases = {"default"}
+    before = ("app", "0005_alter_business_schedule_alter_customer_birth_date_and_more")
+    after = ("app", "0006_appointment_end_datetime")
+
+    def setUp(self):
+        call_command("migrate", *self.before, verbosity=0)
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        self.Appointment = apps.get_model("app", "Appointment")
+
+        self.business = apps.get_model("app", "Business").objects.create(
+            name="Clínica Migração",
+            category="C1",
+            city=apps.get_model("app", "City").objects.first(),
+            address="Rua 1",
+            public_phone="1234567890",
+            restricted_phone="1234567890",
+            email="migracao@example.com",
+            schedule={},
+            closed_on_holidays=False
+        )
+        professional = apps.get_model("app", "Professional").objects.create(
+            business=self.business,
+            name="Profissional",
+            cpf="11144477735",
+            speciality="Dentista",
+            email="profissional@example.com",
+            phone="11995954250",
+            schedule={}
+        )
+        customer = apps.get_model("app", "Customer").objects.create(
+            business=self.business,
+            name="Cliente",
+            registration_source="WHATSAPP",
+            cpf="11144477735",
+            phone="11995954250"
+        )
+        service = apps.get_model("app", "Service").objects.create(
+            business=self.business,
+            name="Consulta",
+            description="Consulta",
+            price=100,
+            duration=timedelta(minutes=45)
+        )
+        self.start = datetime(2030, 1, 7, 12, tzinfo=timezone.utc)
+        self.appointments = [
+            self.Appointment.objects.create(
+                business=self.business,
+                professional=professional,
+                customer=customer,
+                service=service,
+                datetime=self.start + timedelta(minutes=minutes),
+                source="WHATSAPP",
+                status="SCHEDULED"
+            )
+            for minutes in (0, 60)
+        ]
+
+    def tearDown(self):
+        # Cascades to the appointments, which could block the constraint
+        self.business.delete()
+        call_command("migrate", "app", verbosity=0)
+
+    def assertEndDatetimes(self, minutes):
+        # The historical model of 0005 has no end_datetime
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT end_datetime FROM app_appointment WHERE id IN (%s, %s) ORDER BY id",
+                [appointment.pk for appointment in self.appointments]
+            )
+            ends = [value for value, in cursor.fetchall()]
+        # SQLite returns them naive, in UTC
+        ends = [end if end.tzinfo else end.replace(tzinfo=timezone.utc) for end in ends]
+        self.assertEqual(ends, [self.start + timedelta(minutes=value) for value in minutes])
+
+    def test_end_datetime_backfill(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command("migrate", *self.after, verbosity=0)
+
+        # One UPDATE for all the appointments
+        updates = [query for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEndDatetimes([45, 105])
+
+    @skipUnless(connection.vendor == "postgresql", "Only PostgreSQL has the exclusion constraint")
+    def test_overlaps_are_reported(self):
+        first, second = self.appointments
+        self.Appointment.objects.filter(pk=second.pk).update(datetime=self.start + timedelta(minutes=30))
+        with self.assertRaises(RuntimeError) as context:
+            call_command("migrate", *self.after, verbosity=0)
+        self.assertIn(f"appointments {first.pk} and {second.pk} of professional", str(context.exception))
+
+        self.Appointment.objects.filter(pk=second.pk).update(status="CANCELLED")
+        call_command("migrate", *self.after, verbosity=0)
+        self.assertEndDatetimes([45, 75])
+
+
+class TestCustomerSearchMigration(TestCase):
+    databases = {"default"}
+    before = ("app", "0010_city_ibge_code")
+    after = ("app", "0011_customer_search")
+
+    def setUp(self):
+        call_command("migrate", *self.before, verbosity=0)
+        apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        self.business = apps.get_model("app", "Business").objects.create(
+            name="Clínica Migração",
+            category="C1",
+            city=apps.get_model("app", "City").objects.first(),
+            address="Rua 1",
+            public_phone="1234567890",
+            restricted_phone="1234567890",
+            email="migracao@example.com",
+            schedule={},
+            closed_on_holidays=False
+        )
+        # More than one batch of the backfill
+        apps.get_model("app", "Customer").objects.bulk_create([
+            apps.get_model("app", "Customer")(
+                business=self.business,
+                name=f"José Cliente {number}",
+                registration_source="WHATSAPP",
+                cpf=f"{number:011d}",
+                email=f"Cliente{number}@Example.com",
+                phone=f"(11) 9{number:08d}"
+            )
+            for number in range(1001)
+        ])
+
+    def tearDown(self):
+        self.business.delete()
+        call_command("migrate", "app", verbosity=0)
+
+    def test_search_fields_backfill(self):
+        call_command("migrate", *self.after, verbosity=0)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT search_name, search_phone, search_cpf, search_email"
+                " FROM app_customer WHERE cpf = %s",
+                ["00000001000"]
+            )
+            row = cursor.fetchone()
+        self.assertEqual(
+            row,
+            ("jose cliente 1000", "11900001000", "00000001000", "cliente1000@example.com")
+        )
+
+        # Both batches are written
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM app_customer WHERE search_cpf = ''")
+            self.assertEqual(cursor.fetchone(), (0,))
@@ -0,0 +1,86 @@
+from app.schedules import (
+    CompiledSchedule,
+    compile_schedule,
+    merge_intervals,
+    intersect_intervals,
+    subtract_intervals
+)
+from unittest import TestCase
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+class TestSchedules(TestCase):
+
+    def setUp(self):
+        self.schedule = {
+            "1": {
+                "start": "08:00",
+                "end": "18:00",
+                "breaks": [{"start": "12:00", "end": "13:00"}]
+            },
+            "3": {
+                "start": "09:30:00",
+                "end": "12:00:00"
+            }
+        }
+
+    def test_merge_intervals(self):
+        self.assertEqual(
+            merge_intervals([(60, 90), (0, 30), (30, 45), (80, 120)]),
+            [(0, 45), (60, 120)]
+        )
+        self.assertEqual(merge_intervals([]), [])
+
+    def test_intersect_intervals(self):
+        self.assertEqual(
+            intersect_intervals([(0, 60), (120, 240)], [(30, 150), (200, 300)]),
+            [(30, 60), (120, 150), (200, 240)]
+        )
+        self.assertEqual(intersect_intervals([(0, 60)], []), [])
+
+    def test_subtract_intervals(self):
+        self.assertEqual(
+            subtract_intervals([(0, 100), (200, 300)], [(10, 20), (90, 210), (250, 260)]),
+            [(0, 10), (20, 90), (210, 250), (260, 300)]
+        )
+        self.assertEqual(subtract_intervals([(0, 100)], [(0, 100)]), [])
+        self.assertEqual(subtract_intervals([(0, 100)], []), [(0, 100)])
+
+    def test_compile_schedule(self):
+        compiled = compile_schedule(self.schedule)
+        self.assertIsInstance(compiled, CompiledSchedule)
+        self.assertEqual(
+            compiled.days,
+            ((), ((480, 720), (780, 1080)), (), ((570, 720),), (), (), ())
+        )
+
+        # 2025-01-06 is a Monday (1) and 2025-01-05 a Sunday (0)
+        self.assertEqual(compiled.intervals(date(2025, 1, 6)), [(480, 720), (780, 1080)])
+        self.assertEqual(compiled.intervals(date(2025, 1, 5)), [])
+
+    def test_intersect_schedules(self):
+        other = compile_schedule({"1": {"start": "10:00", "end": "20:00"}})
+        self.assertEqual(
+            (compile_schedule(self.schedule) & other).days[1],
+            ((600, 720), (780, 1080))
+        )
+
+    def test_is_open(self):
+        compiled = compile_schedule(self.schedule)
+        tz = ZoneInfo("America/Sao_Paulo")
+
+        self.assertTrue(compiled.is_open(datetime(2025, 1, 6, 8, 0, tzinfo=tz)))
+        self.assertFalse(compiled.is_open(datetime(2025, 1, 6, 12, 30, tzinfo=tz)))
+        self.assertFalse(compiled.is_open(datetime(2025, 1, 6, 18, 0, tzinfo=tz)))
+        self.assertFalse(compiled.is_open(datetime(2025, 1, 5, 10, 0, tzinfo=tz)))
+        # 11:00 UTC is 08:00 in Sao Paulo
+        self.assertTrue(compiled.is_open(datetime(2025, 1, 6, 11, 0, tzinfo=ZoneInfo("UTC"))))
+
+    def test_covers(self):
+        compiled = compile_schedule(self.schedule)
+        start = datetime(2025, 1, 6, 11, 0, tzinfo=ZoneInfo("America/Sao_Paulo"))
+
+        self.assertTrue(compiled.covers(start, start + timedelta(hours=1)))
+        self.assertFalse(compiled.covers(start, start + timedelta(hours=2)))
+        self.assertFalse(compiled.covers(start - timedelta(hours=4), start))
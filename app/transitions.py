@@ -0,0 +1,66 @@
+from .availability import local_dates, refresh_availability_on_commit
+from .models import Appointment
+from .utils import AppointmentStatus
+from dataclasses import dataclass, field
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+@dataclass
+class TransitionResult:
+    succeeded: list[int] = field(default_factory=list)
+    # Current status of the appointments that could not change
+    invalid: dict[int, str] = field(default_factory=dict)
+    not_found: list[int] = field(default_factory=list)
+
+
+def bulk_transition(ids: list[int], status: str) -> TransitionResult:
+    """
+    Change the status of the appointments with one conditional UPDATE,
+    which only touches the rows whose current status can change to the
+    new one. Rows with a twin already in the new status (a slot cancelled,
+    booked again and cancelled again) are left out, since the change would
+    break the unique constraint of the appointments, and are reported as
+    invalid. The rows changed are the ones with the new status and the
+    updated_at set by this UPDATE, read back with one SELECT.
+    """
+    now = timezone.now()
+    result = TransitionResult()
+
+    with transaction.atomic():
+        twin = Appointment.objects.filter(
+            business=OuterRef('business'),
+            professional=OuterRef('professional'),
+            datetime=OuterRef('datetime'),
+            customer=OuterRef('customer'),
+            service=OuterRef('service'),
+            status=status
+        )
+        # QuerySet.update() does not send post_save
+        Appointment.objects.filter(
+            ~Exists(twin),
+            id__in=ids,
+            status__in=AppointmentStatus.sources(status)
+        ).update(status=status, updated_at=now)
+
+        rows = {
+            row[0]: row[1:]
+            for row in Appointment.objects
+            .filter(id__in=ids)
+            .values_list('id', 'status', 'updated_at', 'professional_id', 'datetime', 'end_datetime')
+        }
+        for appointment_id in dict.fromkeys(ids):
+            if appointment_id not in rows:
+                result.not_found.append(appointment_id)
+                continue
+
+            current, updated_at, professional_id, start, end = rows[appointment_id]
+            if current == status and updated_at == now:
+                result.succeeded.append(appointment_id)
+                # A cancelled appointment frees its period
+                if status == AppointmentStatus.CANCELLED.name:
+                    refresh_availability_on_commit(local_dates(start, end), professional_id=professional_id)
+            else:
+                result.invalid[appointment_id] = current
+    return result
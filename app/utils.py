@@ -1,8 +1,12 @@
 import logging
-from typing import Any, Iterable
+from typing import Any
 from datetime import timedelta
+from pathlib import Path
 import enum
+import hashlib
 import httpx
+import json
+import unicodedata
 
 
 class Source(enum.StrEnum):
@@ -23,7 +27,32 @@ class AppointmentStatus(enum.StrEnum):
     @classmethod
     def is_valid(cls, status: str) -> bool:
         return status.upper() in cls.__members__
-    
+
+    @classmethod
+    def sources(cls, target: str) -> list[str]:
+        """
+        Return the names of the statuses that can change to the target
+        """
+        return [
+            source for source, targets in APPOINTMENT_TRANSITIONS.items()
+            if target.upper() in targets
+        ]
+
+
+# Allowed changes of the appointment status, by name.
+# Cancelled and completed appointments are final.
+APPOINTMENT_TRANSITIONS = {
+    AppointmentStatus.SCHEDULED.name: {
+        AppointmentStatus.CONFIRMED.name,
+        AppointmentStatus.CANCELLED.name,
+        AppointmentStatus.COMPLETED.name,
+    },
+    AppointmentStatus.CONFIRMED.name: {
+        AppointmentStatus.CANCELLED.name,
+        AppointmentStatus.COMPLETED.name,
+    },
+}
+
 
 class BusinessCategory(enum.StrEnum):
     C1 = "clínica médica"
@@ -39,15 +68,72 @@ class BusinessCategory(enum.StrEnum):
         return category.upper() in cls.__members__
 
 
-def fetch_cities() -> Iterable[dict[str, Any]]:
+class HolidayScope(enum.StrEnum):
+    NATIONAL = "nacional"
+    STATE = "estadual"
+    MUNICIPAL = "municipal"
+
+    @classmethod
+    def is_valid(cls, scope: str) -> bool:
+        return scope.upper() in cls.__members__
+
+
+def fetch_cities(
+    url: str = 'https://servicodados.ibge.gov.br/api/v1/localidades/municipios',
+    cache_dir: Path | None = None,
+    timeout: float = 30.0,
+    retries: int = 3
+) -> list[dict[str, Any]]:
+    """
+    Fetch the Brazilian municipalities from IBGE. With a cache directory,
+    the body is streamed to disk and the request is conditional on the
+    ETag and Last-Modified of the cached copy, so an unchanged list is
+    a 304 read back from disk. The JSON is parsed once.
+    """
     logger = logging.getLogger(__name__)
     logger.info("Fetching Brazilian cities from IBGE...")
-    client = httpx.Client(http2=True)
-    url = 'https://servicodados.ibge.gov.br/api/v1/localidades/municipios'
-    response: httpx.Response = client.get(url)
-    response.raise_for_status()
-    logger.info(f"Successfully fetched {len(response.json())} cities from IBGE")
-    return response.json()
+
+    headers = {}
+    body_path = meta_path = None
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        body_path = cache_dir / f'{key}.json'
+        meta_path = cache_dir / f'{key}.meta.json'
+        if body_path.exists() and meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+    # The transport retries failed connections
+    transport = httpx.HTTPTransport(http2=True, retries=retries)
+    with httpx.Client(transport=transport, timeout=timeout) as client:
+        with client.stream('GET', url, headers=headers) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED and body_path is not None:
+                logger.info("Cities not modified since the last fetch, using the cache")
+            else:
+                response.raise_for_status()
+                if body_path is None:
+                    cities = json.loads(response.read())
+                    logger.info(f"Successfully fetched {len(cities)} cities from IBGE")
+                    return cities
+
+                partial_path = body_path.with_suffix('.part')
+                with partial_path.open('wb') as body:
+                    for chunk in response.iter_bytes():
+                        body.write(chunk)
+                partial_path.replace(body_path)
+                meta_path.write_text(json.dumps({
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified')
+                }))
+
+    with body_path.open('rb') as body:
+        cities = json.load(body)
+    logger.info(f"Successfully fetched {len(cities)} cities from IBGE")
+    return cities
 
 
 def standardize_numeric_string(value: str) -> str:
@@ -66,6 +152,16 @@ def standardize_email(email: str) -> str:
     return email.replace(" ", "").lower()
 
 
+def fold(text: str) -> str:
+    """
+    Fold accents, case and repeated spaces, so "São  Paulo"
+    and "sao paulo" have the same key
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
 def timedelta_to_string(td: timedelta) -> str:
     """
     Convert a timedelta to a string in the format "HH:MM:SS"
@@ -8,49 +8,622 @@ from .models import (
     Appointment
 )
 from .serializers import (
+    ActiveQuerySerializer,
     CitySerializer,
+    CityQuerySerializer,
     BusinessSerializer,
     CustomerSerializer,
+    CustomerBulkSerializer,
     ServiceSerializer,
     ProfessionalSerializer,
+    ProfessionalBulkSerializer,
     AvailableDaySerializer,
-    AppointmentSerializer
+    AppointmentSerializer,
+    AppointmentFilterSerializer,
+    AppointmentTransitionSerializer,
+    CustomerFilterSerializer,
+    ProfessionalFilterSerializer,
+    AvailabilityQuerySerializer,
+    NextAvailableQuerySerializer,
+    OccupancyQuerySerializer,
+    RecurringAppointmentSerializer,
+    parse_expand,
+    expand_select_related
 )
+from .pagination import AppointmentPagination, CustomerPagination
+from .availability import free_slots, next_free_slots, month_occupancy
+from .ical import ICalendarRenderer, feed_queryset, feed_etag, iter_calendar
+from .recurrence import book_series
+from .authentication import CalendarTokenAuthentication, IsAuthenticatedOrCalendarToken
+from .booking import professional_lock
+from .idempotency import idempotent
+from .transitions import bulk_transition
+from .bulk import bulk_upsert
+from .cities import CITY_CACHE_MAX_AGE, RenderedJSON, get_city_index, get_city_responses
+from .parsers import NDJSONParser
+from .validators import SP_TZ
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any
+import re
+from django.db.models import Q, QuerySet
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBase,
+    HttpResponseNotModified,
+    StreamingHttpResponse
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
+
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+from rest_framework.settings import api_settings
+
+
+# The feeds also accept the ?token= of their business or professional,
+# after the default classes so a missing token still answers 401
+CALENDAR_AUTHENTICATION_CLASSES = [
+    *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+    CalendarTokenAuthentication
+]
+
+
+def calendar_owner(view: viewsets.GenericViewSet) -> Business | Professional:
+    """
+    Return the business or professional of a calendar feed, already
+    loaded by CalendarTokenAuthentication when the URL has a token
+    """
+    if isinstance(view.request.successful_authenticator, CalendarTokenAuthentication):
+        return view.request.auth
+    return view.get_object()
+
+
+def calendar_response(
+    request: Request,
+    appointments: QuerySet[Appointment],
+    name: str
+) -> HttpResponseBase:
+    """
+    Stream the appointments as an iCalendar feed. Clients that send
+    the current ETag in If-None-Match get a 304 after one aggregate query.
+    """
+    appointments = feed_queryset(appointments, datetime.now(tz=SP_TZ))
+    etag = feed_etag(appointments)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = StreamingHttpResponse(
+            iter_calendar(appointments, name),
+            content_type='text/calendar; charset=utf-8'
+        )
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+def rendered_response(request: Request, rendered: RenderedJSON, cache_control: str) -> HttpResponse:
+    """
+    Serve pre-rendered JSON bytes, gzipped when the client accepts it,
+    with no serializer or renderer involved. Clients that send the ETag
+    of either encoding in If-None-Match get a 304.
+    """
+    gzipped = (
+        rendered.gzip_body is not None
+        and ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')) is not None
+    )
+
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in etags or rendered.etag in etags or rendered.gzip_etag in etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            rendered.gzip_body if gzipped else rendered.body,
+            content_type='application/json'
+        )
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+
+    response['ETag'] = rendered.gzip_etag if gzipped else rendered.etag
+    response['Cache-Control'] = cache_control
+    if rendered.gzip_body is not None:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+class RelatedQuerySetMixin:
+    """
+    Join the relations read by each action, so its number
+    of queries does not grow with the number of rows
+    """
+    # Relations to select_related by action name
+    select_related_actions: dict[str, tuple[str, ...]] = {}
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        related = self.select_related_actions.get(self.action)
+        return queryset.select_related(*related) if related else queryset
+
+
+class FieldSelectionQuerySetMixin:
+    """
+    Load only the columns of the fields selected with the `fields`
+    and `omit` query parameters on list and retrieve, so the unused
+    columns, such as the schedule JSON, are neither fetched nor decoded
+    """
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.action not in ('list', 'retrieve') or not ('fields' in params or 'omit' in params):
+            return queryset
+
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        serializer = self.get_serializer()
+        selected = {
+            field.source for field in serializer.fields.values()
+            if field.source in columns
+        }
+        # The cursor pagination reads its position from the ordering fields
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        selected.update(name.lstrip('-') for name in ordering)
+        return queryset.only('pk', *sorted(selected))
+
+
+class ExpandQuerySetMixin:
+    """
+    Join the relations expanded with the `expand` query parameter
+    on list and retrieve, so they come in the same query
+    """
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve') or 'expand' not in self.request.query_params:
+            return queryset
+
+        serializer = self.get_serializer()
+        tree = parse_expand(type(serializer), self.request.query_params['expand'])
+        # Relations left out by the `fields` parameter are not expanded
+        tree = {name: children for name, children in tree.items() if name in serializer.fields}
+        return queryset.select_related(*expand_select_related(tree))
+
+
+class QueryFilterMixin:
+    """
+    Filter the list action by the query parameters validated
+    with filter_serializer_class, whose validated data maps
+    ORM lookups to their values, or names to Q objects
+    """
+    filter_serializer_class: type[Serializer] | None = None
+
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list' or self.filter_serializer_class is None:
+            return queryset
+
+        # A plain dict, so the absent booleans are not read as False
+        query = self.filter_serializer_class(data=self.request.query_params.dict())
+        query.is_valid(raise_exception=True)
+        conditions = [value for value in query.validated_data.values() if isinstance(value, Q)]
+        lookups = {
+            lookup: value for lookup, value in query.validated_data.items()
+            if not isinstance(value, Q)
+        }
+        return queryset.filter(*conditions, **lookups)
+
+
+class ActiveQuerySetMixin:
+    """
+    List only the active rows, through the partial indexes WHERE
+    is_active, unless the request sends ?include_inactive=1 or
+    filters by is_active itself. Other actions still reach the
+    inactive rows by id, so they can be reactivated.
+    """
 
-from rest_framework import viewsets
+    def filter_queryset(self, queryset: QuerySet) -> QuerySet:
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list' or 'is_active' in self.request.query_params:
+            return queryset
 
-class CityViewSet(viewsets.ReadOnlyModelViewSet):
+        query = ActiveQuerySerializer(data=self.request.query_params.dict())
+        query.is_valid(raise_exception=True)
+        if query.validated_data['include_inactive']:
+            return queryset
+        return queryset.active()
+
+
+class IdempotentCreateMixin:
+    """
+    Replay the response of a create to the retries sent with the
+    same Idempotency-Key header, see app.idempotency.idempotent
+    """
+
+    def create(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return idempotent(
+            request,
+            lambda: super(IdempotentCreateMixin, self).create(request, *args, **kwargs)
+        )
+
+
+class BulkUpsertMixin:
+    """
+    Adds the bulk/ action, which creates or updates many rows from a
+    JSON array or from newline delimited JSON, validated with
+    bulk_serializer_class, and reports the errors of each row
+    """
+    bulk_serializer_class: type[Serializer]
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request: Request) -> Response:
+        rows = request.data
+        if not isinstance(rows, (list, Iterator)):
+            return Response(
+                {'non_field_errors': ['Expected a list of objects.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = bulk_upsert(self.bulk_serializer_class, rows)
+        return Response({
+            'created': result.created,
+            'updated': result.updated,
+            'errors': result.errors
+        })
+
+
+class CityViewSet(FieldSelectionQuerySetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = City.objects.all()
     serializer_class = CitySerializer
 
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        """
+        List the cities, filtered by `state`. With `q`, return up to
+        `limit` cities whose name starts with it, ignoring accents and
+        case, from the in-memory index instead of the database.
+        """
+        query = CityQuerySerializer(data=request.query_params.dict())
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        if 'q' not in data:
+            if 'state' in data:
+                self.queryset = self.queryset.filter(state=data['state'])
+            return super().list(request, *args, **kwargs)
+
+        cities = get_city_index().search(data['q'], data.get('state'), data['limit'])
+        return Response([
+            {'id': city_id, 'name': name, 'state': state}
+            for city_id, name, state in cities
+        ])
+
+    def retrieve(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        """
+        Serve the pre-rendered city, unless query parameters shape the
+        response or it is rendered for the browsable API
+        """
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+
+        try:
+            rendered = get_city_responses().by_id[int(self.kwargs[self.lookup_field])]
+        except (KeyError, ValueError):
+            raise Http404
+        return rendered_response(request, rendered, f'private, max-age={CITY_CACHE_MAX_AGE}')
+
+    @action(
+        detail=False,
+        methods=['get'],
+        authentication_classes=[],
+        permission_classes=[AllowAny]
+    )
+    def all(self, request: Request) -> HttpResponseBase:
+        """
+        Return every city, or the cities of the `state`, unpaginated from
+        the pre-rendered bytes. The list is public reference data, so no
+        authentication runs and shared caches may store it.
+        """
+        query = CityQuerySerializer(data=request.query_params.dict())
+        query.is_valid(raise_exception=True)
+
+        rendered = get_city_responses().list(query.validated_data.get('state'))
+        return rendered_response(request, rendered, f'public, max-age={CITY_CACHE_MAX_AGE}')
+
 
-class BusinessViewSet(viewsets.ModelViewSet):
+class BusinessViewSet(
+    ActiveQuerySetMixin,
+    ExpandQuerySetMixin,
+    FieldSelectionQuerySetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Business.objects.all()
     serializer_class = BusinessSerializer
 
+    @action(detail=True, methods=['get'])
+    def occupancy(self, request: Request, pk: str | None = None) -> Response:
+        """
+        Return the booked and free minutes of each professional
+        for every date of the month query parameter (YYYY-MM)
+        """
+        business = self.get_object()
+        query = OccupancyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+        occupancy = month_occupancy(
+            business,
+            query.validated_data['year'],
+            query.validated_data['month']
+        )
+        return Response({
+            'business': business.id,
+            'days': [
+                {
+                    'date': day,
+                    'professionals': [
+                        {'professional': professional_id} | minutes
+                        for professional_id, minutes in professionals.items()
+                    ]
+                }
+                for day, professionals in occupancy.items()
+            ]
+        })
+
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[ICalendarRenderer, JSONRenderer],
+        authentication_classes=CALENDAR_AUTHENTICATION_CLASSES,
+        permission_classes=[IsAuthenticatedOrCalendarToken]
+    )
+    def calendar(self, request: Request, pk: str | None = None) -> HttpResponseBase:
+        """
+        iCalendar feed with the appointments of the business. Calendar
+        apps subscribe to it with ?token=<calendar_token>.
+        """
+        business = calendar_owner(self)
+        return calendar_response(
+            request,
+            Appointment.objects.filter(business=business),
+            business.name
+        )
+
+
+class CustomerViewSet(
+    IdempotentCreateMixin,
+    BulkUpsertMixin,
+    ActiveQuerySetMixin,
+    QueryFilterMixin,
+    ExpandQuerySetMixin,
+    FieldSelectionQuerySetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    bulk_serializer_class = CustomerBulkSerializer
+    filter_serializer_class = CustomerFilterSerializer
+    pagination_class = CustomerPagination
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(
+    ActiveQuerySetMixin,
+    ExpandQuerySetMixin,
+    FieldSelectionQuerySetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer  
 
+    @action(detail=True, methods=['get'])
+    def next_available(self, request: Request, pk: str | None = None) -> Response:
+        """
+        Return the earliest free start times of the service
+        with any active professional of the business
+        """
+        service = self.get_object()
+        query = NextAvailableQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        professionals = (
+            Professional.objects
+            .active()
+            .filter(business_id=service.business_id)
+            .select_related('business')
+        )
+        slots = next_free_slots(
+            professionals,
+            service,
+            query.validated_data['start'],
+            query.validated_data['limit'],
+            step=query.validated_data['step']
+        )
+        return Response({
+            'service': service.id,
+            'slots': [
+                {'professional': professional.id, 'datetime': slot}
+                for slot, professional in slots
+            ]
+        })
 
-class ProfessionalViewSet(viewsets.ModelViewSet):
+
+class ProfessionalViewSet(
+    BulkUpsertMixin,
+    ActiveQuerySetMixin,
+    QueryFilterMixin,
+    RelatedQuerySetMixin,
+    ExpandQuerySetMixin,
+    FieldSelectionQuerySetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Professional.objects.all()
-    serializer_class = ProfessionalSerializer 
+    serializer_class = ProfessionalSerializer
+    bulk_serializer_class = ProfessionalBulkSerializer
+    filter_serializer_class = ProfessionalFilterSerializer
+    select_related_actions = {
+        # The working hours are the intersection with the business schedule
+        'availability': ('business',),
+    }
+
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[ICalendarRenderer, JSONRenderer],
+        authentication_classes=CALENDAR_AUTHENTICATION_CLASSES,
+        permission_classes=[IsAuthenticatedOrCalendarToken]
+    )
+    def calendar(self, request: Request, pk: str | None = None) -> HttpResponseBase:
+        """
+        iCalendar feed with the appointments of the professional. Calendar
+        apps subscribe to it with ?token=<calendar_token>.
+        """
+        professional = calendar_owner(self)
+        return calendar_response(
+            request,
+            Appointment.objects.filter(professional=professional),
+            professional.name
+        )
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request: Request, pk: str | None = None) -> Response:
+        """
+        Return the free start times of a service with the professional,
+        for each date between the start and end query parameters
+        """
+        professional = self.get_object()
+        query = AvailabilityQuerySerializer(
+            data=request.query_params,
+            context={'professional': professional}
+        )
+        query.is_valid(raise_exception=True)
+        service = query.validated_data['service']
+
+        slots = free_slots(
+            professional,
+            service,
+            query.validated_data['start'],
+            query.validated_data['end'],
+            step=query.validated_data['step']
+        )
+        return Response({
+            'professional': professional.id,
+            'service': service.id,
+            'days': [
+                {'date': day, 'slots': day_slots}
+                for day, day_slots in slots.items()
+            ]
+        })
 
 
-class AvailableDayViewSet(viewsets.ModelViewSet):
+class AvailableDayViewSet(ExpandQuerySetMixin, FieldSelectionQuerySetMixin, viewsets.ModelViewSet):
     queryset = AvailableDay.objects.all()
     serializer_class = AvailableDaySerializer
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(
+    IdempotentCreateMixin,
+    QueryFilterMixin,
+    RelatedQuerySetMixin,
+    ExpandQuerySetMixin,
+    FieldSelectionQuerySetMixin,
+    viewsets.ModelViewSet
+):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    filter_serializer_class = AppointmentFilterSerializer
+    pagination_class = AppointmentPagination
+    select_related_actions = {
+        # Appointment.save() reads the duration of the service
+        # and Appointment.clean() the holidays of the business
+        'update': ('business', 'service'),
+        'partial_update': ('business', 'service'),
+    }
+
+    def perform_create(self, serializer: Serializer) -> None:
+        # Serialize the conflict check and the insert of the professional
+        with professional_lock(serializer.validated_data['professional'].id):
+            serializer.save()
+
+    def perform_update(self, serializer: Serializer) -> None:
+        professional_id = (
+            serializer.validated_data['professional'].id
+            if 'professional' in serializer.validated_data
+            else serializer.instance.professional_id
+        )
+        with professional_lock(professional_id):
+            serializer.save()
+
+    @action(detail=False, methods=['post'], serializer_class=AppointmentTransitionSerializer)
+    def transition(self, request: Request) -> Response:
+        """
+        Change the status of many appointments at once. Only the ones
+        whose current status allows the change are updated.
+        """
+        serializer = AppointmentTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = bulk_transition(
+            serializer.validated_data['ids'],
+            serializer.validated_data['status']
+        )
+        return Response({
+            'status': serializer.validated_data['status'],
+            'succeeded': result.succeeded,
+            'invalid': [
+                {'id': appointment_id, 'status': current}
+                for appointment_id, current in result.invalid.items()
+            ],
+            'not_found': result.not_found
+        })
+
+    @action(detail=False, methods=['post'], serializer_class=RecurringAppointmentSerializer)
+    def recurring(self, request: Request) -> Response:
+        """
+        Create a weekly series of appointments. Every occurrence is checked,
+        the ones without conflicts are created and the others are reported.
+        Retries with the same Idempotency-Key replay the first response.
+        """
+        return idempotent(request, lambda: self._book_series(request))
+
+    def _book_series(self, request: Request) -> Response:
+        serializer = RecurringAppointmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        series = book_series(
+            data['business'],
+            data['customer'],
+            data['service'],
+            data['professional'],
+            data['datetime'],
+            data['interval_weeks'],
+            data['occurrences'],
+            data['source'],
+            data['status']
+        )
+        created = [occurrence for occurrence in series if occurrence.appointment is not None]
+        return Response(
+            {
+                'created': len(created),
+                'conflicts': len(series) - len(created),
+                'occurrences': [
+                    {
+                        'datetime': occurrence.start,
+                        'appointment': occurrence.appointment.id if occurrence.appointment else None,
+                        'conflict': occurrence.conflict
+                    }
+                    for occurrence in series
+                ]
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_409_CONFLICT
+        )
 
 
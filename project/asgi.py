@@ -14,3 +14,20 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_asgi_application()
+
+from app.cities import warm_city_cache  # noqa: E402
+from django.db import connections  # noqa: E402
+from threading import Thread  # noqa: E402
+
+
+def warm_caches() -> None:
+    warm_city_cache()
+    # The connection of this thread is not used again
+    connections.close_all()
+
+
+# Servers such as uvicorn import this module inside their event loop,
+# where the ORM refuses to run, so the caches are built in a thread
+thread = Thread(target=warm_caches)
+thread.start()
+thread.join()
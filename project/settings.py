@@ -131,7 +131,7 @@ WSGI_APPLICATION = 'project.wsgi.application'
 
 # Rest Framework configuration
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.PageNumberPagination',
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
@@ -139,7 +139,8 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated'
-    ]
+    ],
+    'EXCEPTION_HANDLER': 'app.exceptions.exception_handler'
 }
 
 # Disable logging during tests
@@ -159,6 +160,21 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default=f'sqlite:///:memory:')
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+# IBGE municipalities API and the on-disk cache of its last
+# response, used by the sync_cities command
+IBGE_MUNICIPALITIES_URL = env(
+    'IBGE_MUNICIPALITIES_URL',
+    default='https://servicodados.ibge.gov.br/api/v1/localidades/municipios'
+)
+IBGE_CACHE_DIR = Path(env('IBGE_CACHE_DIR', default=str(BASE_DIR / '.cache' / 'ibge')))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
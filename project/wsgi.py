@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
 application = get_wsgi_application()
+
+from app.cities import warm_city_cache  # noqa: E402
+from django.db import connections  # noqa: E402
+
+warm_city_cache()
+# A connection opened before a fork must not be shared by the workers
+connections.close_all()